@@ -2,6 +2,7 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The search endpoint is served by the async search app, see search/async_views.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
@@ -13,4 +14,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from Part2.index.preload import preload_server  # noqa: E402, needs the settings configured above
+from search.async_views import AsyncSearchApp  # noqa: E402
+
+#Load the index before the server forks its workers, see index/preload.py
+preload_server()
+
+application = AsyncSearchApp(django_application)
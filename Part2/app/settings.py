@@ -120,3 +120,33 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Search
+
+# Load the index when the server imports the app (app/wsgi.py, app/asgi.py) instead of on the first query
+SEARCH_PRELOAD_INDEX = True
+
+# Move the preloaded index out of reach of the garbage collector (gc.freeze), so workers forked
+# after the app is loaded keep sharing its pages, see index/preload.py
+SEARCH_GC_FREEZE = True
+
+# Where the authors of the results come from:
+# 'local' the authors table of the transformed data, 'local_first' the table and the author API
+# for books missing from it, 'remote_first' the author API and the table when the API fails
+SEARCH_AUTHOR_STRATEGY = 'local_first'
+
+# Async search endpoint of the ASGI deployment: seconds a search may take before the results
+# gathered so far are returned, and threads evaluating the queries
+SEARCH_DEADLINE = 2.0
+SEARCH_QUERY_WORKERS = 4
+
+# Record the latency of every stage of the search path, exposed on /metrics for Prometheus
+SEARCH_METRICS = True
+
+# Requests slower than the threshold (seconds) are appended to the slow query log, a JSON lines
+# file, None turns it off. SEARCH_PROFILE: None, 'request' to run the requests asking for it
+# ("profile": true) under cProfile, or 'all'. Report: python -m index.profiling <log>
+SEARCH_SLOW_QUERY_LOG = None
+SEARCH_SLOW_QUERY_THRESHOLD = 0.5
+SEARCH_PROFILE = None
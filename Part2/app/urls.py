@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from search.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('search/', include('search.urls'))
+    path('search/', include('search.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics-view')
 ]
 
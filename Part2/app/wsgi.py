@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+#Load the index before the server forks its workers, see index/preload.py
+from Part2.index.preload import preload_server  # noqa: E402, needs the settings configured above
+
+preload_server()
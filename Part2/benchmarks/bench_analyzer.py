@@ -0,0 +1,63 @@
+'''
+Throughput of the analyzer in tokens per second on the summaries of index/data.json
+repeated SCALE times, against the tokenizer CreateIndex and QueryIndex used before it
+(re.sub with an uncompiled pattern and a dict of stopwords).
+Also times the Porter stemming analyzer, which stems every distinct word once, and the
+queries of data.json through the query memo.
+
+Usage (from Part2/): python -m benchmarks.bench_analyzer [scale]
+'''
+import json
+import re
+import sys
+import time
+
+from Part2.index.analyzer import Analyzer
+
+RAW_DATA_FILE = 'index/data.json'
+STOPWORD_FILE = 'index/stopwords.dat'
+QUERY_REPEAT = 1000
+
+
+def legacy_terms(stopwords, line):
+    line = line.lower()
+    line = re.sub(r'[^a-z0-9 ]', ' ', line)
+    line = line.split()
+    return [x for x in line if x not in stopwords]
+
+
+def timed(function, texts):
+    start = time.perf_counter()
+    for text in texts:
+        function(text)
+    return time.perf_counter() - start
+
+
+def run(scale):
+    with open(RAW_DATA_FILE) as json_file:
+        data = json.load(json_file)
+    summaries = [x['summary'] for x in data['summaries']] * scale
+    queries = data['queries'] * QUERY_REPEAT
+    analyzer = Analyzer(STOPWORD_FILE)
+    stemming_analyzer = Analyzer(STOPWORD_FILE, stemmer='porter')
+    with open(STOPWORD_FILE) as swf:
+        legacy_stopwords = dict.fromkeys(line.rstrip() for line in swf)
+    tokens = sum(len(analyzer._tokens(x)) for x in summaries)
+    query_tokens = sum(len(analyzer._tokens(x)) for x in queries)
+
+    print('{} summaries, {} tokens'.format(len(summaries), tokens))
+    print('{:<22} {:>10} {:>14}'.format('', 'seconds', 'tokens/sec'))
+    for name, function, texts, count in (
+            ('legacy', lambda x: legacy_terms(legacy_stopwords, x), summaries, tokens),
+            ('terms', analyzer.terms, summaries, tokens),
+            ('positions', lambda x: sum(1 for _ in analyzer.positions(x)), summaries, tokens),
+            ('porter terms', stemming_analyzer.terms, summaries, tokens),
+            ('legacy queries', lambda x: legacy_terms(legacy_stopwords, x), queries, query_tokens),
+            ('memoized queries', analyzer.query_terms, queries, query_tokens),
+            ('porter queries', stemming_analyzer.query_terms, queries, query_tokens)):
+        seconds = timed(function, texts)
+        print('{:<22} {:>10.3f} {:>14,.0f}'.format(name, seconds, count / seconds))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
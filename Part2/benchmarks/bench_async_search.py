@@ -0,0 +1,132 @@
+'''
+Load test of the search endpoint against a local author stub with injected latency.
+
+    sync   SearchView run by a pool of WSGI_WORKERS threads, each request blocks its worker
+    async  AsyncSearchApp (the ASGI endpoint) on one event loop
+
+Clients send requests of QUERIES_PER_REQUEST queries of index/data.json with the author
+cache disabled and the 'remote_first' strategy, so every result needs an author API call.
+Reports p50/p99 latency, throughput and how many responses were partial.
+
+Usage (from Part2/): python -m benchmarks.bench_async_search [requests] [concurrency ...]
+'''
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+import django  # noqa: E402
+django.setup()
+
+from django.test import RequestFactory  # noqa: E402
+from search import views  # noqa: E402
+from search.async_views import AsyncSearchApp  # noqa: E402
+from search.author_resolver import AuthorResolver, REMOTE_FIRST  # noqa: E402
+from search.author_service import AsyncAuthorService, AuthorService  # noqa: E402
+from search.tests.author_stub import AuthorStubServer  # noqa: E402
+
+RAW_DATA_FILE = 'index/data.json'
+AUTHOR_LATENCY = 0.05   # Seconds the author stub takes per call
+QUERIES_PER_REQUEST = 3
+K = 5
+WSGI_WORKERS = 4
+
+
+def requests_bodies(num_requests, seed=0):
+    with open(RAW_DATA_FILE) as json_file:
+        queries = json.load(json_file)['queries']
+    rng = random.Random(seed)
+    return [{'queries': rng.sample(queries, QUERIES_PER_REQUEST), 'K': K} for _ in range(num_requests)]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run_sync(bodies, concurrency, stub_url):
+    '''
+    Every client waits for its response before sending the next request, at most WSGI_WORKERS are served at once
+    '''
+    service = AuthorService(url=stub_url, cache_size=0)
+    views._author_resolver = AuthorResolver(REMOTE_FIRST, lambda: views._query_service.authors, service)
+    view = views.SearchView.as_view()
+    factory = RequestFactory()
+    workers = ThreadPoolExecutor(max_workers=WSGI_WORKERS)
+
+    def request(body):
+        response = view(factory.post('/search/get-summary', body, content_type='application/json'))
+        assert response.status_code == 200
+
+    def client(client_bodies):
+        latencies = []
+        for body in client_bodies:
+            #the time spent queued for a free worker counts
+            start = time.perf_counter()
+            workers.submit(request, body).result()
+            latencies.append((time.perf_counter() - start, False))
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        results = clients.map(client, [bodies[i::concurrency] for i in range(concurrency)])
+        return [x for client_results in results for x in client_results]
+
+
+def run_async(bodies, concurrency, stub_url):
+    remote = AsyncAuthorService(AuthorService(url=stub_url, cache_size=0))
+    resolver = AuthorResolver(REMOTE_FIRST, lambda: views._query_service.authors, remote)
+    app = AsyncSearchApp(None, query_service=views._query_service, author_resolver=resolver)
+
+    async def request(body):
+        start = time.perf_counter()
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': json.dumps(body).encode(), 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await app({'type': 'http', 'path': '/search/get-summary', 'method': 'POST', 'headers': []}, receive, send)
+        assert messages[0]['status'] == 200
+        return time.perf_counter() - start, (b'x-partial-results', b'1') in messages[0]['headers']
+
+    async def client(client_bodies):
+        return [await request(body) for body in client_bodies]
+
+    async def main():
+        results = await asyncio.gather(*(client(bodies[i::concurrency]) for i in range(concurrency)))
+        await remote.aclose()
+        return [x for client_results in results for x in client_results]
+
+    return asyncio.run(main())
+
+
+def main(argv):
+    num_requests = int(argv[0]) if argv else 200
+    levels = [int(x) for x in argv[1:]] or [1, 8, 32]
+    bodies = requests_bodies(num_requests)
+    views._query_service.load()
+    print('{} requests of {} queries, author latency {:.0f} ms, {} WSGI workers'.format(
+        num_requests, QUERIES_PER_REQUEST, AUTHOR_LATENCY * 1000, WSGI_WORKERS))
+    print('{:>6} {:>11} {:>9} {:>9} {:>9} {:>9} {:>8}'.format(
+        'mode', 'concurrency', 'p50 ms', 'p99 ms', 'max ms', 'req/s', 'partial'))
+    with AuthorStubServer(latency=AUTHOR_LATENCY) as stub:
+        for concurrency in levels:
+            for mode, run in (('sync', run_sync), ('async', run_async)):
+                start = time.perf_counter()
+                results = run(bodies, concurrency, stub.url)
+                elapsed = time.perf_counter() - start
+                latencies = [x[0] * 1000 for x in results]
+                print('{:>6} {:>11} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>8}'.format(
+                    mode, concurrency, statistics.median(latencies), percentile(latencies, 99),
+                    max(latencies), len(results) / elapsed, sum(x[1] for x in results)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+'''
+Micro-benchmarks of boolean.matches against set algebra over the posting lists (a set of
+summary ids per operand), and against the same evaluation without the rarest first ordering,
+operands evaluated in query order. Terms are picked by frequency rank on a
+Zipfian corpus: 'common' terms appear in most summaries, 'rare' ones in a few.
+
+Usage (from Part2/): python -m benchmarks.bench_boolean [num_summaries]
+'''
+import sys
+import time
+
+from Part2.index import boolean
+from .corpus import build_snapshot, synthetic_summaries
+
+REPEAT = 20
+
+
+def set_matches(snapshot, tree):
+    op = tree[0]
+    if op == 'term':
+        return {x[0] for x in snapshot.index.get(tree[1], [])}
+    included = [set_matches(snapshot, x) for x in tree[1:] if x[0] != 'not']
+    if op == 'or':
+        return set().union(*included)
+    excluded = [set_matches(snapshot, x[1]) for x in tree[1:] if x[0] == 'not']
+    return set.intersection(*included).difference(*excluded)
+
+
+class _QueryOrder(boolean._Evaluator):
+    def cost(self, tree):
+        #every operand costs the same, the sort keeps them in query order
+        return 1
+
+
+def best_time(fn, snapshot, tree):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(snapshot, tree)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv):
+    num_summaries = int(argv[0]) if argv else 50000
+    snapshot = build_snapshot(synthetic_summaries(num_summaries))
+    by_df = sorted(snapshot.index, key=lambda term: -len(snapshot.index[term]))
+    common, medium, rare = by_df[:5], by_df[50:55], by_df[2000:2005]
+    term = lambda x: ('term', x)
+    queries = {
+        'rare AND common': ('and', term(rare[0]), term(common[0])),
+        'common AND rare': ('and', term(common[0]), term(rare[0])),
+        'common AND common': ('and', term(common[0]), term(common[1])),
+        'common AND common AND rare': ('and', term(common[0]), term(common[1]), term(rare[0])),
+        'medium AND (common OR common)': ('and', term(medium[0]), ('or', term(common[0]), term(common[1]))),
+        'common NOT medium': ('and', term(common[0]), ('not', term(medium[0]))),
+        'medium OR medium OR medium': ('or',) + tuple(map(term, medium[:3])),
+    }
+    for tree in queries.values():
+        #the sorted summary ids of the posting lists, cached with the snapshot
+        assert sorted(set_matches(snapshot, tree)) == list(boolean.matches(snapshot, tree))
+
+    print('{} summaries, best of {}'.format(num_summaries, REPEAT))
+    print('{:>30} {:>8} {:>10} {:>12} {:>12}'.format('query', 'matches', 'sets us', 'query order', 'rarest first'))
+    for name, tree in queries.items():
+        print('{:>30} {:>8} {:>10.0f} {:>12.0f} {:>12.0f}'.format(
+            name, len(boolean.matches(snapshot, tree)),
+            best_time(set_matches, snapshot, tree) * 1e6,
+            best_time(lambda s, t: _QueryOrder(s).evaluate(t), snapshot, tree) * 1e6,
+            best_time(boolean.matches, snapshot, tree) * 1e6))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
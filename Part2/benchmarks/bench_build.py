@@ -0,0 +1,70 @@
+'''
+Docs/sec and peak RSS of the in-memory CreateIndex build against the streaming
+ParallelIndexBuilder on synthetic corpora. Every build runs in its own process so the
+peak RSS of one doesn't hide the other; the parallel build reports the peak of the parent
+and of its largest worker.
+
+Usage (from Part2/): python -m benchmarks.bench_build [num_summaries ...]
+    e.g. python -m benchmarks.bench_build 100000 1000000 10000000
+'''
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from Part2.index.create_index import CreateIndex
+from Part2.index.parallel_build import BUILD_MEMORY_BUDGET, BUILD_WORKERS, ParallelIndexBuilder
+from .corpus import STOPWORD_FILE, iter_synthetic_summaries
+
+SIZES = [100000]
+
+
+def build(mode, num_summaries, index_file):
+    summaries = iter_synthetic_summaries(num_summaries)
+    start = time.perf_counter()
+    if mode == 'serial':
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, index_file)
+        ci_obj.index_summaries(dict(summaries))
+        ci_obj._write_to_file()
+    else:
+        ParallelIndexBuilder(STOPWORD_FILE, index_file, workers=BUILD_WORKERS,
+                             memory_budget=BUILD_MEMORY_BUDGET).build(summaries)
+    seconds = time.perf_counter() - start
+    #ru_maxrss is in KiB on Linux
+    parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(seconds, parent, children)
+
+
+def run_one(mode, num_summaries, tmp_dir):
+    index_file = os.path.join(tmp_dir, '{}-{}.txt'.format(mode, num_summaries))
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_build', '--one', mode, str(num_summaries),
+                             index_file], check=True, capture_output=True, text=True).stdout
+    seconds, parent, children = output.split()
+    return float(seconds), int(parent) / 1024, int(children) / 1024, os.path.getsize(index_file)
+
+
+def run(sizes):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('{} workers, memory budget {} MiB'.format(BUILD_WORKERS, BUILD_MEMORY_BUDGET // 2**20))
+        print('{:>10} {:>9} {:>10} {:>12} {:>16} {:>12}'.format(
+            'summaries', 'mode', 'seconds', 'docs/sec', 'peak RSS MiB', 'index MiB'))
+        for num_summaries in sizes:
+            for mode in ('serial', 'parallel'):
+                seconds, parent, children, size = run_one(mode, num_summaries, tmp_dir)
+                rss = '{:.0f}'.format(parent) if mode == 'serial' else '{:.0f} + {:.0f}'.format(parent, children)
+                print('{:>10} {:>9} {:>10.2f} {:>12,.0f} {:>16} {:>12.1f}'.format(
+                    num_summaries, mode, seconds, num_summaries / seconds, rss, size / 2**20))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--one']:
+        build(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        run([int(x) for x in sys.argv[1:]] or SIZES)
@@ -0,0 +1,62 @@
+'''
+Cost of the search metrics: the queries of a synthetic corpus answered through
+QueryIndex.query_index with the metrics on and off, best of several rounds, runs alternated
+so both see the same machine load. The result cache is off, every query is evaluated.
+
+Usage (from Part2/): python -m benchmarks.bench_metrics [num_summaries] [rounds]
+'''
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from Part2.index import metrics
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import QueryIndex
+from Part2.index.tranform_data import DataTransformation
+from .corpus import STOPWORD_FILE, write_corpus
+
+K = 10
+
+
+def run(qi, queries):
+    start = time.perf_counter()
+    for query in queries:
+        qi.query_index(query, K)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    num_summaries = int(argv[0]) if argv else 10000
+    rounds = int(argv[1]) if len(argv) > 1 else 5
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        data_file = os.path.join(tmp_dir, 'data.json')
+        transformed_data_file = os.path.join(tmp_dir, 'transformed_data.json')
+        index_file = os.path.join(tmp_dir, 'index.txt')
+        queries = write_corpus(data_file, num_summaries)
+        DataTransformation(data_file, transformed_data_file).transform_data()
+        CreateIndex(STOPWORD_FILE, data_file, transformed_data_file, index_file).create_index()
+        qi = QueryIndex(STOPWORD_FILE, index_file, transformed_data_file, result_cache=None)
+        qi.load()
+        run(qi, queries)
+
+        times = {True: [], False: []}
+        for _ in range(rounds):
+            for enabled in (True, False):
+                metrics.REGISTRY.enabled = enabled
+                times[enabled].append(run(qi, queries))
+        metrics.REGISTRY.enabled = True
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    on, off = min(times[True]), min(times[False])
+    print('{} queries on {} summaries, best of {} rounds'.format(len(queries), num_summaries, rounds))
+    print('metrics off {:9.1f} us/query'.format(off / len(queries) * 1e6))
+    print('metrics on  {:9.1f} us/query'.format(on / len(queries) * 1e6))
+    print('overhead    {:9.1f} us/query {:+.1%}'.format((on - off) / len(queries) * 1e6, on / off - 1))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+'''
+Micro-benchmarks of phrase.phrase_matches against the phrase matching QueryIndex used before it
+(deep copies of the position lists, shifted positions and set intersections).
+Phrases of 2-6 terms, made of the most frequent terms or sampled from the summaries
+so they contain rare terms.
+
+Usage (from Part2/): python -m benchmarks.bench_phrase [num_summaries]
+'''
+import copy
+import functools
+import random
+import sys
+import time
+
+from Part2.index.phrase import phrase_matches
+from .corpus import build_snapshot, synthetic_summaries
+
+REPEAT = 3
+
+
+def legacy_phrase_matches(snapshot, terms):
+    def intersect_lists(lists):
+        if len(lists) == 0:
+            return []
+        lists.sort(key=len)
+        return list(functools.reduce(lambda x, y: set(x) & set(y), lists))
+
+    for term in terms:
+        if term not in snapshot.index:
+            return []
+    positions = [snapshot.index[term] for term in terms]
+    summary_ids = intersect_lists([[x[0] for x in p] for p in positions])
+    for i in range(len(positions)):
+        positions[i] = [x for x in positions[i] if x[0] in summary_ids]
+    positions = copy.deepcopy(positions)
+    for i in range(len(positions)):
+        for j in range(len(positions[i])):
+            positions[i][j][1] = [x - i for x in positions[i][j][1]]
+    result = []
+    for i in range(len(positions[0])):
+        if intersect_lists([x[i][1] for x in positions]) != []:
+            result.append(positions[0][i][0])
+    return result
+
+
+def phrases(summaries, snapshot, rng):
+    frequent = sorted(snapshot.index, key=lambda term: -len(snapshot.index[term]))
+    for length in range(2, 7):
+        yield 'high', length, frequent[:length]
+        #the legacy matcher shifts the shared position lists of a repeated term twice,
+        #so only phrases of distinct terms can be compared with it
+        while True:
+            words = summaries[rng.randrange(len(summaries))].split()
+            start = rng.randrange(len(words) - length)
+            terms = words[start:start + length]
+            if len(set(terms)) == length:
+                break
+        yield 'low', length, terms
+
+
+def timed(function, snapshot, terms):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = function(snapshot, terms)
+    return (time.perf_counter() - start) / REPEAT, result
+
+
+def run(num_summaries):
+    summaries = synthetic_summaries(num_summaries)
+    snapshot = build_snapshot(summaries)
+    rng = random.Random(0)
+    print('{} summaries'.format(num_summaries))
+    print('{:>5} {:>6} {:>8} {:>12} {:>12} {:>8}'.format('freq', 'terms', 'matches', 'legacy ms', 'new ms', 'speedup'))
+    for frequency, length, terms in phrases(summaries, snapshot, rng):
+        for term in terms:
+            snapshot.phrase_postings(term)   #derived once per snapshot, not per query
+        legacy_time, expected = timed(legacy_phrase_matches, snapshot, terms)
+        new_time, result = timed(phrase_matches, snapshot, terms)
+        if sorted(expected) != result:
+            raise AssertionError('Phrase matches differ for {}'.format(terms))
+        print('{:>5} {:>6} {:>8} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+            frequency, length, len(result), legacy_time * 1000, new_time * 1000, legacy_time / new_time))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,63 @@
+'''
+Memory taken by the postings of a text index once loaded, in the list layout and in the
+compact array layout, reported as bytes per posting and per position. Also times the load
+and a few free text queries with each layout.
+
+Usage (from Part2/): python -m benchmarks.bench_postings [num_summaries ...]
+'''
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from Part2.index.create_index import CreateIndex
+from Part2.index.postings import num_positions, num_postings
+from Part2.index.pruning import wand_top_k
+from Part2.index.snapshot import load_snapshot
+from .corpus import STOPWORD_FILE, synthetic_summaries
+
+QUERIES = [['w0', 'w1'], ['w2', 'w50', 'w900'], ['w10', 'w11', 'w12', 'w13'], ['w3000']]
+K = 10
+
+
+def run(num_summaries, tmp_dir):
+    index_file = os.path.join(tmp_dir, 'index-{}.txt'.format(num_summaries))
+    ci_obj = CreateIndex(STOPWORD_FILE, None, None, index_file)
+    ci_obj.index_summaries(synthetic_summaries(num_summaries))
+    ci_obj._write_to_file()
+    del ci_obj
+
+    rows = []
+    for layout in ('lists', 'compact'):
+        snapshot = load_snapshot(index_file, layout=layout)
+        postings, positions = num_postings(snapshot.index), num_positions(snapshot.index)
+        memory = snapshot.memory_footprint()
+        start = time.perf_counter()
+        for terms in QUERIES:
+            wand_top_k(snapshot, terms, K)
+        query_time = time.perf_counter() - start
+        rows.append((layout, snapshot.load_time, memory, postings, positions, query_time))
+        del snapshot
+
+    for layout, load_time, memory, postings, positions, query_time in rows:
+        print('{:>10} {:>8} {:>8.2f} {:>10.1f} {:>11.1f} {:>13.1f} {:>10.1f}'.format(
+            num_summaries, layout, load_time, memory / 2**20, memory / postings, memory / positions,
+            query_time * 1000))
+    print('{:>10} {:>8} {:>19.1f}x smaller'.format(num_summaries, '', rows[0][2] / rows[1][2]))
+
+
+def main(argv):
+    sizes = [int(x) for x in argv] or [10000, 50000]
+    print('{:>10} {:>8} {:>8} {:>10} {:>11} {:>13} {:>10}'.format(
+        'summaries', 'layout', 'load s', 'MiB', 'B/posting', 'B/position', 'query ms'))
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for num_summaries in sizes:
+            run(num_summaries, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,137 @@
+'''
+Startup time and memory of the forked workers of the search server, like gunicorn runs them:
+
+    lazy            every worker loads the index and the summaries itself after the fork
+    preload         the master loads them once before forking (gunicorn --preload)
+    preload+freeze  the same, then gc.freeze() (index/preload.py, what the server does)
+
+Every worker answers the queries of the corpus and runs a full collection, like a worker that
+has served for a while, then reports its memory from /proc/self/smaps_rollup:
+RSS, PSS (shared pages divided among the processes sharing them) and USS (its private pages).
+The sum of the PSS of the master and the workers is the memory the server takes.
+Startup is the time from the master starting until every worker is ready to serve.
+
+Every mode runs in a process of its own, gc.freeze() can't be undone.
+Linux only. Usage (from Part2/): python -m benchmarks.bench_preload [num_summaries] [workers]
+'''
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from Part2.index.create_index import CreateIndex
+from Part2.index.preload import preload
+from Part2.index.query_index import QueryIndex
+from Part2.index.tranform_data import DataTransformation
+from .corpus import STOPWORD_FILE, write_corpus
+
+MODES = ('lazy', 'preload', 'preload+freeze')
+K = 10
+
+
+def memory():
+    '''
+    {'rss', 'pss', 'uss'} of this process in bytes
+    '''
+    fields = {}
+    with open('/proc/self/smaps_rollup') as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'uss': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def query_service(tmp_dir):
+    return QueryIndex(STOPWORD_FILE, os.path.join(tmp_dir, 'index.txt'),
+                      os.path.join(tmp_dir, 'transformed_data.json'), result_cache=None)
+
+
+def worker(qi, queries, report_fd, release_fd, lazy):
+    if lazy:
+        qi.load()
+    ready = time.perf_counter()
+    for query in queries:
+        qi.query_index(query, K)
+    gc.collect()
+    os.write(report_fd, (json.dumps(dict(memory(), ready=ready)) + '\n').encode())
+    #stay alive until every worker has measured, the shared pages are shared with the live ones
+    os.read(release_fd, 1)
+
+
+def run_mode(mode, num_workers, tmp_dir):
+    '''
+    Runs one mode in this process, the master, and returns its measurements
+    '''
+    with open(os.path.join(tmp_dir, 'queries.json')) as fh:
+        queries = json.load(fh)
+    start = time.perf_counter()
+    qi = query_service(tmp_dir)
+    if mode != 'lazy':
+        preload(qi, freeze=mode == 'preload+freeze')
+    report_read, report_write = os.pipe()
+    release_read, release_write = os.pipe()
+    pids = []
+    for _ in range(num_workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(report_read)
+                os.close(release_write)
+                worker(qi, queries, report_write, release_read, mode == 'lazy')
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    os.close(report_write)
+    os.close(release_read)
+    with os.fdopen(report_read) as fh:
+        workers = [json.loads(next(fh)) for _ in range(num_workers)]
+        master = memory()
+        os.close(release_write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return {'mode': mode, 'workers': num_workers,
+            'startup': max(x['ready'] for x in workers) - start,
+            'master': master,
+            'worker_rss': sum(x['rss'] for x in workers) / num_workers,
+            'worker_uss': sum(x['uss'] for x in workers) / num_workers,
+            'total_pss': master['pss'] + sum(x['pss'] for x in workers)}
+
+
+def main(argv):
+    if argv and argv[0] == '_run':
+        print(json.dumps(run_mode(argv[1], int(argv[2]), argv[3])))
+        return
+    num_summaries = int(argv[0]) if argv else 30000
+    num_workers = int(argv[1]) if len(argv) > 1 else 8
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        data_file = os.path.join(tmp_dir, 'data.json')
+        transformed_data_file = os.path.join(tmp_dir, 'transformed_data.json')
+        queries = write_corpus(data_file, num_summaries, num_queries=60)
+        with open(os.path.join(tmp_dir, 'queries.json'), 'w') as fh:
+            json.dump(queries, fh)
+        DataTransformation(data_file, transformed_data_file).transform_data()
+        CreateIndex(STOPWORD_FILE, data_file, transformed_data_file, os.path.join(tmp_dir, 'index.txt')).create_index()
+
+        print('{} summaries, {} workers'.format(num_summaries, num_workers))
+        print('{:>15} {:>10} {:>15} {:>15} {:>15} {:>15}'.format(
+            'mode', 'startup s', 'worker RSS MiB', 'worker USS MiB', 'master PSS MiB', 'total PSS MiB'))
+        for mode in MODES:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_preload', '_run', mode,
+                                     str(num_workers), tmp_dir], check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print('{:>15} {:>10.2f} {:>15.1f} {:>15.1f} {:>15.1f} {:>15.1f}'.format(
+                mode, result['startup'], result['worker_rss'] / 2**20, result['worker_uss'] / 2**20,
+                result['master']['pss'] / 2**20, result['total_pss'] / 2**20))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
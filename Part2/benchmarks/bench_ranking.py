@@ -0,0 +1,82 @@
+'''
+Compares ranking.top_k with the ranking QueryIndex.rankDocuments used before it
+(dense per-summary vectors, list membership and a full sort).
+
+Usage (from Part2/): python -m benchmarks.bench_ranking [num_summaries ...]
+'''
+import sys
+import time
+from collections import defaultdict
+
+from Part2.index import sparse_ranking
+from Part2.index.ranking import get_ranker, top_k
+from .corpus import build_snapshot, synthetic_summaries
+
+QUERIES = [['w0', 'w1'], ['w2', 'w50', 'w900'], ['w10', 'w11', 'w12', 'w13'], ['w3000']]
+K = 10
+
+
+def legacy_rank(snapshot, terms, match_indexes, k):
+    def dotProduct(vec1, vec2):
+        if len(vec1) != len(vec2):
+            return 0
+        return sum([x * y for x, y in zip(vec1, vec2)])
+
+    docVectors = defaultdict(lambda: [0] * len(terms))
+    queryVector = [0] * len(terms)
+    for termIndex, term in enumerate(terms):
+        if term not in snapshot.index:
+            continue
+        queryVector[termIndex] = snapshot.idf[term]
+        for i, (summary_id, postings) in enumerate(snapshot.index[term]):
+            if summary_id in match_indexes:
+                docVectors[summary_id][termIndex] = snapshot.tf[term][i]
+    docScores = [[dotProduct(curDocVec, queryVector), doc] for doc, curDocVec in docVectors.items()]
+    docScores.sort(reverse=True)
+    return [x[1] for x in docScores][:k]
+
+
+def _candidates(snapshot, terms):
+    docs = set()
+    for term in terms:
+        docs.update(x[0] for x in snapshot.index.get(term, []))
+    return docs
+
+
+def run(num_summaries):
+    snapshot = build_snapshot(synthetic_summaries(num_summaries))
+    sparse_ranker = get_ranker('sparse') if sparse_ranking.np is not None else None
+    legacy_time, new_time, sparse_time = 0.0, 0.0, 0.0
+    for terms in QUERIES:
+        candidates = _candidates(snapshot, terms)
+        start = time.perf_counter()
+        #the legacy path received the candidates as a list
+        expected = legacy_rank(snapshot, terms, list(candidates), K) if num_summaries <= 20000 else None
+        legacy_time += time.perf_counter() - start
+        start = time.perf_counter()
+        result = [summary_id for _, summary_id in top_k(snapshot, terms, candidates, K)]
+        new_time += time.perf_counter() - start
+        if expected is None:
+            #list membership is quadratic, above 20k summaries the legacy scoring is timed with a set instead
+            start = time.perf_counter()
+            expected = legacy_rank(snapshot, terms, candidates, K)
+            legacy_time += time.perf_counter() - start
+        if result != expected:
+            raise AssertionError('Result order differs for {}: {} != {}'.format(terms, result, expected))
+        if sparse_ranker is not None:
+            sparse_ranker(snapshot, terms, candidates, K)   #builds the matrix once
+            start = time.perf_counter()
+            sparse_result = [summary_id for _, summary_id in sparse_ranker(snapshot, terms, candidates, K)]
+            sparse_time += time.perf_counter() - start
+            if sparse_result != expected:
+                raise AssertionError('Sparse result differs for {}: {} != {}'.format(terms, sparse_result, expected))
+    label = 'legacy' if num_summaries <= 20000 else 'legacy (set)'
+    print('{:>9} summaries  {:>12} {:9.1f} ms  top_k {:8.1f} ms  speedup {:6.1f}x'.format(
+        num_summaries, label, legacy_time * 1000, new_time * 1000, legacy_time / new_time)
+        + ('  sparse {:8.1f} ms'.format(sparse_time * 1000) if sparse_ranker is not None else ''))
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
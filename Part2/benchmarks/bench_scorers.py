@@ -0,0 +1,97 @@
+'''
+BM25 against tf-idf.
+
+    relevance   the queries of index/data.json ranked by both scorers: how many of the top k
+                results they share, and how often the best result is the same. There are no
+                relevance judgments for the corpus, so this shows how much BM25 changes the
+                rankings, the differing queries are printed to be looked at.
+    latency     the queries of a synthetic corpus of each size, per scorer: the time BM25
+                takes to derive its weights on the first query, then p50/p99 per query.
+
+Usage (from Part2/): python -m benchmarks.bench_scorers [num_summaries ...]
+'''
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import INDEX_FILE, QueryIndex, RAW_DATA_FILE, TRANSFORMED_DATA_FILE
+from Part2.index.scoring import SCORERS, get_scorer
+from Part2.index.tranform_data import DataTransformation
+from .corpus import STOPWORD_FILE, write_corpus
+
+K = 10
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def relevance():
+    with open(RAW_DATA_FILE) as json_file:
+        queries = json.load(json_file)['queries']
+    qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None)
+    overlaps, same_best = [], 0
+    for query in queries:
+        tfidf = qi._evaluate(*qi._parse_query(query), K, 'tfidf') or []
+        bm25 = qi._evaluate(*qi._parse_query(query), K, 'bm25') or []
+        if not tfidf:
+            continue
+        overlaps.append(len(set(tfidf) & set(bm25)) / len(tfidf))
+        same_best += tfidf[0] == bm25[0]
+        if tfidf != bm25:
+            print('  {!r:40} tfidf {}  bm25 {}'.format(query, tfidf[:5], bm25[:5]))
+    print('{} queries: mean top {} overlap {:.1%}, same best result {:.1%}'.format(
+        len(overlaps), K, statistics.mean(overlaps), same_best / len(overlaps)))
+
+
+def latency(num_summaries, tmp_dir):
+    data_file = os.path.join(tmp_dir, 'data.json')
+    transformed_data_file = os.path.join(tmp_dir, 'transformed_data.json')
+    index_file = os.path.join(tmp_dir, 'index.txt')
+    queries = write_corpus(data_file, num_summaries, seed=num_summaries)
+    DataTransformation(data_file, transformed_data_file).transform_data()
+    CreateIndex(STOPWORD_FILE, data_file, transformed_data_file, index_file).create_index()
+    qi = QueryIndex(STOPWORD_FILE, index_file, transformed_data_file, result_cache=None)
+    snapshot = qi.load()
+    parsed = [qi._parse_query(query) for query in queries]
+
+    for name in SCORERS:
+        start = time.perf_counter()
+        get_scorer(name).prepare(snapshot)
+        #BM25 derives the weights of a term the first time it is queried
+        for query_type, terms in parsed:
+            qi._search(query_type, terms, K, name)
+        first_pass = time.perf_counter() - start
+        times = []
+        for query_type, terms in parsed:
+            start = time.perf_counter()
+            qi._search(query_type, terms, K, name)
+            times.append((time.perf_counter() - start) * 1000)
+        print('{:>10} {:>7} {:>14.1f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+            num_summaries, name, first_pass * 1000, statistics.mean(times), statistics.median(times),
+            percentile(times, 99)))
+
+
+def main(argv):
+    sizes = [int(x) for x in argv] or [10000, 50000]
+    print('Relevance on the sample queries')
+    relevance()
+    print()
+    print('{:>10} {:>7} {:>14} {:>9} {:>9} {:>9}'.format(
+        'summaries', 'scorer', 'first pass ms', 'mean ms', 'p50 ms', 'p99 ms'))
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for num_summaries in sizes:
+            latency(num_summaries, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
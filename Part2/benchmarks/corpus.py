@@ -0,0 +1,93 @@
+import json
+import random
+
+from Part2.index.create_index import CreateIndex
+from Part2.index.scoring import collection_stats, doc_length_meta
+from Part2.index.snapshot import IndexSnapshot
+
+STOPWORD_FILE = 'index/stopwords.dat'
+
+
+def synthetic_summaries(num_summaries, vocabulary_size=20000, summary_length=60, seed=0):
+    '''
+    {summary_id: summary} with words drawn from a Zipfian vocabulary, so a few terms
+    appear in almost every summary and most terms are rare, like in the real corpus.
+    '''
+    return dict(iter_synthetic_summaries(num_summaries, vocabulary_size, summary_length, seed))
+
+
+def iter_synthetic_summaries(num_summaries, vocabulary_size=20000, summary_length=60, seed=0):
+    '''
+    The (summary_id, summary) of synthetic_summaries, generated one at a time
+    '''
+    rng = random.Random(seed)
+    vocabulary = ['w{}'.format(i) for i in range(vocabulary_size)]
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, vocabulary_size + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    for summary_id in range(num_summaries):
+        yield summary_id, ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=summary_length))
+
+
+def write_corpus(data_file, num_summaries, vocabulary_size=20000, summary_length=60, num_queries=300,
+                 num_authors=None, seed=0):
+    '''
+    Writes a corpus in the schema of index/data.json: titles, queries, summaries and authors.
+    Summaries are the synthetic_summaries, written one at a time so any scale fits in memory.
+    The queries are a third one word, a third free text and a third phrase queries, the phrases
+    taken from the summaries so they match. Returns the queries.
+    '''
+    rng = random.Random(seed + 1)
+    num_authors = num_authors or max(1, num_summaries // 3)
+    phrase_every = max(1, num_summaries // max(1, num_queries // 3))
+    phrases = []
+    with open(data_file, 'w') as fh:
+        fh.write('{"summaries": [')
+        for summary_id, summary in iter_synthetic_summaries(num_summaries, vocabulary_size, summary_length, seed):
+            if summary_id:
+                fh.write(', ')
+            fh.write(json.dumps({'id': summary_id, 'summary': summary}))
+            if summary_id % phrase_every == 0 and summary_length >= 3:
+                words = summary.split()
+                start = rng.randrange(len(words) - 2)
+                phrases.append('"{}"'.format(' '.join(words[start:start + rng.choice((2, 3))])))
+        fh.write('], "authors": [')
+        fh.write(', '.join(json.dumps({'book_id': summary_id, 'author': 'Author {}'.format(rng.randrange(num_authors))})
+                           for summary_id in range(num_summaries)))
+        fh.write('], "titles": [')
+        fh.write(', '.join(json.dumps('Title {}'.format(summary_id)) for summary_id in range(num_summaries)))
+        queries = _queries(rng, vocabulary_size, num_queries, phrases)
+        fh.write('], "queries": ')
+        fh.write(json.dumps(queries))
+        fh.write('}')
+    return queries
+
+
+def _queries(rng, vocabulary_size, num_queries, phrases):
+    #query words follow the same Zipfian distribution as the summaries
+    words = synthetic_summaries(1, vocabulary_size, summary_length=2 * num_queries, seed=rng.randrange(2**32))[0].split()
+    queries = []
+    for i in range(num_queries):
+        kind = i % 3
+        if kind == 0:
+            queries.append(words.pop())
+        elif kind == 1:
+            queries.append(' '.join(words.pop() for _ in range(rng.choice((2, 3, 4)))))
+        elif phrases:
+            queries.append(phrases[i // 3 % len(phrases)])
+    return queries
+
+
+def build_snapshot(summaries, stopword_file=STOPWORD_FILE):
+    '''
+    Indexes the summaries in memory and returns the snapshot QueryIndex would load for them
+    '''
+    ci_obj = CreateIndex(stopword_file, None, None, None)
+    ci_obj.index_summaries(summaries)
+    index = {term: [[p[0], list(p[1])] for p in postings] for term, postings in ci_obj.index.items()}
+    tf = {term: list(map(float, tfs)) for term, tfs in ci_obj.tf.items()}
+    idf = {term: float('%.4f' % (ci_obj.num_summaries / df)) for term, df in ci_obj.df.items()}
+    return IndexSnapshot(index, tf, idf, ci_obj.num_summaries,
+                         collection_stats=collection_stats(doc_length_meta(ci_obj.doc_lengths)))
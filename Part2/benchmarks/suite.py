@@ -0,0 +1,170 @@
+'''
+Benchmark suite of the search pipeline on a synthetic corpus in the data.json schema.
+
+Times every stage separately, best of --repeat runs:
+
+    transform       DataTransformation.transform_data         summaries/sec
+    create_index    CreateIndex.create_index                  summaries/sec
+    read_index      QueryIndex.read_index                     summaries/sec
+    one_word        QueryIndex.query_index, one word queries  queries/sec
+    free_text       same, free text queries                   queries/sec
+    phrase          same, phrase queries                      queries/sec
+
+The results are written as JSON. compare fails (exit status 1) when the throughput of a stage
+dropped by more than the threshold against a baseline run on the same machine.
+
+Usage (from Part2/):
+    python -m benchmarks.suite run [--summaries N] [--output results.json] [--baseline baseline.json]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.2]
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import QueryIndex
+from Part2.index.tranform_data import DataTransformation
+from .corpus import STOPWORD_FILE, write_corpus
+
+RESULTS_VERSION = 1
+THRESHOLD = 0.2     # Largest drop of throughput compare accepts, 0.2 is 20%, runs vary by ~10% on a busy machine
+QUERY_STAGES = ('one_word', 'free_text', 'phrase')
+
+
+def best_of(repeat, function):
+    '''
+    Shortest of repeat runs of function, in seconds
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_suite(num_summaries, vocabulary_size=20000, summary_length=60, num_queries=300, k=10, repeat=3, seed=0,
+              work_dir=None):
+    '''
+    Runs every stage on a fresh corpus and returns the results
+    '''
+    tmp_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        data_file = os.path.join(tmp_dir, 'data.json')
+        transformed_data_file = os.path.join(tmp_dir, 'transformed_data.json')
+        index_file = os.path.join(tmp_dir, 'index.txt')
+        queries = write_corpus(data_file, num_summaries, vocabulary_size, summary_length, num_queries, seed=seed)
+        stages = {}
+
+        def stage(name, seconds, count, unit):
+            stages[name] = {'seconds': seconds, 'count': count, 'unit': unit, 'throughput': count / seconds}
+
+        stage('transform', best_of(repeat, DataTransformation(data_file, transformed_data_file).transform_data),
+              num_summaries, 'summaries/sec')
+        #a CreateIndex builds one index, every run gets its own
+        stage('create_index', best_of(repeat, lambda: CreateIndex(STOPWORD_FILE, data_file, transformed_data_file,
+                                                                  index_file).create_index()),
+              num_summaries, 'summaries/sec')
+
+        qi = QueryIndex(STOPWORD_FILE, index_file, transformed_data_file, result_cache=None)
+        stage('read_index', best_of(repeat, qi.read_index), num_summaries, 'summaries/sec')
+        qi.load()
+        by_type = {query_type: [] for query_type in QUERY_STAGES}
+        for query in queries:
+            by_type[qi._parse_query(query)[0]].append(query)
+        for query_type, typed_queries in by_type.items():
+            if typed_queries:
+                stage(query_type, best_of(repeat, lambda: [qi.query_index(q, k) for q in typed_queries]),
+                      len(typed_queries), 'queries/sec')
+    finally:
+        shutil.rmtree(tmp_dir)
+    return {'version': RESULTS_VERSION,
+            'config': {'summaries': num_summaries, 'vocabulary_size': vocabulary_size,
+                       'summary_length': summary_length, 'queries': num_queries, 'k': k,
+                       'repeat': repeat, 'seed': seed},
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'stages': stages}
+
+
+def compare(baseline, results, threshold=THRESHOLD):
+    '''
+    [(stage, baseline throughput, throughput, relative change, regressed)] of the stages of both runs
+    '''
+    rows = []
+    for name, stage in results['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        before, after = baseline['stages'][name]['throughput'], stage['throughput']
+        change = after / before - 1
+        rows.append((name, before, after, change, change < -threshold))
+    return rows
+
+
+def print_results(results):
+    print('{:>14} {:>10} {:>14} {:>16}'.format('stage', 'seconds', 'throughput', 'unit'))
+    for name, stage in results['stages'].items():
+        print('{:>14} {:>10.3f} {:>14,.1f} {:>16}'.format(name, stage['seconds'], stage['throughput'], stage['unit']))
+
+
+def print_comparison(rows, threshold):
+    print('{:>14} {:>14} {:>14} {:>9}'.format('stage', 'baseline', 'current', 'change'))
+    for name, before, after, change, regressed in rows:
+        print('{:>14} {:>14,.1f} {:>14,.1f} {:>+8.1%} {}'.format(name, before, after, change,
+                                                                 'REGRESSION' if regressed else ''))
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print('Throughput dropped by more than {:.0%}: {}'.format(threshold, ', '.join(regressions)))
+    return not regressions
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the suite')
+    run_parser.add_argument('--summaries', type=int, default=10000)
+    run_parser.add_argument('--vocabulary', type=int, default=20000)
+    run_parser.add_argument('--length', type=int, default=60, help='words per summary')
+    run_parser.add_argument('--queries', type=int, default=300)
+    run_parser.add_argument('-k', type=int, default=10)
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='file the JSON results are written to')
+    run_parser.add_argument('--baseline', help='results to compare with, fails on a regression')
+    run_parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    compare_parser = commands.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_suite(args.summaries, args.vocabulary, args.length, args.queries, args.k, args.repeat, args.seed)
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w') as fh:
+                json.dump(results, fh, indent=2)
+        if not args.baseline:
+            return 0
+        baseline = load_results(args.baseline)
+    else:
+        baseline, results = load_results(args.baseline), load_results(args.results)
+    if baseline['config'] != results['config']:
+        print('Warning: the runs have different configurations, {} and {}'.format(baseline['config'],
+                                                                                 results['config']))
+    return 0 if print_comparison(compare(baseline, results, args.threshold), args.threshold) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,26 @@
+'''
+gunicorn configuration of the search server, read by gunicorn when started from Part2/:
+
+    gunicorn app.wsgi
+    gunicorn app.asgi -k uvicorn.workers.UvicornWorker     # the async search endpoint
+
+The app is imported by the master before it forks the workers (preload_app). Importing it
+loads the index and the summaries and freezes them (app/wsgi.py, index/preload.py), so the
+workers start without loading anything and share those pages copy-on-write.
+A sharded index starts its shard processes on first use in every worker, not in the master.
+
+Settings can be overridden with the environment: SEARCH_BIND, SEARCH_WORKERS, SEARCH_TIMEOUT.
+'''
+import os
+
+bind = os.environ.get('SEARCH_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SEARCH_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+timeout = int(os.environ.get('SEARCH_TIMEOUT', 30))
+preload_app = True
+
+
+def when_ready(server):
+    from Part2.index.query_index import _query_service
+    stats = _query_service.stats()
+    server.log.info('Index of %d summaries preloaded in %.0f ms, forking %d workers',
+                    stats['num_summaries'], stats['load_time_ms'], server.num_workers)
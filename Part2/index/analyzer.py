@@ -0,0 +1,114 @@
+import re
+from itertools import count, filterfalse
+
+from .cache import LRUCache
+from .stemmer import porter_stem
+
+QUERY_MEMO_SIZE = 4096      # Number of analyzed queries remembered by Analyzer.query_terms
+
+#Version of the analysis recorded in every index, bumped whenever the terms an analyzer produces change.
+#Indexes written before it was recorded were built by the plain analyzer.
+ANALYZER_VERSIONS = {None: 'plain-1', 'porter': 'porter-1'}
+LEGACY_ANALYZER_VERSION = ANALYZER_VERSIONS[None]
+_STEMMERS = {'porter': porter_stem}
+
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9 ]')
+
+
+def load_stopwords(stopword_file):
+    '''
+    Gets stopwords from the stopwords file, one per line
+    '''
+    with open(stopword_file, 'r') as swf:
+        return frozenset(line.rstrip() for line in swf)
+
+
+class AnalyzerMismatchError(Exception):
+    pass
+
+
+class Analyzer:
+    '''
+    Turns text into index terms: lowercase, every non-alphanumeric character is a separator,
+    stopwords are dropped and, with stemmer='porter', the remaining words are stemmed.
+    CreateIndex and QueryIndex share it, so summaries and queries are always analyzed the same way.
+
+    Stems are cached per word. CreateIndex stores the stems of the whole corpus vocabulary
+    in the index, QueryIndex loads them with load_stems so stemming a query is a dict lookup.
+    '''
+    def __init__(self, stopword_file, stemmer=None, query_memo_size=QUERY_MEMO_SIZE, learn_stems=True):
+        if stemmer not in ANALYZER_VERSIONS:
+            raise ValueError('Unknown stemmer {}'.format(stemmer))
+        self.stopwords = load_stopwords(stopword_file)
+        self.stemmer = stemmer
+        self.version = ANALYZER_VERSIONS[stemmer]
+        self._stem_word = _STEMMERS.get(stemmer)
+        self.stems = {}                     #word -> stem
+        self.learn_stems = learn_stems      #remember the stem of every new word, off on the query side
+        self._query_memo = LRUCache(query_memo_size)
+
+    def _tokens(self, text):
+        return _NON_ALPHANUMERIC.sub(' ', text.lower()).split()   #put spaces instead of non-alphanumeric characters
+
+    def _terms(self, text):
+        terms = filterfalse(self.stopwords.__contains__, self._tokens(text))
+        if self._stem_word is not None:
+            terms = map(self._stem, terms)
+        return terms
+
+    def _stem(self, word):
+        stem = self.stems.get(word)
+        if stem is None:
+            stem = self._stem_word(word)
+            if self.learn_stems:
+                self.stems[word] = stem
+        return stem
+
+    def terms(self, text):
+        '''
+        Terms of the text in order, without the stopwords
+        '''
+        return list(self._terms(text))
+
+    def positions(self, text):
+        '''
+        Lazy iterator of (term, position), positions count the terms left after removing the stopwords.
+        Built from itertools so no list of terms is made and, without stemming, no python code runs per token.
+        '''
+        return zip(self._terms(text), count())
+
+    def query_terms(self, query):
+        '''
+        Terms of a query as a tuple, memoized since the same queries keep coming back
+        '''
+        terms = self._query_memo.get(query)
+        if terms is None:
+            terms = tuple(self.terms(query))
+            self._query_memo.set(query, terms)
+        return terms
+
+    def load_stems(self, stems):
+        '''
+        Uses the stems stored in an index. Words outside its vocabulary are still stemmed,
+        they can't match anything but the query memo keeps them from being stemmed again.
+        '''
+        self.stems = stems
+
+    def check(self, version):
+        '''
+        Refuses an index built by a different analyzer, its terms wouldn't match the terms of the queries
+        '''
+        version = version or LEGACY_ANALYZER_VERSION
+        if version != self.version:
+            raise AnalyzerMismatchError('Index built by analyzer {}, queries are analyzed by {}'.format(
+                version, self.version))
+
+    def meta(self):
+        '''
+        What CreateIndex records in the index about the analysis
+        '''
+        return {'analyzer': self.version, 'stems': self.stems}
+
+    def stats(self):
+        return {'version': self.version, 'stopwords': len(self.stopwords), 'stems': len(self.stems),
+                'query_memo': self._query_memo.stats()}
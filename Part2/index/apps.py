@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class IndexConfig(AppConfig):
     name = 'index'
+
+    def ready(self):
+        from Part2.index import metrics, profiling
+        metrics.REGISTRY.enabled = getattr(settings, 'SEARCH_METRICS', True)
+        profiling.configure(getattr(settings, 'SEARCH_SLOW_QUERY_LOG', None),
+                            getattr(settings, 'SEARCH_SLOW_QUERY_THRESHOLD', profiling.SLOW_QUERY_THRESHOLD),
+                            getattr(settings, 'SEARCH_PROFILE', None))
+        #The index is preloaded by the server importing the app (app/wsgi.py, app/asgi.py), not
+        #here where every manage.py command would load it and freeze the GC
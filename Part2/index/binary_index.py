@@ -0,0 +1,307 @@
+'''
+Binary on-disk index format (little-endian)
+
+    header      magic 'SSIX', version, num_summaries, num_terms and the section offsets
+    metadata    offset and length of a JSON object written after the postings, with the
+                analyzer that built the index and the stems of its vocabulary
+    term table  one fixed size entry per term, sorted by the utf-8 bytes of the term:
+                (term offset, term length, postings offset, postings length, df, idf, max score)
+    strings     utf-8 bytes of all the terms
+    postings    per term, 4 byte aligned:
+                df float32 tf values, followed by one varint block holding for every summary
+                (summary_id delta, number of positions, position deltas...)
+
+Summary ids and positions are stored sorted, so the deltas are small and mostly fit in one byte.
+The file is memory-mapped by the readers, only the posting lists a query touches are decoded.
+'''
+import functools
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+from .cache import LRUCache
+
+
+MAGIC = b'SSIX'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHIIQQQ')   #magic, version, reserved, num_summaries, num_terms, term table, strings, postings
+_TERM_ENTRY = struct.Struct('<IIQIIdd')  #term offset, term length, postings offset, postings length, df, idf, max score
+_META_HEADER = struct.Struct('<QQ')     #metadata offset, metadata length
+
+
+class BinaryIndexError(Exception):
+    pass
+
+
+def is_binary_index(path):
+    with open(path, 'rb') as fh:
+        return fh.read(len(MAGIC)) == MAGIC
+
+
+def _encode_varint(value, out):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(buf, pos):
+    value, shift = 0, 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _encode_postings(postings, tfs):
+    '''
+    postings: [[summary_id, [positions]], ...] and the tf of every posting in the same order
+    '''
+    order = sorted(range(len(postings)), key=lambda i: postings[i][0])
+    block = bytearray(array('f', [float(tfs[i]) for i in order]).tobytes())
+    if sys.byteorder != 'little':
+        swapped = array('f', block)
+        swapped.byteswap()
+        block = bytearray(swapped.tobytes())
+    previous_id = 0
+    for i in order:
+        summary_id, positions = postings[i]
+        _encode_varint(summary_id - previous_id, block)
+        previous_id = summary_id
+        positions = sorted(positions)
+        _encode_varint(len(positions), block)
+        previous = 0
+        for position in positions:
+            _encode_varint(position - previous, block)
+            previous = position
+    return bytes(block)
+
+
+def write_binary_index(path, index, tf, idf, num_summaries, max_scores=None, meta=None):
+    '''
+    Writes the index in the binary format. The file is written next to the target and renamed into
+    place, so readers that have the old file mapped keep a consistent view.
+    max_scores defaults to the highest tf * idf of every term, meta is stored as the metadata section.
+    '''
+    terms = sorted(index.keys(), key=lambda t: t.encode('utf-8'))
+    strings = bytearray()
+    entries = []
+    blocks = []
+    postings_size = 0
+    for term in terms:
+        encoded_term = term.encode('utf-8')
+        block = _encode_postings(index[term], tf[term])
+        padding = -len(block) % 4
+        if max_scores is None:
+            max_score = max(map(float, tf[term])) * float(idf[term])
+        else:
+            max_score = max_scores[term]
+        entries.append((len(strings), len(encoded_term), postings_size, len(block),
+                        len(index[term]), float(idf[term]), max_score))
+        strings += encoded_term
+        blocks.append(block + b'\0' * padding)
+        postings_size += len(block) + padding
+
+    term_table_offset = _HEADER.size + _META_HEADER.size
+    strings_offset = term_table_offset + _TERM_ENTRY.size * len(terms)
+    postings_offset = strings_offset + len(strings)
+    postings_offset += -postings_offset % 4
+    meta = json.dumps(meta or {}).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(_HEADER.pack(MAGIC, VERSION, 0, int(num_summaries), len(terms),
+                              term_table_offset, strings_offset, postings_offset))
+        fh.write(_META_HEADER.pack(postings_offset + postings_size, len(meta)))
+        for entry in entries:
+            fh.write(_TERM_ENTRY.pack(*entry))
+        fh.write(strings)
+        fh.write(b'\0' * (postings_offset - strings_offset - len(strings)))
+        for block in blocks:
+            fh.write(block)
+        fh.write(meta)
+    os.replace(tmp_path, path)
+
+
+class BinaryIndex:
+    '''
+    Read side of the binary index.
+    Exposes the same index/tf/idf mappings as the text index, decoding posting lists on demand.
+    '''
+    def __init__(self, path, cache_size=1024):
+        self.path = path
+        with open(path, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size < _HEADER.size:
+                raise BinaryIndexError('{} is not a binary index'.format(path))
+            self._buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.num_summaries, self.num_terms,
+         self._term_table, self._strings, self._postings) = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise BinaryIndexError('{} is not a binary index'.format(path))
+        if version != VERSION:
+            raise BinaryIndexError('{} is a version {} binary index, this reader only reads version {}'.format(
+                path, version, VERSION))
+        self.version = version
+        self._meta_section = _META_HEADER.unpack_from(self._buf, _HEADER.size)
+        self.size = size
+        #decoded postings of the most recent terms. Nothing kept by the index refers back to it,
+        #so it is freed as soon as the last snapshot using it goes, even once gc.freeze()'d
+        self._decoded = LRUCache(cache_size)
+
+    @property
+    def index(self):
+        return _PostingsView(self, 0)
+
+    @property
+    def tf(self):
+        return _PostingsView(self, 1)
+
+    @property
+    def idf(self):
+        return _IdfView(self)
+
+    def _entry(self, i):
+        return _TERM_ENTRY.unpack_from(self._buf, self._term_table + i * _TERM_ENTRY.size)
+
+    def _term_bytes(self, entry):
+        start = self._strings + entry[0]
+        return self._buf[start:start + entry[1]]
+
+    def find(self, term):
+        '''
+        Binary search over the sorted term table, returns the term entry or None
+        '''
+        key = term.encode('utf-8')
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            current = self._term_bytes(entry)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return entry
+        return None
+
+    def terms(self):
+        for i in range(self.num_terms):
+            yield self._term_bytes(self._entry(i)).decode('utf-8')
+
+    def _decode_postings(self, term):
+        entry = self.find(term)
+        if entry is None:
+            raise KeyError(term)
+        offset, df = entry[2], entry[4]
+        start = self._postings + offset
+        buf = self._buf
+        tfs = list(struct.unpack_from('<%df' % df, buf, start))
+        pos = start + 4 * df
+        postings = []
+        summary_id = 0
+        for _ in range(df):
+            delta, pos = _decode_varint(buf, pos)
+            summary_id += delta
+            count, pos = _decode_varint(buf, pos)
+            positions = []
+            previous = 0
+            for _ in range(count):
+                delta, pos = _decode_varint(buf, pos)
+                previous += delta
+                positions.append(previous)
+            postings.append([summary_id, positions])
+        #the postings are written sorted by summary_id, the ids and positions are ready for galloping
+        return postings, tfs, [x[0] for x in postings], [x[1] for x in postings]
+
+    def _decode(self, term):
+        decoded = self._decoded.get(term)
+        if decoded is None:
+            decoded = self._decode_postings(term)
+            self._decoded.set(term, decoded)
+        return decoded
+
+    def summary_ids(self, term):
+        return self._decode(term)[2]
+
+    def positions(self, term):
+        return self._decode(term)[3]
+
+    @functools.cached_property
+    def meta(self):
+        '''
+        Metadata section as a dict
+        '''
+        offset, length = self._meta_section
+        return json.loads(self._buf[offset:offset + length].decode('utf-8'))
+
+    def max_score(self, term):
+        '''
+        Highest tf * idf of the term, None for unknown terms
+        '''
+        entry = self.find(term)
+        if entry is None:
+            return None
+        return entry[6]
+
+    def memory_footprint(self):
+        #pages of the mapping are shared by every process that maps the file
+        return self.size
+
+
+class _PostingsView(Mapping):
+    def __init__(self, binary_index, field):
+        self._binary_index = binary_index
+        self._field = field
+
+    def __getitem__(self, term):
+        return self._binary_index._decode(term)[self._field]
+
+    def __contains__(self, term):
+        return isinstance(term, str) and self._binary_index.find(term) is not None
+
+    def __iter__(self):
+        return self._binary_index.terms()
+
+    def __len__(self):
+        return self._binary_index.num_terms
+
+
+class _IdfView(_PostingsView):
+    def __init__(self, binary_index):
+        super().__init__(binary_index, None)
+
+    def __getitem__(self, term):
+        entry = self._binary_index.find(term)
+        if entry is None:
+            raise KeyError(term)
+        return entry[5]
+
+
+def convert_text_index(text_index_file, binary_index_file):
+    '''
+    Converts an index.txt written by CreateIndex into the binary format
+    '''
+    from .snapshot import read_text_index
+    from .index_meta import read_text_meta
+    index, tf, idf, num_summaries = read_text_index(text_index_file)
+    meta = read_text_meta(text_index_file)
+    write_binary_index(binary_index_file, index, tf, idf, num_summaries,
+                       meta={key: meta[key] for key in ('analyzer', 'stems', 'doc_lengths', 'avg_doc_length')
+                             if key in meta})
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python -m Part2.index.binary_index <index.txt> <index.bin>')
+        sys.exit(1)
+    convert_text_index(sys.argv[1], sys.argv[2])
@@ -1,41 +1,67 @@
+import os
 import sys
-import re
 from collections import defaultdict
 from array import array
 import math
 from .tranform_data import *
+from .binary_index import write_binary_index
+from .index_meta import write_text_meta
+from .analyzer import Analyzer
+from .scoring import doc_length_meta
+
+
+def summary_postings(analyzer, summary_id, summary):
+    '''
+    Postings of one summary as {term: ([summary_id, positions], tf)}, tf formatted as it is written to the index
+    '''
+    #build the index for the current page
+    term_dict={}
+    for term, position in analyzer.positions(summary):
+        try:
+            term_dict[term][1].append(position)
+        except:
+            term_dict[term]=[summary_id, array('I',[position])]
+
+    #normalizing the data
+    norm=0
+    for term, posting in term_dict.items():
+        norm+=len(posting[1])**2
+    norm=math.sqrt(norm)
+
+    #calculate the tf weights
+    return {term: (posting, '%.4f' % (len(posting[1])/norm)) for term, posting in term_dict.items()}
 
 
 class CreateIndex:
 
-    def __init__(self, stopword_file, raw_data_file, target_data_file, index_file):
+    def __init__(self, stopword_file, raw_data_file, target_data_file, index_file, index_format='text', stemmer=None,
+                 workers=1, memory_budget=None, shards=1):
         self.index=defaultdict(list)    #the inverted index
         self.tf=defaultdict(list)       #term frequencies of terms in each summary
         self.df=defaultdict(int)        #frequencies of terms in the complete data
         self.num_summaries=0            #Stores total number of summaries
-        self.stopwords = self._get_stopwords(stopword_file) #Stores all the stopwords defined in stopword file
+        self.doc_lengths={}             #number of terms of each summary, for BM25
+        self.analyzer = Analyzer(stopword_file, stemmer=stemmer) #Splits summaries into terms, shared with QueryIndex
+        self.stopwords = self.analyzer.stopwords #Stores all the stopwords defined in stopword file
         self.raw_data_file = raw_data_file #This is the raw data file got by web scraping
         self.target_data_file = target_data_file
         self.index_file = index_file # This is the final index file that is created
-
-    def _get_stopwords(self,stopword_file):
-        '''
-        Gets stopwords from the stopwords file
-        '''
-        with open(stopword_file, 'r') as stopword_file:
-            sw=[line.rstrip() for line in stopword_file]
-            stopwords=dict.fromkeys(sw)
-        return stopwords
+        self.index_format = index_format # 'text' for the pipe delimited index, 'binary' for the memory-mapped one
+        self.stopword_file = stopword_file
+        self.stemmer = stemmer
+        self.workers = workers # More than 1 streams the summaries through a process pool, see parallel_build.py
+        self.memory_budget = memory_budget # Bytes the parallel build may use for summaries in flight
+        self.shards = shards # More than 1 splits the index into shards, index_file is then their manifest, see shards.py
+        if workers > 1 and index_format != 'text':
+            raise ValueError("The parallel build writes the text index, convert it with binary_index.convert_text_index")
+        if shards > 1 and (workers > 1 or index_format != 'text'):
+            raise ValueError("Shards are text indexes built by the serial build")
 
     def _get_terms(self, line):
         '''
         Given a stream of text, get the terms from the text
         '''
-        line=line.lower()
-        line=re.sub(r'[^a-z0-9 ]',' ',line) #put spaces instead of non-alphanumeric characters
-        line=line.split()
-        line=[x for x in line if x not in self.stopwords]  #eliminate the stopwords
-        return line
+        return self.analyzer.terms(line)
 
     def _get_transformed_data(self):
         '''
@@ -51,7 +77,15 @@ class CreateIndex:
         Write the index to the file
         Format: keyword|summary_id:position|tf|idf
         '''
-        with open(self.index_file, 'w') as index_file:
+        if self.index_format == 'binary':
+            self._write_to_binary_file()
+            return
+        if self.shards > 1:
+            self._write_shards()
+            return
+        #written next to the index and renamed over it, a server reloading the index never reads half of it
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as index_file:
             index_file.write(str(self.num_summaries))
             index_file.write('\n')
             self.num_summaries=float(self.num_summaries)
@@ -66,40 +100,76 @@ class CreateIndex:
                 idfData='%.4f' % (self.num_summaries/self.df[term])
                 index_file.write('|'.join((term, postingData, tfData, idfData)))
                 index_file.write('\n')
+        write_text_meta(self.index_file, dict(self.analyzer.meta(), max_scores=self._max_scores(self._idf()),
+                                              **doc_length_meta(self.doc_lengths)), tmp_file)
+        os.replace(tmp_file, self.index_file)
 
-    def create_index(self):
+    def _write_to_binary_file(self):
         '''
-        Creates the index on summaries and saves it into a file.
-        Also calculates the term frequencies and inverse document frequency.
+        Write the index in the binary format, see binary_index.py
+        '''
+        idf=self._idf()
+        write_binary_index(self.index_file, self.index, self.tf, idf, self.num_summaries,
+                           max_scores=self._max_scores(idf),
+                           meta=dict(self.analyzer.meta(), **doc_length_meta(self.doc_lengths)))
+
+    def _write_shards(self):
+        '''
+        Write the index as document partitioned shards, see shards.py
         '''
-        summary_dict = self._get_transformed_data()
-        for key,summary in  summary_dict['summaries'].items():
-            terms=self._get_terms(summary)
+        from .shards import write_shards
+        write_shards(self.index_file, self.index, self.tf, self.df, self.num_summaries, self.shards,
+                     self.analyzer.meta(), self.doc_lengths)
+
+    def _idf(self):
+        #same rounding as the idf written to the text index
+        return {term: float('%.4f' % (self.num_summaries/df)) for term, df in self.df.items()}
+
+    def _max_scores(self, idf):
+        '''
+        Upper bound of the score a summary can get from each term (its highest tf * idf).
+        Used by the WAND evaluator to skip summaries that can't make it into the top k.
+        '''
+        return {term: max(map(float, tfs))*idf[term] for term, tfs in self.tf.items()}
+
+    def index_summaries(self, summaries):
+        '''
+        Adds the given {summary_id: summary}, or iterable of (summary_id, summary), to the in-memory index.
+        Also calculates the term frequencies and document frequencies.
+        '''
+        if hasattr(summaries, 'items'):
+            summaries = summaries.items()
+        for key,summary in  summaries:
             self.num_summaries+=1
 
-            #build the index for the current page
-            term_dict={}
-            for position, term in enumerate(terms):
-                try:
-                    term_dict[term][1].append(position)
-                except:
-                    term_dict[term]=[key, array('I',[position])]
-
-            #normalizing the data
-            norm=0
-            for term, posting in term_dict.items():
-                norm+=len(posting[1])**2
-            norm=math.sqrt(norm)
-
-            #calculate the tf and df weights
-            for term, posting in term_dict.items():
-                self.tf[term].append('%.4f' % (len(posting[1])/norm))
+            #merge the postings of the current page with the main index
+            postings = summary_postings(self.analyzer, key, summary)
+            if postings:
+                self.doc_lengths[key] = sum(len(posting[1]) for posting, tf in postings.values())
+            for term, (posting, tf) in postings.items():
+                self.tf[term].append(tf)
                 self.df[term]+=1
+                self.index[term].append(posting)
 
-            #merge the current index with the main index
-            for term, position in term_dict.items():
-                self.index[term].append(position)
+    def create_index(self):
+        '''
+        Creates the index on summaries and saves it into a file.
+        Also calculates the term frequencies and inverse document frequency.
+        '''
+        summaries = DataTransformation(self.raw_data_file, self.target_data_file).stream_summaries()
+        if self.workers > 1:
+            self._build_in_parallel(summaries)
+            return
+        self.index_summaries(summaries)
         self._write_to_file()
+
+    def _build_in_parallel(self, summaries):
+        from .parallel_build import ParallelIndexBuilder
+        options = {'memory_budget': self.memory_budget} if self.memory_budget else {}
+        builder = ParallelIndexBuilder(self.stopword_file, self.index_file, workers=self.workers,
+                                       stemmer=self.stemmer, **options)
+        builder.build(summaries)
+        self.num_summaries = builder.num_summaries
         
     
 if __name__=="__main__":
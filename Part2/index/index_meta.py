@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+
+HASH_CHUNK_SIZE = 1 << 20   # Bytes read at a time when hashing an index file
+
+
+def meta_file(index_file):
+    '''
+    The text index keeps its build time statistics in a JSON file next to it
+    '''
+    return index_file + '.meta.json'
+
+
+def file_signature(path):
+    '''
+    Cheap change detection for index artifacts: (mtime_ns, size)
+    '''
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def file_hash(path):
+    '''
+    Hash of the content of a file, for when its signature changed but not necessarily its content
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_text_meta(index_file, meta, written_file=None):
+    '''
+    Writes the metadata of a freshly written text index. The signature and the hash of the index
+    are recorded, so metadata left behind by an older build of the index is detected and ignored.
+    written_file is the new index while it waits to be renamed to index_file: writing the
+    metadata first, a reader never finds the new index next to the old metadata.
+    The rename keeps the mtime and size, so the signature is the one of index_file once in place.
+    '''
+    written_file = written_file or index_file
+    meta = dict(meta, index_signature=list(file_signature(written_file)), index_hash=file_hash(written_file))
+    tmp_file = meta_file(index_file) + '.tmp'
+    with open(tmp_file, 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_file, meta_file(index_file))
+
+
+def read_text_meta(index_file):
+    try:
+        with open(meta_file(index_file)) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    #same signature, the file wasn't touched since the metadata was written. Otherwise only the
+    #content tells: a copy or a checkout of the same index matches, a rebuild of the same size doesn't
+    if (meta.get('index_signature') != list(file_signature(index_file))
+            and meta.get('index_hash') != file_hash(index_file)):
+        return {}
+    return meta
@@ -0,0 +1,194 @@
+'''
+Counters and histograms of the search path, exposed in the Prometheus text format on /metrics.
+
+Metrics are created once, at import time, in the REGISTRY of the process and updated by the
+code they measure. An update takes a lock and adds to a couple of numbers, a few microseconds,
+so the instrumentation is meant to stay on in production (benchmarks/bench_metrics.py). REGISTRY.enabled = False turns
+every update into a no-op.
+
+Every process keeps its own metrics: with several workers, a scrape sees the worker that answered it.
+
+    search_request_seconds{endpoint}            search requests, from the body parsed to the response built
+    search_stage_seconds{stage}                 read_index, parse, evaluate, serialize and authors
+    search_query_seconds{query_type,scorer}     evaluation of one distinct query, without the result cache
+    search_query_candidates{query_type}         summaries scored by a query
+    search_query_postings_bytes{query_type}     postings of the query terms, as laid out in the compact store
+    search_result_cache_total{result}           result cache hits and misses
+'''
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+BYTES_BUCKETS = tuple(4 ** i for i in range(4, 14))    # 256 B to 64 MiB
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}   #label values -> value
+
+    def _labels(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError('{} takes the labels {}'.format(self.name, self.labelnames))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} {}'.format(self.name, self.kind)]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self._registry.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._labels(labels), 0)
+
+    def _samples(self, key, value):
+        return ['{}{} {}'.format(self.name, self._label_text(key), _number(value))]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not self._registry.enabled:
+            return
+        key = self._labels(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            observed = self._values.get(key)
+            if observed is None:
+                #count per bucket, the last one is +Inf, then the sum
+                observed = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            observed[i] += 1
+            observed[-1] += value
+
+    def time(self, **labels):
+        '''
+        Context manager observing the seconds its block takes
+        '''
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        observed = self._values.get(self._labels(labels))
+        return sum(observed[:-1]) if observed else 0
+
+    def sum(self, **labels):
+        observed = self._values.get(self._labels(labels))
+        return observed[-1] if observed else 0.0
+
+    def _samples(self, key, observed):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), observed[:-1]):
+            cumulative += count
+            lines.append('{}_bucket{} {}'.format(self.name, self._label_text(key, [('le', _number(bound))]),
+                                                cumulative))
+        lines.append('{}_sum{} {}'.format(self.name, self._label_text(key), _number(observed[-1])))
+        lines.append('{}_count{} {}'.format(self.name, self._label_text(key), cumulative))
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    '''
+    The metrics of a process, by name. Asking for a metric that exists returns it.
+    '''
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError('{} is already a {}'.format(name, metric.kind))
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        '''
+        All the metrics in the Prometheus text exposition format
+        '''
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+REGISTRY = Registry()
+
+request_seconds = REGISTRY.histogram('search_request_seconds', 'Time to answer a search request', ('endpoint',))
+stage_seconds = REGISTRY.histogram('search_stage_seconds', 'Time spent in each stage of the search path', ('stage',))
+query_seconds = REGISTRY.histogram('search_query_seconds', 'Time to evaluate a query, the result cache left out',
+                                   ('query_type', 'scorer'))
+query_candidates = REGISTRY.histogram('search_query_candidates', 'Summaries scored by a query', ('query_type',),
+                                      buckets=SIZE_BUCKETS)
+query_postings_bytes = REGISTRY.histogram('search_query_postings_bytes', 'Bytes of the postings of the query terms',
+                                          ('query_type',), buckets=BYTES_BUCKETS)
+result_cache_lookups = REGISTRY.counter('search_result_cache_total', 'Result cache lookups', ('result',))
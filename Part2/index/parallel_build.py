@@ -0,0 +1,178 @@
+'''
+Streaming, parallel build of the text index for corpora that don't fit in memory.
+
+Summaries are read from any iterable of (summary_id, summary) and cut into chunks.
+A process pool analyzes the chunks, every worker writes the postings of its chunk to a run
+file sorted by term. The runs are then merged with a k-way heap merge straight into the
+index file, one term at a time, so neither step holds the whole index in memory.
+
+Run file lines: term \t summary_id \t positions \t tf, sorted by term and within a term in
+the order the summaries were read. The merge is stable, so every posting list comes out in
+the same order as with CreateIndex.index_summaries and only the order of the lines differs.
+'''
+import heapq
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+from .analyzer import Analyzer
+from .create_index import summary_postings
+from .index_meta import write_text_meta
+from .scoring import doc_length_meta
+
+BUILD_WORKERS = os.cpu_count() or 1
+BUILD_MEMORY_BUDGET = 512 * 2**20   # Bytes the chunks being analyzed may take, shared by all the workers
+MERGE_FAN_IN = 64                   # Most runs merged at once, more runs are merged in several passes
+
+#Rough memory taken by the postings of one character of summary text while its chunk is analyzed
+_BYTES_PER_CHAR = 48
+
+_analyzer = None    #analyzer of the worker process
+
+
+def _init_worker(stopword_file, stemmer):
+    global _analyzer
+    _analyzer = Analyzer(stopword_file, stemmer=stemmer)
+
+
+def _index_chunk(run_file, chunk):
+    '''
+    Analyzes a chunk of summaries in a worker and writes its run.
+    Returns the stems of the words of the chunk and the lengths of its summaries, for the index metadata.
+    '''
+    _analyzer.stems = {}
+    chunk_index = {}
+    doc_lengths = {}
+    for summary_id, summary in chunk:
+        postings = summary_postings(_analyzer, summary_id, summary)
+        if postings:
+            doc_lengths[summary_id] = sum(len(posting[1]) for posting, tf in postings.values())
+        for term, (posting, tf) in postings.items():
+            chunk_index.setdefault(term, []).append((summary_id, posting[1], tf))
+    with open(run_file, 'w') as fh:
+        for term in sorted(chunk_index):
+            for summary_id, positions, tf in chunk_index[term]:
+                fh.write('{}\t{}\t{}\t{}\n'.format(term, summary_id, ','.join(map(str, positions)), tf))
+    return _analyzer.stems, doc_lengths
+
+
+def _read_run(run_file):
+    with open(run_file) as fh:
+        for line in fh:
+            yield line.rstrip('\n').split('\t')
+
+
+class ParallelIndexBuilder:
+    '''
+    Builds the same index as CreateIndex, with the summaries analyzed by a pool of worker
+    processes and the postings merged from sorted runs on disk.
+
+    memory_budget bounds the summary chunks in flight: at most two chunks per worker are
+    queued or being analyzed, each sized so their postings fit in the budget.
+    '''
+    def __init__(self, stopword_file, index_file, workers=BUILD_WORKERS, memory_budget=BUILD_MEMORY_BUDGET,
+                 stemmer=None, merge_fan_in=MERGE_FAN_IN):
+        self.stopword_file = stopword_file
+        self.index_file = index_file
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.stemmer = stemmer
+        self.merge_fan_in = merge_fan_in
+        self.analyzer_version = Analyzer(stopword_file, stemmer=stemmer).version
+        self.chunk_chars = max(1, memory_budget // (2 * workers * _BYTES_PER_CHAR))
+        self.num_summaries = 0
+        self.num_runs = 0
+        self.stems = {}
+        self.doc_lengths = {}
+
+    def _chunks(self, summaries):
+        chunk, chars = [], 0
+        for summary_id, summary in summaries:
+            chunk.append((summary_id, summary))
+            chars += len(summary)
+            if chars >= self.chunk_chars:
+                yield chunk
+                chunk, chars = [], 0
+        if chunk:
+            yield chunk
+
+    def build(self, summaries):
+        '''
+        Indexes an iterable of (summary_id, summary) and writes the index file and its metadata
+        '''
+        run_dir = tempfile.mkdtemp(prefix='runs-', dir=os.path.dirname(os.path.abspath(self.index_file)))
+        try:
+            runs = self._write_runs(summaries, run_dir)
+            while len(runs) > self.merge_fan_in:
+                runs = self._merge_pass(runs)
+            self._write_index(runs)
+        finally:
+            shutil.rmtree(run_dir)
+
+    def _write_runs(self, summaries, run_dir):
+        runs = []
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.stopword_file, self.stemmer)) as executor:
+            for chunk in self._chunks(summaries):
+                self.num_summaries += len(chunk)
+                run_file = os.path.join(run_dir, 'run-{}'.format(len(runs)))
+                runs.append(run_file)
+                pending.append(executor.submit(_index_chunk, run_file, chunk))
+                if len(pending) >= 2 * self.workers:
+                    self._add_chunk_meta(*pending.popleft().result())
+            while pending:
+                self._add_chunk_meta(*pending.popleft().result())
+        self.num_runs = len(runs)
+        return runs
+
+    def _add_chunk_meta(self, stems, doc_lengths):
+        self.stems.update(stems)
+        self.doc_lengths.update(doc_lengths)
+
+    def _merge_pass(self, runs):
+        '''
+        Merges consecutive groups of merge_fan_in runs, which keeps the merge stable
+        '''
+        merged = []
+        for start in range(0, len(runs), self.merge_fan_in):
+            group = runs[start:start + self.merge_fan_in]
+            run_file = '{}-{}'.format(group[0], len(group))
+            with open(run_file, 'w') as fh:
+                for record in heapq.merge(*map(_read_run, group), key=itemgetter(0)):
+                    fh.write('\t'.join(record))
+                    fh.write('\n')
+            for path in group:
+                os.remove(path)
+            merged.append(run_file)
+        self.num_runs += len(merged)
+        return merged
+
+    def _write_index(self, runs):
+        '''
+        Merges the runs into the index, same format as CreateIndex._write_to_file
+        '''
+        num_summaries = float(self.num_summaries)
+        max_scores = {}
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as index_file:
+            index_file.write(str(self.num_summaries))
+            index_file.write('\n')
+            merged = heapq.merge(*map(_read_run, runs), key=itemgetter(0))
+            for term, records in groupby(merged, key=itemgetter(0)):
+                postinglist, tfs = [], []
+                for _, summary_id, positions, tf in records:
+                    postinglist.append(':'.join([summary_id, positions]))
+                    tfs.append(tf)
+                idfData = '%.4f' % (num_summaries/len(tfs))
+                index_file.write('|'.join((term, ';'.join(postinglist), ','.join(tfs), idfData)))
+                index_file.write('\n')
+                max_scores[term] = max(map(float, tfs))*float(idfData)
+        write_text_meta(self.index_file, dict({'analyzer': self.analyzer_version, 'stems': self.stems,
+                                               'max_scores': max_scores}, **doc_length_meta(self.doc_lengths)),
+                        tmp_file)
+        os.replace(tmp_file, self.index_file)
@@ -0,0 +1,77 @@
+from bisect import bisect_left
+
+
+def _gallop(values, target, lo):
+    '''
+    Index of the first value >= target at or after lo.
+    Probes lo+1, lo+2, lo+4, ... before the binary search, so advancing a cursor by a few
+    entries is cheap while long jumps still take logarithmic time.
+    '''
+    n = len(values)
+    if lo >= n or values[lo] >= target:
+        return lo
+    step = 1
+    hi = lo + 1
+    while hi < n and values[hi] < target:
+        lo = hi
+        step *= 2
+        hi = lo + step
+    return bisect_left(values, target, lo + 1, min(hi, n))
+
+
+def phrase_matches(snapshot, terms):
+    '''
+    Summary ids (ascending) in which the terms appear consecutively.
+
+    The rarest term drives the search: only its summaries are visited, the other posting lists
+    are advanced to them with galloping cursors. Inside a summary the positions are checked
+    at their offset in the phrase, again starting from the rarest term, and the summary is
+    accepted at the first full match. Nothing is copied or shifted.
+    '''
+    for term in terms:
+        if term not in snapshot.index:
+            #if a term doesn't appear in the index there can't be any summary matching it
+            return []
+    if not terms:
+        return []
+
+    #(summary_ids, positions) of every term occurrence, with its offset in the phrase, rarest first
+    occurrences = sorted(((snapshot.phrase_postings(term), offset) for offset, term in enumerate(terms)),
+                         key=lambda x: len(x[0][0]))
+    (driver_ids, driver_positions), driver_offset = occurrences[0]
+    others = occurrences[1:]
+    cursors = [0] * len(others)
+
+    result = []
+    for i, summary_id in enumerate(driver_ids):
+        #intersect the summary ids
+        in_all = True
+        for j, ((summary_ids, _), _) in enumerate(others):
+            pos = _gallop(summary_ids, summary_id, cursors[j])
+            cursors[j] = pos
+            if pos == len(summary_ids):
+                return result
+            if summary_ids[pos] != summary_id:
+                in_all = False
+                break
+        if not in_all:
+            continue
+
+        #check the positions of every term relative to the start of the phrase
+        position_cursors = [0] * len(others)
+        for position in driver_positions[i]:
+            start = position - driver_offset
+            if start < 0:
+                continue
+            matched = True
+            for j, ((_, positions), offset) in enumerate(others):
+                term_positions = positions[cursors[j]]
+                pos = _gallop(term_positions, start + offset, position_cursors[j])
+                position_cursors[j] = pos
+                if pos == len(term_positions) or term_positions[pos] != start + offset:
+                    matched = False
+                    break
+            if matched:
+                result.append(summary_id)
+                break
+    return result
@@ -0,0 +1,178 @@
+'''
+Compact in-memory layout of the postings of a loaded index.
+
+The list layout of read_text_index costs a Python list, an int object and a list of int
+objects per posting, plus a float object per tf. The compact layout keeps all the postings
+of the index in four flat arrays of a PostingsStore:
+
+    summary_ids  uint32, the postings of every term contiguous and sorted by summary_id
+    tfs          float32, parallel to summary_ids
+    offsets      uint32, start of the positions of every posting, one more entry than postings
+    positions    uint32, the positions of all the postings one after the other
+
+and every term only gets a small object with the range of its postings. The ranges behave
+like the lists: index[term] is a sequence of (summary_id, positions) and tf[term] a sequence
+of tf, so the rest of the code reads either layout. tf is rounded to float32 like in the
+binary index.
+'''
+from array import array
+from collections.abc import Sequence
+
+POSTINGS_LAYOUTS = ('lists', 'compact')
+POSTINGS_LAYOUT = 'compact'     # Layout of the text and segmented indexes once loaded
+
+
+class PostingsStore:
+    '''
+    Flat arrays holding the postings of all the terms of one index
+    '''
+    __slots__ = ('summary_ids', 'tfs', 'offsets', 'positions')
+
+    def __init__(self):
+        self.summary_ids = array('I')
+        self.tfs = array('f')
+        self.offsets = array('I', [0])
+        self.positions = array('I')
+
+    def add(self, postings, tfs):
+        '''
+        Appends the postings of a term, [[summary_id, [positions]], ...] and their tf in the same order.
+        Returns its (CompactPostings, CompactTfs).
+        '''
+        start = len(self.summary_ids)
+        order = range(len(postings))
+        if any(postings[i - 1][0] > postings[i][0] for i in range(1, len(postings))):
+            order = sorted(order, key=lambda i: postings[i][0])
+        for i in order:
+            summary_id, positions = postings[i]
+            self.summary_ids.append(summary_id)
+            self.tfs.append(float(tfs[i]))
+            self.positions.extend(positions)
+            self.offsets.append(len(self.positions))
+        stop = len(self.summary_ids)
+        return CompactPostings(self, start, stop), CompactTfs(self, start, stop)
+
+    def buffers(self):
+        return (self.summary_ids, self.tfs, self.offsets, self.positions)
+
+    def nbytes(self):
+        return sum(len(buffer) * buffer.itemsize for buffer in self.buffers())
+
+
+class _Range(Sequence):
+    __slots__ = ('store', 'start', 'stop')
+
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def _index(self, i):
+        if i < 0:
+            i += self.stop - self.start
+        if not 0 <= i < self.stop - self.start:
+            raise IndexError('postings index out of range')
+        return self.start + i
+
+    def __eq__(self, other):
+        if isinstance(other, (_Range, list, tuple)):
+            return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self))
+
+
+class CompactPostings(_Range):
+    '''
+    Postings of one term: a sequence of (summary_id, positions) sorted by summary_id,
+    positions being a read-only view of the store
+    '''
+    __slots__ = ()
+
+    @property
+    def summary_ids(self):
+        return memoryview(self.store.summary_ids)[self.start:self.stop]
+
+    @property
+    def tfs(self):
+        return memoryview(self.store.tfs)[self.start:self.stop]
+
+    def positions_of(self, i):
+        return _positions(self.store, self._index(i))
+
+    def position_lists(self):
+        return _PositionLists(self.store, self.start, self.stop)
+
+    def __getitem__(self, i):
+        i = self._index(i)
+        return self.store.summary_ids[i], _positions(self.store, i)
+
+    def __iter__(self):
+        summary_ids, offsets = self.store.summary_ids, self.store.offsets
+        positions = memoryview(self.store.positions)
+        for i in range(self.start, self.stop):
+            yield summary_ids[i], positions[offsets[i]:offsets[i + 1]]
+
+    def __eq__(self, other):
+        if isinstance(other, (_Range, list, tuple)):
+            return len(self) == len(other) and all(
+                x[0] == y[0] and list(x[1]) == list(y[1]) for x, y in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+
+class CompactTfs(_Range):
+    '''
+    tf of the postings of one term, in the order of its CompactPostings
+    '''
+    __slots__ = ()
+
+    def __getitem__(self, i):
+        return self.store.tfs[self._index(i)]
+
+    def __iter__(self):
+        return iter(memoryview(self.store.tfs)[self.start:self.stop])
+
+
+class _PositionLists(_Range):
+    '''
+    positions of every posting of a term, for phrase matching
+    '''
+    __slots__ = ()
+
+    def __getitem__(self, i):
+        return _positions(self.store, self._index(i))
+
+
+def _positions(store, i):
+    offsets = store.offsets
+    return memoryview(store.positions)[offsets[i]:offsets[i + 1]]
+
+
+def compact_index(index, tf):
+    '''
+    index and tf of the list layout copied into one PostingsStore.
+    The lists are left to the caller, both layouts are in memory until it drops them.
+    To never hold more than one term in the list layout, compact while parsing:
+    read_text_index(..., layout='compact').
+    '''
+    store = PostingsStore()
+    compact, compact_tf = {}, {}
+    for term, postings in index.items():
+        compact[term], compact_tf[term] = store.add(postings, tf[term])
+    return compact, compact_tf
+
+
+def num_postings(index):
+    return sum(len(postings) for postings in index.values())
+
+
+def num_positions(index):
+    return sum(len(positions) for postings in index.values() for _, positions in postings)
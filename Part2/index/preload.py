@@ -0,0 +1,66 @@
+'''
+Loading the index before the server forks its workers.
+
+With gunicorn --preload (gunicorn.conf.py) the master imports the app, which loads the index
+and the summaries once (preload_server, called by app/wsgi.py and app/asgi.py), and every worker
+forked afterwards shares their pages copy-on-write instead of loading its own copy.
+The other manage.py commands (migrate, shell, test) never import the app and load nothing.
+
+Sharing only lasts while nothing writes to the pages. The cyclic GC does: every full
+collection walks the loaded objects and writes to their GC headers, so a worker ends up with a
+private copy of most of the index after its first collections. preload() hands everything
+loaded to gc.freeze(), which moves it to a permanent generation the collector never looks at.
+Reference counting still writes to the objects a query touches, the compact postings layout
+(postings.py) keeps those few: a term is a handful of objects over shared arrays.
+
+Frozen objects are only ever freed by reference counting. A snapshot swapped out by a reload
+must not sit in a reference cycle, or every reload would leak a whole index: the binary index,
+the BM25 weights and the segment views don't refer back to what holds them.
+
+The weights of the default scorer are computed before the fork too, BM25 would otherwise
+compute them per term in every worker. Not for a memory-mapped index: its pages are shared
+as they are, decoding all of them would put a private copy of the index in the master.
+
+The GC is also off while the index loads. Loading allocates millions of objects that all
+live on, the collections that would run meanwhile find nothing to free.
+'''
+import gc
+import time
+
+from .scoring import get_scorer
+from .snapshot import IndexSnapshot
+
+
+def preload(query_service, freeze=True):
+    '''
+    Loads the index and the summaries of query_service and freezes them.
+    Returns the seconds it took.
+    '''
+    start = time.perf_counter()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        snapshot = query_service.load()
+        if isinstance(snapshot, IndexSnapshot):
+            #what the default scorer derives from the snapshot, shared by the workers too
+            get_scorer(query_service.scorer).prepare(snapshot, eager=snapshot.backing is None)
+    finally:
+        if enabled:
+            gc.enable()
+    if freeze:
+        #whatever is garbage now would stay forever once frozen
+        gc.collect()
+        gc.freeze()
+    return time.perf_counter() - start
+
+
+def preload_server():
+    '''
+    Preloads the query service of the server as the settings ask, when the server imports its app.
+    Returns the seconds it took, None if SEARCH_PRELOAD_INDEX is off.
+    '''
+    from django.conf import settings
+    if not getattr(settings, 'SEARCH_PRELOAD_INDEX', True):
+        return None
+    from .query_index import _query_service
+    return preload(_query_service, freeze=getattr(settings, 'SEARCH_GC_FREEZE', True))
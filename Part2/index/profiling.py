@@ -0,0 +1,285 @@
+'''
+Slow query log and opt-in profiling of the search requests.
+
+A request answered by SearchView.post or QueryIndex.query_index is traced: its stage timings
+(read_index, parse, evaluate, serialize, authors) and every query it evaluates, with the
+normalized query, the summaries scored and the bytes of postings read. Requests slower than
+the threshold are appended to the log as one JSON object per line.
+
+With profiling on, the request also runs under cProfile and its entry carries the functions
+that took the most time. cProfile slows Python code down by about 2x, so it is opt-in:
+
+    profile None        never
+    profile 'request'   the requests that ask for it, QueryIndex.query_index(..., profile=True)
+                        or "profile": true in the body of a search request
+    profile 'all'       every request, the profiles of the slow ones are kept
+
+The log is the slow_query_log of this module, set up from the settings at startup
+(SEARCH_SLOW_QUERY_LOG, SEARCH_SLOW_QUERY_THRESHOLD and SEARCH_PROFILE). A trace follows the
+thread of its request. The async endpoint runs every query with QueryIndex.query_index in its
+thread pool, so each query is traced on its own; there is no entry for the whole request and
+its authors stage.
+
+Aggregate a log into a hotspot report (from Part2/):
+    python -m index.profiling slow_queries.jsonl [--top 20]
+'''
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from . import metrics
+
+SLOW_QUERY_THRESHOLD = 0.5  # Seconds a request takes to be logged
+PROFILES = (None, 'request', 'all')
+PROFILE_TOP = 25            # Functions kept from the profile of a slow request
+
+_local = threading.local()  #trace of the request running on this thread
+
+
+class SlowQueryLog:
+    '''
+    JSON lines log of the requests slower than threshold seconds, off when path is None
+    '''
+    def __init__(self, path=None, threshold=SLOW_QUERY_THRESHOLD, profile=None, top=PROFILE_TOP):
+        if profile not in PROFILES:
+            raise ValueError('Unknown profile mode {}, expected one of {}'.format(profile, PROFILES))
+        self.path = path
+        self.threshold = threshold
+        self.profile = profile
+        self.top = top
+        self._lock = threading.Lock()
+        self.logged = 0
+
+    def trace(self, kind, profile=False, **fields):
+        '''
+        Context manager tracing a request. A request running inside another one is part of it.
+        '''
+        if self.path is None or getattr(_local, 'trace', None) is not None:
+            return _NO_TRACE
+        return _Trace(self, kind, fields, self.profile == 'all' or (self.profile == 'request' and profile))
+
+    def write(self, entry):
+        line = json.dumps(entry)
+        with self._lock:
+            with open(self.path, 'a') as fh:
+                fh.write(line + '\n')
+            self.logged += 1
+
+
+class _Trace:
+    def __init__(self, log, kind, fields, profile):
+        self.log = log
+        self.kind = kind
+        self.fields = fields
+        self.profiler = cProfile.Profile() if profile else None
+        self.stages = defaultdict(float)
+        self.queries = []
+
+    def __enter__(self):
+        _local.trace = self
+        self.start = time.perf_counter()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                #another profiler is running on this thread
+                self.profiler = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        seconds = time.perf_counter() - self.start
+        _local.trace = None
+        if seconds >= self.log.threshold:
+            self.log.write(self.entry(seconds))
+
+    def entry(self, seconds):
+        entry = dict(self.fields, kind=self.kind, time=time.time(), seconds=seconds,
+                     stages={name: round(x, 6) for name, x in self.stages.items()}, queries=self.queries)
+        if self.profiler is not None:
+            entry['profile'] = _hotspots(self.profiler, self.log.top)
+        return entry
+
+
+class _NoTrace:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_TRACE = _NoTrace()
+
+
+def stage(name):
+    '''
+    Context manager timing a stage of the search path, for the metrics and the trace of the request
+    '''
+    return _Stage(name)
+
+
+def tracing():
+    '''
+    Whether the request running on this thread is traced
+    '''
+    return getattr(_local, 'trace', None) is not None
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        metrics.stage_seconds.observe(seconds, stage=self.name)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.stages[self.name] += seconds
+
+
+def record_query(query_type, terms, scorer, k, seconds, candidates, postings_bytes):
+    '''
+    Adds an evaluated query to the trace of the request, if it is traced
+    '''
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.queries.append({'query_type': query_type, 'terms': list(terms), 'scorer': scorer, 'k': k,
+                              'seconds': round(seconds, 6), 'candidates': candidates,
+                              'postings_bytes': postings_bytes})
+
+
+def _hotspots(profiler, top):
+    '''
+    [{function, calls, tottime, cumtime}] of the functions with the most own time
+    '''
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda x: x[1][2], reverse=True)[:top]
+    return [{'function': _function_name(func), 'calls': nc, 'tottime': round(tt, 6), 'cumtime': round(ct, 6)}
+            for func, (cc, nc, tt, ct, callers) in rows]
+
+
+def _function_name(func):
+    filename, line, name = func
+    if filename == '~':
+        #built-in functions
+        return name
+    return '{}:{}({})'.format(os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename,
+                              line, name)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def configure(path, threshold=SLOW_QUERY_THRESHOLD, profile=None):
+    global slow_query_log
+    slow_query_log = SlowQueryLog(path, threshold, profile)
+    return slow_query_log
+
+
+def read_log(path):
+    with open(path) as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def report(entries, top=20):
+    '''
+    Aggregates slow query log entries: the slowest query patterns, where the time went by stage
+    and the functions that took the most time in the profiled requests
+    '''
+    entries = list(entries)
+    patterns = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'candidates': 0,
+                                    'postings_bytes': 0})
+    stages = defaultdict(float)
+    functions = defaultdict(lambda: {'calls': 0, 'tottime': 0.0, 'cumtime': 0.0, 'requests': 0})
+    profiled = 0
+    for entry in entries:
+        for name, seconds in entry['stages'].items():
+            stages[name] += seconds
+        for query in entry['queries']:
+            pattern = patterns['{} {}'.format(query['query_type'], ' '.join(query['terms']))]
+            pattern['count'] += 1
+            pattern['seconds'] += query['seconds']
+            pattern['max_seconds'] = max(pattern['max_seconds'], query['seconds'])
+            pattern['candidates'] = max(pattern['candidates'], query['candidates'])
+            pattern['postings_bytes'] = max(pattern['postings_bytes'], query['postings_bytes'])
+        if 'profile' in entry:
+            profiled += 1
+            for row in entry['profile']:
+                function = functions[row['function']]
+                function['calls'] += row['calls']
+                function['tottime'] += row['tottime']
+                function['cumtime'] += row['cumtime']
+                function['requests'] += 1
+    latencies = sorted(entry['seconds'] for entry in entries)
+    return {'requests': len(entries),
+            'profiled': profiled,
+            'seconds': {'total': sum(latencies),
+                        'p50': _percentile(latencies, 50),
+                        'p99': _percentile(latencies, 99),
+                        'max': latencies[-1] if latencies else 0.0},
+            'stages': dict(sorted(stages.items(), key=lambda x: x[1], reverse=True)),
+            'queries': sorted(patterns.items(), key=lambda x: x[1]['seconds'], reverse=True)[:top],
+            'hotspots': sorted(functions.items(), key=lambda x: x[1]['tottime'], reverse=True)[:top]}
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def print_report(result):
+    seconds = result['seconds']
+    print('{} slow requests, {} profiled, {:.3f}s in total, p50 {:.3f}s p99 {:.3f}s max {:.3f}s'.format(
+        result['requests'], result['profiled'], seconds['total'], seconds['p50'], seconds['p99'], seconds['max']))
+    print()
+    print('{:>12} {:>10} {:>7}'.format('stage', 'seconds', 'share'))
+    total = sum(result['stages'].values()) or 1.0
+    for name, stage_seconds in result['stages'].items():
+        print('{:>12} {:>10.3f} {:>6.1%}'.format(name, stage_seconds, stage_seconds / total))
+    print()
+    print('{:>7} {:>10} {:>9} {:>11} {:>14}  {}'.format('count', 'seconds', 'max', 'candidates', 'postings bytes',
+                                                         'query'))
+    for pattern, row in result['queries']:
+        print('{:>7} {:>10.3f} {:>9.3f} {:>11} {:>14}  {}'.format(row['count'], row['seconds'], row['max_seconds'],
+                                                                 row['candidates'], row['postings_bytes'], pattern))
+    if result['hotspots']:
+        print()
+        print('{:>10} {:>10} {:>10} {:>9}  {}'.format('tottime', 'cumtime', 'calls', 'requests', 'function'))
+        for function, row in result['hotspots']:
+            print('{:>10.3f} {:>10.3f} {:>10} {:>9}  {}'.format(row['tottime'], row['cumtime'], row['calls'],
+                                                               row['requests'], function))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m index.profiling', description='Hotspot report of slow query logs')
+    parser.add_argument('logs', nargs='+', help='slow query log files')
+    parser.add_argument('--top', type=int, default=20, help='query patterns and functions shown')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    result = report((entry for path in args.logs for entry in read_log(path)), args.top)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,112 @@
+import heapq
+import threading
+from bisect import bisect_left
+
+#Relative slack on the score bounds. Covers the float32 tf of the binary index and the
+#rounding of sums of bounds added in a different order than the scores
+BOUND_SLACK = 1e-6
+
+
+class PruningStats:
+    '''
+    Counters of the summaries scored and of the postings skipped without being scored
+    by the free text evaluator. A summary is skipped once per posting list it is in
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.docs_scored = 0
+        self.postings_skipped = 0
+
+    def add(self, docs_scored, postings_skipped):
+        with self._lock:
+            self.queries += 1
+            self.docs_scored += docs_scored
+            self.postings_skipped += postings_skipped
+
+    def stats(self):
+        return {'queries': self.queries, 'docs_scored': self.docs_scored, 'postings_skipped': self.postings_skipped}
+
+
+class _Cursor:
+    __slots__ = ('term', 'summary_ids', 'tfs', 'pos', 'bound')
+
+    def __init__(self, term, summary_ids, tfs, bound):
+        self.term = term
+        self.summary_ids = summary_ids
+        self.tfs = tfs
+        self.pos = 0
+        self.bound = bound
+
+    def current(self):
+        return self.summary_ids[self.pos]
+
+
+def wand_top_k(snapshot, terms, k, stats=None):
+    '''
+    Document at a time WAND evaluation of a free text (OR) query.
+    Cursors over the posting lists move in summary_id order. A summary is only scored if the
+    score bounds of the terms it can contain add up to at least the k-th best score so far,
+    every other summary is skipped without being scored.
+
+    Returns [(score, summary_id)] exactly like ranking.top_k over the union of the postings:
+    scores are added in query term order and ties go to the higher summary_id.
+    '''
+    if k <= 0:
+        return []
+    multiplicity = {}
+    for term in terms:
+        if term in snapshot.index:
+            multiplicity[term] = multiplicity.get(term, 0) + 1
+    cursors = []
+    for term, count in multiplicity.items():
+        summary_ids, tfs = snapshot.postings_arrays(term)
+        cursors.append(_Cursor(term, summary_ids, tfs, snapshot.max_score(term) * count * (1 + BOUND_SLACK)))
+    by_term = {cursor.term: cursor for cursor in cursors}
+    idf = snapshot.idf
+
+    heap = []       #best k so far as (score, summary_id), smallest first
+    docs_scored, postings_skipped = 0, 0
+    while cursors:
+        cursors.sort(key=_Cursor.current)
+        threshold = heap[0][0] if len(heap) == k else None
+
+        #pivot: first cursor at which the bounds add up to the threshold
+        pivot = None
+        bound = 0.0
+        for i, cursor in enumerate(cursors):
+            bound += cursor.bound
+            if threshold is None or bound >= threshold:
+                pivot = i
+                break
+        if pivot is None:
+            #even the remaining summaries with every term can't reach the threshold
+            postings_skipped += sum(len(c.summary_ids) - c.pos for c in cursors)
+            break
+
+        pivot_id = cursors[pivot].current()
+        if cursors[0].current() == pivot_id:
+            score = 0.0
+            for term in terms:
+                cursor = by_term.get(term)
+                if cursor is not None and cursor.pos < len(cursor.summary_ids) and cursor.current() == pivot_id:
+                    score += cursor.tfs[cursor.pos] * idf[term]
+            docs_scored += 1
+            if len(heap) < k:
+                heapq.heappush(heap, (score, pivot_id))
+            elif (score, pivot_id) > heap[0]:
+                heapq.heapreplace(heap, (score, pivot_id))
+            for cursor in cursors:
+                if cursor.current() == pivot_id:
+                    cursor.pos += 1
+        else:
+            #no summary before the pivot can reach the threshold, jump the cursors to it
+            for cursor in cursors[:pivot]:
+                pos = bisect_left(cursor.summary_ids, pivot_id, cursor.pos)
+                postings_skipped += pos - cursor.pos
+                cursor.pos = pos
+        cursors = [cursor for cursor in cursors if cursor.pos < len(cursor.summary_ids)]
+
+    if stats is not None:
+        stats.add(docs_scored, postings_skipped)
+    return sorted(heap, reverse=True)
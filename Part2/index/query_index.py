@@ -1,226 +1,441 @@
-import re
-from collections import defaultdict
-import copy
-import json
-import functools
-
-STOPWORD_FILE = 'index/stopwords.dat'
-RAW_DATA_FILE = 'index/data.json'
-TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
-INDEX_FILE = 'index/index.txt'
+import logging
+import os
+import threading
+import time
+
+from .snapshot import load_snapshot, file_signature
+from .postings import POSTINGS_LAYOUT, POSTINGS_LAYOUTS
+from .summary_store import create_summary_store
+from .ranking import get_ranker
+from .pruning import PruningStats, wand_top_k
+from .phrase import phrase_matches
+from .result_cache import MISS, create_result_cache
+from .scoring import SCORER, get_scorer
+from . import boolean, metrics, profiling
+from .analyzer import Analyzer, AnalyzerMismatchError
+from .binary_index import BinaryIndexError
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.dirname(os.path.abspath(__file__)) # The data files are next to this module, wherever the server starts
+STOPWORD_FILE = os.path.join(INDEX_DIR, 'stopwords.dat')
+RAW_DATA_FILE = os.path.join(INDEX_DIR, 'data.json')
+TRANSFORMED_DATA_FILE = os.path.join(INDEX_DIR, 'transformed_data.json')
+INDEX_FILE = os.path.join(INDEX_DIR, 'index.txt')
+RELOAD_CHECK_INTERVAL = 1.0 # Seconds between checks of the index file for a newer version
+SUMMARY_STORE_MODE = 'resident' # 'resident' keeps all summaries in memory, 'lazy' reads them from the file on demand
+SUMMARY_CACHE_SIZE = 4096 # Number of decoded summaries kept by the lazy summary store
+RANKING_BACKEND = 'python' # 'python', or 'sparse' to rank with NumPy/SciPy on large corpora
+PRUNING = 'wand' # Free text evaluation: 'wand' skips summaries that can't make the top k, 'exhaustive' scores them all
+RESULT_CACHE = 'memory' # Cache of query results: None, 'memory' (per process) or 'sqlite' (shared by the workers)
+RESULT_CACHE_SIZE = 10000 # Number of cached query results
+RESULT_CACHE_TTL = 3600 # Seconds a query result stays cached
+RESULT_CACHE_FILE = os.path.join(INDEX_DIR, 'result_cache.sqlite3') # Used by the 'sqlite' result cache
+STEMMER = None # None, or 'porter' for an index built with CreateIndex(..., stemmer='porter')
+# SCORER, 'tfidf' or 'bm25', is imported from scoring.py. Queries can ask for another one.
 
 
 class QueryIndex:
 
-    def __init__(self, stopword_file, index_file, transformed_data_file):
-        self.index={}
-        self.tf={}      #term frequencies
-        self.idf={}    #inverse document frequencies
-        self.stopwords = self._get_stopwords(stopword_file) #Stores all the stopwords defined in stopword file
+    def __init__(self, stopword_file, index_file, transformed_data_file, reload_check_interval=RELOAD_CHECK_INTERVAL,
+                 summary_store_mode=SUMMARY_STORE_MODE, summary_cache_size=SUMMARY_CACHE_SIZE,
+                 ranking_backend=RANKING_BACKEND, pruning=PRUNING, result_cache=RESULT_CACHE,
+                 result_cache_size=RESULT_CACHE_SIZE, result_cache_ttl=RESULT_CACHE_TTL,
+                 result_cache_file=RESULT_CACHE_FILE, stemmer=STEMMER, postings_layout=POSTINGS_LAYOUT,
+                 scorer=SCORER):
+        #Splits queries into terms, the same way CreateIndex split the summaries
+        self.analyzer = Analyzer(stopword_file, stemmer=stemmer, learn_stems=False)
+        self.stopwords = self.analyzer.stopwords #Stores all the stopwords defined in stopword file
         self.index_file = index_file # Stores the index file which is generated after parsing our data
         self.transformed_data_file = transformed_data_file # Transformed file to improve performance
-
-    def _intersect_lists(self,lists):
-        if len(lists)==0:
-            return []
-        #start intersecting from the smaller list
-        lists.sort(key=len)
-        return list(functools.reduce(lambda x,y: set(x)&set(y),lists))
-
-    def _get_stopwords(self,stopword_file):
-        '''
-        Gets stopwords from the stopwords file
-        '''
-        with open(stopword_file, 'r') as swf:
-            sw=[line.rstrip() for line in swf]
-            stopwords=dict.fromkeys(sw)
-        return stopwords
+        self.reload_check_interval = reload_check_interval
+        store_options = {'cache_size': summary_cache_size} if summary_store_mode == 'lazy' else {}
+        #no transformed data file: search only, the results are the ranked ids (shard workers)
+        self.summary_store = None if transformed_data_file is None else create_summary_store(
+            transformed_data_file, summary_store_mode, reload_check_interval=reload_check_interval, **store_options)
+        self.ranking_backend = ranking_backend
+        self._top_k = get_ranker(ranking_backend)
+        if pruning not in ('wand', 'exhaustive'):
+            raise ValueError('Unknown pruning mode {}'.format(pruning))
+        self.pruning = pruning
+        self.pruning_stats = PruningStats()
+        if postings_layout not in POSTINGS_LAYOUTS:
+            raise ValueError('Unknown postings layout {}'.format(postings_layout))
+        self.postings_layout = postings_layout #'compact' flat arrays or 'lists', see postings.py
+        self.scorer = get_scorer(scorer).name #scorer of the queries that don't ask for one, see scoring.py
+        self.result_cache = create_result_cache(result_cache, result_cache_size, result_cache_ttl, result_cache_file)
+        self._snapshot = None           #Resident index, swapped atomically when the index file changes
+        self._last_check = 0.0
+        self._failed_signature = None   #signature of an index file that failed to load
+        self._load_lock = threading.Lock()
+        self._local = threading.local() #Snapshot pinned by the query running on this thread
+
+    @property
+    def snapshot(self):
+        pinned = getattr(self._local, 'snapshot', None)
+        if pinned is not None:
+            return pinned
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    @property
+    def index(self):
+        return self.snapshot.index
+
+    @property
+    def tf(self):
+        #term frequencies
+        return self.snapshot.tf
+
+    @property
+    def idf(self):
+        #inverse document frequencies
+        return self.snapshot.idf
+
+    @property
+    def num_summaries(self):
+        return self.snapshot.num_summaries
+
+    @property
+    def authors(self):
+        #book_id -> author, loaded together with the index and the summaries
+        return self.summary_store.load().authors
 
     def _get_terms(self, line):
-        line=line.lower()
-        line=re.sub(r'[^a-z0-9 ]',' ',line) #put spaces instead of non-alphanumeric characters
-        line=line.split()
-        line=[x for x in line if x not in self.stopwords]
-        return line
-
-
-    def get_positions(self, terms):
-        #all terms in the list are guaranteed to be in the index
-        return [ self.index[term] for term in terms ]
-
+        return self.analyzer.query_terms(line)
 
-    def get_summaries_from_positions(self, positions):
-        #no empty list in positions
-        return [ [x[0] for x in p] for p in positions ]
 
     def read_index(self):
-        with open(self.index_file, 'r') as index_file:
-            # first read the number of documents
-            self.num_summaries=int(index_file.readline().rstrip())
-            for line in index_file:
-                line=line.rstrip()
-                term, position, tf, idf = line.split('|')
-                position=position.split(';')
-                position=[x.split(':') for x in position]
-                position=[ [int(x[0]), list(map(int, x[1].split(',')))] for x in position ]
-                self.index[term]=position
-                #read term frequencies
-                tf=tf.split(',')
-                self.tf[term]=list(map(float, tf))
-                #read inverse document frequency
-                self.idf[term]=float(idf)
-
-
-    def dotProduct(self, vec1, vec2):
-        if len(vec1)!=len(vec2):
-            return 0
-        return sum([ x*y for x,y in zip(vec1,vec2) ])
+        '''
+        Loads the index file into a new snapshot and swaps it in, regardless of whether it changed
+        '''
+        with self._load_lock:
+            generation = self._snapshot.generation + 1 if self._snapshot else 1
+            with profiling.stage('read_index'):
+                self._snapshot = self._load_snapshot(generation)
+            self._last_check = time.monotonic()
+        return self._snapshot
+
+    def _load_snapshot(self, generation):
+        snapshot = load_snapshot(self.index_file, generation, self.postings_layout)
+        self.analyzer.check(snapshot.analyzer)
+        self.analyzer.load_stems(snapshot.stems)
+        return snapshot
+
+    def load(self):
+        '''
+        Loads the index and the summaries once. Called at startup so the first request doesn't pay for the parse.
+        '''
+        if self.summary_store is not None:
+            self.summary_store.load()
+        if self._snapshot is None:
+            with self._load_lock:
+                if self._snapshot is not None:
+                    return self._snapshot
+                with profiling.stage('read_index'):
+                    self._snapshot = self._load_snapshot(1)
+                self._last_check = time.monotonic()
+        return self._snapshot
+
+    def refresh(self):
+        '''
+        Swaps in a new snapshot if the index file changed since the current one was loaded.
+        The file is stat'ed at most once every reload_check_interval seconds.
+        '''
+        current = self.load()
+        now = time.monotonic()
+        if now - self._last_check < self.reload_check_interval:
+            return current
+        self._last_check = now
+        try:
+            signature = file_signature(self.index_file)
+        except OSError:
+            #index is being replaced, keep serving the current snapshot
+            return current
+        if signature != current.signature and signature != self._failed_signature:
+            try:
+                return self.read_index()
+            except AnalyzerMismatchError as exc:
+                #the new index can't be searched with these queries, keep serving the current one
+                logger.error("Not reloading %s: %s", self.index_file, exc)
+            except (ValueError, IndexError, OSError, BinaryIndexError) as exc:
+                #unreadable, half written by a build that didn't rename it into place, keep serving the current one
+                logger.error("Not reloading %s, it can't be read: %s", self.index_file, exc)
+            #not read again until it changes
+            self._failed_signature = signature
+        return current
+
+    def stats(self):
+        stats = self.load().stats()
+        if self.summary_store is not None:
+            stats['summary_store'] = self.summary_store.stats()
+        stats['pruning'] = dict(self.pruning_stats.stats(), mode=self.pruning)
+        #'analyzer' is the version that built the index, these are the queries' analyzer
+        stats['query_analyzer'] = self.analyzer.stats()
+        if self.result_cache is not None:
+            stats['result_cache'] = self.result_cache.stats()
+        return stats
 
 
     def rankDocuments(self, terms, match_indexes,k):
-        #term at a time evaluation
-        docVectors=defaultdict(lambda: [0]*len(terms))
-        queryVector=[0]*len(terms)
-        for termIndex, term in enumerate(terms):
-            if term not in self.index:
-                continue
-
-            queryVector[termIndex]=self.idf[term]
-
-            for i, (summary_id, postings) in enumerate(self.index[term]):
-                if summary_id in match_indexes:
-                    docVectors[summary_id][termIndex]=self.tf[term][i]
-
-        #calculate the score of each summary
-        docScores=[ [self.dotProduct(curDocVec, queryVector), doc] for doc, curDocVec in docVectors.items() ]
-        docScores.sort(reverse=True)
-        result=[x[1] for x in docScores][:k]
+        '''
+        Ranks the matching summaries by tf-idf and returns the best k with the configured backend
+        '''
+        return self._serialize(_ids(self._rank(terms, match_indexes, k)))
 
-        #Print the final response
-        return self._serialize(result)
+    def _rank(self, terms, match_indexes, k):
+        #[(score, summary_id)], best first
+        self._local.candidates = len(match_indexes)
+        return self._top_k(self.snapshot, terms, match_indexes, k)
 
     def _serialize(self,result):
         response=[]
-        with open(self.transformed_data_file,'r') as tdf:
-            json_file = json.load(tdf)
-
         for x in result:
             response.append({"id": x,
-                             "summary":json_file['summaries'][str(x)]})
+                             "summary":self.summary_store.get(x)})
         return response
 
+    def _parse_query(self, query):
+        '''
+        Normalizes a query into (query type, terms).
+        If it contains AND, OR or NOT, it is a boolean query and its terms are the operator tree (boolean.py).
+        If it contains quotation marks, it is a phrase query, unless only one term is left.
+        If the length of query is 1, it's considered as a single word query, otherwise it's a free text query.
+        '''
+        if boolean.is_boolean(query):
+            return self._parse_boolean(query)
+        if '"' in query:
+            query_type = 'phrase'
+        elif len(query.split()) > 1:
+            query_type = 'free_text'
+        else:
+            query_type = 'one_word'
+        terms = self._get_terms(query)
+        if query_type == 'phrase' and len(terms) == 1:
+            query_type = 'one_word'
+        return query_type, terms
+
+    def _parse_boolean(self, query):
+        tree = boolean.analyze(boolean.parse(query), self._get_terms)
+        #what is left after the stopwords may be a query of another type, "book OR life" is "book life"
+        if tree is None:
+            return 'one_word', ()
+        if tree[0] == 'term':
+            return 'one_word', tree[1:]
+        if tree[0] == 'phrase':
+            return 'phrase', tree[1]
+        if tree[0] == 'or' and all(x[0] == 'term' for x in tree[1:]):
+            return 'free_text', tuple(x[1] for x in tree[1:])
+        return 'boolean', tree
+
+    def _evaluate(self, query_type, terms, k, scorer=None):
+        '''
+        Ranked summary ids of a parsed query, None if there is nothing to search for
+        '''
+        return _ids(self._search(query_type, terms, k, scorer))
+
+    def _search(self, query_type, terms, k, scorer=None):
+        '''
+        [(score, summary_id)] of a parsed query, best first, None if there is nothing to search for.
+        The query runs against the snapshot of the scorer, pinned to the thread while it runs.
+        '''
+        scorer = get_scorer(scorer or self.scorer)
+        pinned = getattr(self._local, 'snapshot', None)
+        snapshot = self._local.snapshot = scorer.prepare(self.snapshot)
+        self._local.candidates = 0
+        start = time.perf_counter()
+        try:
+            if query_type == 'phrase':
+                ranked = self._phrase_query(terms, k)
+            elif query_type == 'free_text':
+                ranked = self._free_text_query(terms, k)
+            elif query_type == 'boolean':
+                ranked = self._boolean_query(terms, k)
+            else:
+                ranked = self._one_word_query(terms, k)
+        finally:
+            self._local.snapshot = pinned
+        self._observe(query_type, scorer.name, snapshot, terms, k, time.perf_counter() - start)
+        return ranked
+
+    def _observe(self, query_type, scorer, snapshot, terms, k, seconds):
+        '''
+        Records the evaluation of a query in the metrics and the trace of the request
+        '''
+        if not (metrics.REGISTRY.enabled or profiling.tracing()):
+            return
+        candidates = self._local.candidates
+        if query_type == 'boolean':
+            #the terms of a boolean query are its operator tree
+            postings = set(boolean.postings_read(terms))
+            terms = (boolean.to_string(terms),)
+        else:
+            #phrase queries read the positions too
+            postings = {(term, query_type == 'phrase') for term in terms}
+        postings_bytes = sum(snapshot.postings_nbytes(term, positions) for term, positions in postings)
+        metrics.query_seconds.observe(seconds, query_type=query_type, scorer=scorer)
+        metrics.query_candidates.observe(candidates, query_type=query_type)
+        metrics.query_postings_bytes.observe(postings_bytes, query_type=query_type)
+        profiling.record_query(query_type, terms, scorer, k, seconds, candidates, postings_bytes)
+
+    def _cached_evaluate(self, query_type, terms, k, scorer):
+        '''
+        _evaluate behind the result cache, keyed by the normalized query, k and the scorer
+        '''
+        if self.result_cache is None:
+            return self._evaluate(query_type, terms, k, scorer)
+        key = (query_type, terms, k, scorer)
+        ids = self.result_cache.get(self.snapshot, key)
+        if ids is MISS:
+            metrics.result_cache_lookups.inc(result='miss')
+            ids = self._evaluate(query_type, terms, k, scorer)
+            self.result_cache.set(self.snapshot, key, ids)
+        else:
+            metrics.result_cache_lookups.inc(result='hit')
+        return ids
+
+    def _results(self, ids):
+        return None if ids is None else self._serialize(ids)
 
 
     def one_word_query(self,query,k):
-        query=self._get_terms(query)
+        return self._results(self._evaluate('one_word', self._get_terms(query), k))
+
+    def _one_word_query(self,query,k):
         if len(query)==0:
-            print('')
             return
 
         q = query[0]
         if q not in self.index:
-            print("No results found for {}".format(query))
+            print("No results found for {}".format(list(query)))
             return
         else:
-            matches=self.index[q]
-            match_index =[x[0] for x in matches]
-            return self.rankDocuments(query, match_index,k)
+            match_index ={x[0] for x in self.snapshot.summary_tfs(q)}
+            return self._rank(query, match_index,k)
 
 
     def free_text_query(self,query,k):
-        query=self._get_terms(query)
+        return self._results(self._evaluate('free_text', self._get_terms(query), k))
+
+    def _free_text_query(self,query,k):
         if len(query)==0:
-            print('')
             return
 
+        if self.pruning == 'wand':
+            stats = PruningStats()
+            ranked = wand_top_k(self.snapshot, query, k, stats)
+            self.pruning_stats.add(stats.docs_scored, stats.postings_skipped)
+            self._local.candidates = stats.docs_scored
+            return ranked
+
         li=set()
         for term in query:
             try:
-                positions=self.index[term]
-                docs=[x[0] for x in positions]
+                docs=[x[0] for x in self.snapshot.summary_tfs(term)]
                 li=li|set(docs)
             except:
                 #term not in index
                 pass
 
-        li=list(li)
-        return self.rankDocuments(query, li,k)
+        self.pruning_stats.add(len(li), 0)
+        return self._rank(query, li,k)
 
 
     def phrase_query(self,query,k):
-        originalQuery=query
-        query=self._get_terms(query)
+        return self._results(self._evaluate('phrase', self._get_terms(query), k))
+
+    def _phrase_query(self,query,k):
         if len(query)==0:
-            print('')
             return
         elif len(query)==1:
-            self.one_word_query(originalQuery)
-            return
+            return self._one_word_query(query,k)
 
         phraseDocs=self.phrase_query_summaries(query)
-        return self.rankDocuments(query, phraseDocs,k)
+        return self._rank(query, phraseDocs,k)
+
+
+    def boolean_query(self,query,k):
+        return self._results(self._evaluate('boolean', boolean.analyze(boolean.parse(query), self._get_terms), k))
+
+    def _boolean_query(self,tree,k):
+        if tree is None:
+            return
+
+        matches = boolean.matches(self.snapshot, tree)
+        #ranked by the terms that aren't excluded
+        return self._rank(boolean.positive_terms(tree), matches, k)
 
 
     def phrase_query_summaries(self, terms):
         '''
         Takes in all the terms user has searched for and checks in summaries
         '''
-        phraseDocs=[]
-        length=len(terms)
-        #first find matching summaries
-        for term in terms:
-            if term not in self.index:
-                #if a term doesn't appear in the index
-                #there can't be any document maching it
-                return []
-
-        positions=self.get_positions(terms)    #all the terms in q are in the index
-        summary_ids=self.get_summaries_from_positions(positions)
-        #Filter only those summaries which contain all the terms of the query
-        summary_ids=self._intersect_lists(summary_ids)
-        #postings are the postings list of the terms in the documents docs only
-        for i in range(len(positions)):
-            positions[i]=[x for x in positions[i] if x[0] in summary_ids]
-
-        #check whether the term ordering in the summary is like in the phrase query
-
-        #subtract i from the ith terms location in the summary
-        positions=copy.deepcopy(positions)
-
-        for i in range(len(positions)):
-            for j in range(len(positions[i])):
-                positions[i][j][1]=[x-i for x in positions[i][j][1]]
-
-        #intersect the locations
-        result=[]
-        for i in range(len(positions[0])):
-            li=self._intersect_lists( [x[i][1] for x in positions] )
-            if li==[]:
-                continue
-            else:
-                result.append(positions[0][i][0])    #append the summary_id to the result
+        return phrase_matches(self.snapshot, terms)
 
-        return result
+    def _pin(self):
+        '''
+        Pins the current snapshot to the thread for the query about to run
+        '''
+        self._local.snapshot = self.refresh()
+        if self.summary_store is not None:
+            self.summary_store.refresh()
 
-    def query_index(self,query,k):
+    def query_index(self,query,k,scorer=None,profile=False):
         '''
 
         :param query: Accepts the keyword/phrase that needs to be searched
         :param k: The number of matching results
+        :param scorer: 'tfidf' or 'bm25', see scoring.py. Defaults to the scorer of the QueryIndex
+        :param profile: run the query under cProfile, if the slow query log profiles on request (profiling.py)
         There can be 3 types of queries which are searched by the search engine.
         It it contains quotation marks, it is a phrase query.Exact match will be checked for this search.
         If the length of query is 1, it's considered as a single word query.
         Otherwise, it's a free text query.Not all words need to match in this case
-        The relevance is calculated by the (term frequency * inverse document frequency).
+        Terms and phrases can also be combined with AND, OR, NOT and parentheses, see boolean.py.
+        A malformed boolean query raises boolean.QuerySyntaxError, a ValueError.
+        The relevance is calculated by the (term frequency * inverse document frequency), or by BM25.
         '''
-        self.read_index()
+        scorer = get_scorer(scorer or self.scorer).name
+        with profiling.slow_query_log.trace('query', profile=profile, query=query, k=k, scorer=scorer):
+            self._pin()
+            try:
+                with profiling.stage('parse'):
+                    parsed = self._parse_query(query)
+                with profiling.stage('evaluate'):
+                    ids = self._cached_evaluate(*parsed, k, scorer)
+                with profiling.stage('serialize'):
+                    return self._results(ids)
+            finally:
+                self._local.snapshot = None
+
+    def query_batch(self, queries, k, scorer=None, profile=False):
+        '''
+        Evaluates the queries of a request and returns their results in request order, the same
+        as calling query_index for every query, against one snapshot for the whole request.
+        Queries that normalize to the same type and terms are evaluated once, with or without
+        a result cache. The other queries are evaluated one by one, like with query_index.
+        Every query still gets its own result objects.
+        '''
+        scorer = get_scorer(scorer or self.scorer).name
+        with profiling.slow_query_log.trace('batch', profile=profile, queries=list(queries), k=k, scorer=scorer):
+            self._pin()
+            try:
+                with profiling.stage('parse'):
+                    parsed = {}
+                    for query in queries:
+                        if query not in parsed:
+                            parsed[query] = self._parse_query(query)
+                with profiling.stage('evaluate'):
+                    ranked = {key: self._cached_evaluate(*key, k, scorer) for key in dict.fromkeys(parsed.values())}
+                with profiling.stage('serialize'):
+                    return [self._results(ranked[parsed[query]]) for query in queries]
+            finally:
+                self._local.snapshot = None
+
+def _ids(ranked):
+    return None if ranked is None else [summary_id for score, summary_id in ranked]
 
-        if '"' in query:
-            return self.phrase_query(query,k)
-        elif len(query.split()) > 1:
-            return self.free_text_query(query,k)
-        else:
-            return self.one_word_query(query,k)
 
 _query_service = QueryIndex(STOPWORD_FILE,INDEX_FILE,TRANSFORMED_DATA_FILE)
 
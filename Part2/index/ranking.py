@@ -0,0 +1,61 @@
+import heapq
+from array import array
+
+
+def top_k(snapshot, terms, candidates, k):
+    '''
+    Term at a time tf-idf ranking of the candidate summaries.
+    Returns the best k as [(score, summary_id)], highest score first and ties broken by the
+    higher summary_id, the same order as sorting every [score, summary_id] in reverse.
+
+    Scores are accumulated in query term order, so they are bit for bit the dot products
+    of the summary and query vectors.
+    '''
+    if not isinstance(candidates, (set, frozenset)):
+        candidates = set(candidates)
+    if not candidates or k <= 0:
+        return []
+    index, idf = snapshot.index, snapshot.idf
+
+    size = max(candidates) + 1
+    if size <= 8 * len(candidates):
+        #dense candidates: flat array of accumulators indexed by summary_id
+        scores = array('d', bytes(8 * size))
+        seen = bytearray(size)
+    else:
+        scores = {}
+        seen = None
+    touched = []
+
+    for term in terms:
+        if term not in index:
+            continue
+        weight = idf[term]
+        for summary_id, term_tf in snapshot.summary_tfs(term):
+            if summary_id not in candidates:
+                continue
+            if seen is not None:
+                if not seen[summary_id]:
+                    seen[summary_id] = 1
+                    touched.append(summary_id)
+                scores[summary_id] += term_tf * weight
+            elif summary_id in scores:
+                scores[summary_id] += term_tf * weight
+            else:
+                touched.append(summary_id)
+                scores[summary_id] = term_tf * weight
+
+    return heapq.nlargest(k, [(scores[summary_id], summary_id) for summary_id in touched])
+
+
+def get_ranker(backend='python'):
+    '''
+    Ranking backend by name: 'python' for top_k, 'sparse' for the NumPy/SciPy mat-vec ranking.
+    Both return the same results, the sparse one is faster on large corpora.
+    '''
+    if backend == 'python':
+        return top_k
+    if backend == 'sparse':
+        from .sparse_ranking import SparseRanker
+        return SparseRanker()
+    raise ValueError('Unknown ranking backend {}'.format(backend))
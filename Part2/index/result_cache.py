@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import LRUCache
+
+MISS = object()    #returned by get when the key isn't cached, None is a valid cached result
+
+
+class MemoryResultCache:
+    '''
+    In-process LRU/TTL cache of ranked summary ids
+    '''
+    backend = 'memory'
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self._cache = LRUCache(maxsize, ttl=ttl)
+
+    def get(self, generation, key):
+        return self._cache.get((generation, key), MISS)
+
+    def set(self, generation, key, ids):
+        #every key carries the generation, the entries of an old one are never hit again and age out of the LRU
+        self._cache.set((generation, key), ids)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class SQLiteResultCache:
+    '''
+    Result cache in a local SQLite file, shared by every worker process on the machine.
+    Entries expire after ttl seconds and the least recently used ones are evicted above maxsize.
+    '''
+    backend = 'sqlite'
+
+    def __init__(self, path, maxsize=100000, ttl=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()     #sqlite3 connections can't be shared between threads
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'generation TEXT, key TEXT, ids TEXT, expires REAL, accessed REAL, '
+                         'PRIMARY KEY (generation, key))')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            #a forked worker must not reuse the connection of its parent
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, generation, key):
+        conn = self._connection()
+        key = json.dumps(key)
+        row = conn.execute('SELECT ids, expires FROM results WHERE generation=? AND key=?',
+                           (generation, key)).fetchone()
+        if row is None:
+            return MISS
+        now = time.time()
+        if row[1] is not None and row[1] <= now:
+            conn.execute('DELETE FROM results WHERE generation=? AND key=?', (generation, key))
+            return MISS
+        conn.execute('UPDATE results SET accessed=? WHERE generation=? AND key=?', (now, generation, key))
+        return json.loads(row[0])
+
+    def set(self, generation, key, ids):
+        conn = self._connection()
+        now = time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+        conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                     (generation, json.dumps(key), json.dumps(ids), expires, now))
+        self._writes += 1
+        if self._writes % 100 == 0 or self.maxsize < 100:
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM results WHERE expires IS NOT NULL AND expires <= ?', (now,))
+        conn.execute('DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY accessed DESC '
+                     'LIMIT -1 OFFSET ?)', (self.maxsize,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+
+class ResultCache:
+    '''
+    Cache of ranked summary ids in front of query evaluation, keyed by (query type, terms, k).
+    Entries belong to one index generation, identified by the signature of the index file so that
+    every worker sharing a backend agrees on it. The generation is part of the key: a new index
+    misses the entries of the old one, which the LRU evicts, while a worker or QueryIndex that
+    hasn't reloaded yet keeps hitting them.
+    '''
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self, snapshot):
+        return '{}:{}'.format(*snapshot.signature) if snapshot.signature else str(snapshot.generation)
+
+    def get(self, snapshot, key):
+        '''
+        Cached ids for the key, or MISS
+        '''
+        ids = self.backend.get(self._generation(snapshot), key)
+        with self._lock:
+            if ids is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return ids
+
+    def set(self, snapshot, key, ids):
+        self.backend.set(self._generation(snapshot), key, ids)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'backend': self.backend.backend,
+                'size': len(self.backend),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'miss_ratio': round(self.misses / lookups, 4) if lookups else 0.0}
+
+
+def create_result_cache(backend, maxsize=10000, ttl=None, path=None):
+    '''
+    backend: None to disable caching, 'memory' or 'sqlite' (stored at path)
+    '''
+    if backend is None:
+        return None
+    if backend == 'memory':
+        return ResultCache(MemoryResultCache(maxsize, ttl))
+    if backend == 'sqlite':
+        return ResultCache(SQLiteResultCache(path, maxsize, ttl))
+    raise ValueError('Unknown result cache backend {}'.format(backend))
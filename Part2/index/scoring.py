@@ -0,0 +1,168 @@
+'''
+Scorers: the weight a query term gives to the summaries it appears in.
+
+The rankers (ranking.top_k, sparse_ranking.SparseRanker and pruning.wand_top_k) score a
+summary as the sum over the query terms of tf[term][posting] * idf[term]. A scorer maps
+an IndexSnapshot to a snapshot with the same postings whose tf and idf give its scores,
+so every ranker and the WAND bounds work with every scorer, still one multiply-add per
+posting.
+
+    tfidf   the normalized tf and the idf written by CreateIndex, the snapshot itself
+    bm25    Okapi BM25. The tf of a posting is the saturated term count
+            count * (k1 + 1) / (count + k1 * (1 - b + b * length / avg_length)), computed once per
+            term from the document lengths CreateIndex stores in the index metadata.
+            The idf is log(1 + (N - df + 0.5) / (df + 0.5)).
+'''
+import math
+from array import array
+from collections.abc import Mapping
+
+SCORERS = ('tfidf', 'bm25')
+SCORER = 'tfidf'    # Scorer of the queries that don't ask for one
+BM25_K1 = 1.2       # Term count saturation of BM25
+BM25_B = 0.75       # Document length normalization of BM25, 0 turns it off
+
+
+def doc_length_meta(doc_lengths):
+    '''
+    Index metadata of {summary_id: number of terms}, the collection statistics BM25 needs
+    '''
+    return {'doc_lengths': doc_lengths,
+            'avg_doc_length': sum(doc_lengths.values()) / len(doc_lengths) if doc_lengths else 0.0}
+
+
+def collection_stats(meta):
+    '''
+    Collection statistics of the index metadata, None for an index built before they were stored
+    '''
+    if 'doc_lengths' not in meta:
+        return None
+    stats = {'doc_lengths': {int(summary_id): length for summary_id, length in meta['doc_lengths'].items()},
+             'avg_doc_length': meta['avg_doc_length']}
+    #a shard scores with the statistics of the whole corpus
+    for key in ('num_summaries', 'df'):
+        if key in meta:
+            stats[key] = meta[key]
+    return stats
+
+
+class TfIdfScorer:
+    name = 'tfidf'
+
+    def prepare(self, snapshot, eager=False):
+        return snapshot
+
+
+class BM25Scorer:
+    name = 'bm25'
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+
+    def prepare(self, snapshot, eager=False):
+        '''
+        The BM25 view of the snapshot, built on first use and kept with the snapshot.
+        The weights of a term are computed the first time it is queried, or all of them now if eager.
+        '''
+        key = ('scorer', self.name, self.k1, self.b)
+        scored = snapshot._derived.get(key)
+        if scored is None:
+            scored = self._build(snapshot)
+            snapshot._derived[key] = scored
+        if eager:
+            scored.tf.fill()
+            scored.max_scores.fill()
+        return scored
+
+    def _build(self, snapshot):
+        from .snapshot import IndexSnapshot
+        stats = snapshot.collection_stats or _count_doc_lengths(snapshot.index)
+        doc_lengths, avg_doc_length = stats['doc_lengths'], stats['avg_doc_length'] or 1.0
+        num_summaries = stats.get('num_summaries', snapshot.num_summaries)
+        df = stats.get('df')
+        k1, b = self.k1, self.b
+        #k1 * (1 - b + b * length / avg_length) of every summary
+        norms = {summary_id: k1 * (1 - b + b * length / avg_doc_length) for summary_id, length in doc_lengths.items()}
+
+        idf = {}
+        for term, postings in snapshot.index.items():
+            term_df = df[term] if df is not None else len(postings)
+            idf[term] = math.log(1 + (num_summaries - term_df + 0.5) / (term_df + 0.5))
+
+        #the memos are kept by the snapshot (_derived), they mustn't refer back to it: a cycle
+        #through a gc.freeze()'d snapshot would never be collected after a reload
+        index = snapshot.index
+
+        def weights(term):
+            return array('d', (len(positions) * (k1 + 1) / (len(positions) + norms[summary_id])
+                               for summary_id, positions in index[term]))
+
+        tf = _Memo(index, weights)
+        max_scores = _Memo(index, lambda term: max(tf[term]) * idf[term])
+        return IndexSnapshot(snapshot.index, tf, idf, snapshot.num_summaries,
+                             generation=snapshot.generation, signature=snapshot.signature, source=snapshot.source,
+                             backing=snapshot.backing, max_scores=max_scores, analyzer=snapshot.analyzer,
+                             stems=snapshot.stems, collection_stats=snapshot.collection_stats)
+
+
+_scorers = {'tfidf': TfIdfScorer(), 'bm25': BM25Scorer()}
+
+
+class UnknownScorerError(ValueError):
+    pass
+
+
+def get_scorer(name=SCORER):
+    '''
+    Scorer by name, see SCORERS
+    '''
+    try:
+        return _scorers[name]
+    except KeyError:
+        raise UnknownScorerError('Unknown scorer {}'.format(name)) from None
+
+
+def _count_doc_lengths(index):
+    #index built before the document lengths were stored: count the positions of every summary
+    doc_lengths = {}
+    for postings in index.values():
+        for summary_id, positions in postings:
+            doc_lengths[summary_id] = doc_lengths.get(summary_id, 0) + len(positions)
+    return doc_length_meta(doc_lengths)
+
+
+class _Memo(Mapping):
+    '''
+    term -> function(term), computed the first time the term is looked up
+    '''
+    def __init__(self, keys, function):
+        self._keys = keys
+        self._function = function
+        self._values = {}
+
+    def __getitem__(self, term):
+        try:
+            return self._values[term]
+        except KeyError:
+            if term not in self._keys:
+                raise
+        value = self._values[term] = self._function(term)
+        return value
+
+    def fill(self):
+        '''
+        Computes the values of all the terms not looked up yet
+        '''
+        for term in self._keys:
+            if term not in self._values:
+                self._values[term] = self._function(term)
+
+    def __contains__(self, term):
+        return term in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
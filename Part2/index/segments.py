@@ -0,0 +1,393 @@
+'''
+Segment based index that can be updated without a full rebuild.
+
+A segmented index is a directory with a manifest.json and immutable segments. Every segment is
+a small text index written by CreateIndex (segment-NNNNNN.txt with its meta sidecar) plus its
+summaries and authors in the transformed data format (segment-NNNNNN.json).
+
+    add       indexes the new summaries into a new delta segment
+    delete    adds tombstones, the summary ids listed as deleted in the segment holding them
+    update    an add of an existing summary id, its old version gets a tombstone
+    merge     rewrites the smallest segments into one without their deleted summaries
+
+The idf written into the segments is ignored. QueryIndex serves the live postings of all the
+segments as one snapshot (load_segments) and computes idf from the global df of the live summaries,
+rounded like the idf of the text index, so a segmented index ranks exactly like a rebuilt one.
+
+Every change writes a new manifest and renames it into place, which is what the readers watch.
+'''
+import json
+import os
+import threading
+from collections.abc import Mapping
+
+from .analyzer import Analyzer, AnalyzerMismatchError
+from .cache import LRUCache
+from .create_index import CreateIndex
+from .index_meta import read_text_meta
+from .postings import PostingsStore
+from .scoring import doc_length_meta
+from .snapshot import file_signature, read_text_index
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+MAX_SEGMENTS = 8        # Segments left by a merge, more segments than that trigger the background merge
+MERGE_INTERVAL = 10.0   # Seconds between two checks of the background merge
+
+
+def is_manifest(path):
+    '''
+    A segmented index is opened through its manifest, in place of index.txt and transformed_data.json
+    '''
+    return os.path.basename(path) == MANIFEST_FILE
+
+
+def read_manifest(manifest_file):
+    with open(manifest_file) as fh:
+        return json.load(fh)
+
+
+def segment_file(manifest_file, name, extension):
+    return os.path.join(os.path.dirname(manifest_file), name + extension)
+
+
+MERGED_POSTINGS_CACHE_SIZE = 1024  # Terms whose postings merged from several segments are kept, like the decoded postings of BinaryIndex
+
+#manifest file -> {(segment file, signature): _Segment} of the segments of its last load.
+#Segments are immutable, a reload after an add only reads the new segment. Segments a merge
+#made obsolete are dropped with the next load, they aren't kept next to the merged snapshot.
+_segment_cache = {}
+_segment_cache_lock = threading.Lock()
+
+
+class _Segment:
+    '''
+    Postings of one segment file in the compact layout, the only copy of them in memory
+    '''
+    def __init__(self, index_file):
+        meta = read_text_meta(index_file)
+        #compacted as it is read, the list layout only ever holds one term
+        self.index, self.tf, _, _ = read_text_index(index_file, 'compact')
+        self.stems = meta.get('stems', {})
+        self.doc_lengths = meta.get('doc_lengths')
+        self._live_df = (frozenset(), {})
+
+    def live_df(self, deleted):
+        '''
+        term -> postings of the term that aren't deleted, only the terms with a deleted posting.
+        Counted again only when the tombstones of the segment change.
+        '''
+        cached_deleted, live_df = self._live_df
+        if cached_deleted != deleted:
+            live_df = {}
+            if deleted:
+                for term, postings in self.index.items():
+                    count = sum(1 for summary_id in postings.summary_ids if summary_id in deleted)
+                    if count:
+                        live_df[term] = len(postings) - count
+            self._live_df = (deleted, live_df)
+        return live_df
+
+
+def _read_segments(manifest_file, manifest):
+    '''
+    _Segment of every segment of the manifest, in its order
+    '''
+    with _segment_cache_lock:
+        cached = _segment_cache.get(manifest_file, {})
+    segments = {}
+    for segment in manifest['segments']:
+        index_file = segment_file(manifest_file, segment['name'], '.txt')
+        key = (index_file, file_signature(index_file))
+        segments[key] = cached.get(key) or _Segment(index_file)
+    with _segment_cache_lock:
+        _segment_cache[manifest_file] = segments
+    return list(segments.values())
+
+
+class LivePostings:
+    '''
+    The live postings of the segments of one manifest, the postings of a term merged on first use.
+    A term whose live postings are all in one segment is served from the segment itself, the
+    merged postings of the others are kept for the MERGED_POSTINGS_CACHE_SIZE most recent terms.
+    '''
+    def __init__(self, segments, df):
+        self._segments = segments       #[(_Segment, deleted summary ids)]
+        self._df = df                   #term -> live postings, the terms with any
+        self._merged = LRUCache(MERGED_POSTINGS_CACHE_SIZE)
+
+    def postings(self, term):
+        '''
+        (CompactPostings, CompactTfs) of the live postings of the term, sorted by summary_id
+        '''
+        if term not in self._df:
+            raise KeyError(term)
+        merged = self._merged.get(term)
+        if merged is not None:
+            return merged
+        parts = [(segment, deleted) for segment, deleted in self._segments if term in segment.index]
+        if len(parts) == 1:
+            segment, deleted = parts[0]
+            if len(segment.index[term]) == self._df[term]:
+                return segment.index[term], segment.tf[term]
+        postings, tfs = [], []
+        for segment, deleted in parts:
+            for posting, posting_tf in zip(segment.index[term], segment.tf[term]):
+                if posting[0] not in deleted:
+                    postings.append(posting)
+                    tfs.append(posting_tf)
+        merged = PostingsStore().add(postings, tfs)
+        self._merged.set(term, merged)
+        return merged
+
+    def segment_postings(self):
+        '''
+        What the live postings hold in memory: the postings of every segment and the df
+        '''
+        return [self._df] + [mapping for segment, _ in self._segments for mapping in (segment.index, segment.tf)]
+
+
+class _LiveView(Mapping):
+    def __init__(self, live, field):
+        self._live = live
+        self._field = field
+
+    def __getitem__(self, term):
+        return self._live.postings(term)[self._field]
+
+    def __contains__(self, term):
+        return term in self._live._df
+
+    def __iter__(self):
+        return iter(self._live._df)
+
+    def __len__(self):
+        return len(self._live._df)
+
+    def segment_postings(self):
+        #for the memory footprint of the snapshot
+        return self._live.segment_postings()
+
+
+def load_segments(manifest_file):
+    '''
+    Live postings of all the segments of a manifest, without tombstoned summaries.
+    Returns index, tf, idf, num_summaries like read_text_index and the metadata of the index.
+    Only the segments added since the last load are read, and only those whose tombstones
+    changed are counted again, the postings are merged term by term as they are queried.
+    '''
+    manifest = read_manifest(manifest_file)
+    segments, df, stems, doc_lengths = [], {}, {}, {}
+    num_summaries = 0
+    for segment, parsed in zip(manifest['segments'], _read_segments(manifest_file, manifest)):
+        deleted = frozenset(segment['deleted'])
+        segments.append((parsed, deleted))
+        num_summaries += segment['num_summaries'] - len(deleted)
+        stems.update(parsed.stems)
+        if doc_lengths is not None and parsed.doc_lengths is not None:
+            doc_lengths.update((int(x), length) for x, length in parsed.doc_lengths.items() if int(x) not in deleted)
+        else:
+            #a segment written before the document lengths were stored, BM25 counts them itself
+            doc_lengths = None
+        live_df = parsed.live_df(deleted)
+        for term, postings in parsed.index.items():
+            count = live_df.get(term, len(postings))
+            if count:
+                df[term] = df.get(term, 0) + count
+    #same idf as CreateIndex computes for the whole corpus
+    idf = {term: float('%.4f' % (float(num_summaries)/count)) for term, count in df.items()}
+    #the views refer to the live postings, not the other way round, no cycle to outlive a gc.freeze()
+    live = LivePostings(segments, df)
+    meta = {'analyzer': manifest['analyzer'], 'stems': stems}
+    if doc_lengths is not None:
+        meta.update(doc_length_meta(doc_lengths))
+    return _LiveView(live, 0), _LiveView(live, 1), idf, num_summaries, meta
+
+
+class SegmentedIndex:
+    '''
+    Write side of a segmented index. There must be only one writer per directory,
+    its methods are thread-safe so the background merge runs next to adds and deletes.
+    '''
+    def __init__(self, directory, stopword_file, stemmer=None, max_segments=MAX_SEGMENTS):
+        self.directory = directory
+        self.stopword_file = stopword_file
+        self.stemmer = stemmer
+        self.max_segments = max_segments
+        self.manifest_file = os.path.join(directory, MANIFEST_FILE)
+        analyzer_version = Analyzer(stopword_file, stemmer=stemmer).version
+        self._lock = threading.Lock()           #guards the manifest
+        self._merge_lock = threading.Lock()     #one merge at a time
+        self._stop_merging = threading.Event()
+        self._merger = None
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.manifest_file):
+            self.manifest = read_manifest(self.manifest_file)
+            if self.manifest['analyzer'] != analyzer_version:
+                raise AnalyzerMismatchError('Segments built by analyzer {}, not {}'.format(
+                    self.manifest['analyzer'], analyzer_version))
+        else:
+            self.manifest = {'version': MANIFEST_VERSION, 'generation': 0, 'next_segment': 1,
+                             'analyzer': analyzer_version, 'segments': [], 'obsolete': []}
+            self._commit()
+        self._locations = self._live_locations()    #summary_id -> name of the segment with its live version
+
+    def _segment_file(self, name, extension):
+        return segment_file(self.manifest_file, name, extension)
+
+    def _read_summaries(self, name):
+        with open(self._segment_file(name, '.json')) as fh:
+            data = json.load(fh)
+        return ({int(key): value for key, value in data['summaries'].items()},
+                {int(key): value for key, value in data['authors'].items()})
+
+    def _live_locations(self):
+        locations = {}
+        for segment in self.manifest['segments']:
+            deleted = set(segment['deleted'])
+            summaries, _ = self._read_summaries(segment['name'])
+            locations.update((summary_id, segment['name']) for summary_id in summaries if summary_id not in deleted)
+        return locations
+
+    def _commit(self):
+        '''
+        Writes the manifest next to the current one and renames it into place
+        '''
+        self.manifest['generation'] += 1
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w') as fh:
+            json.dump(self.manifest, fh)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _write_segment(self, summaries, authors):
+        with self._lock:
+            name = 'segment-{:06d}'.format(self.manifest['next_segment'])
+            self.manifest['next_segment'] += 1
+        ci_obj = CreateIndex(self.stopword_file, None, None, self._segment_file(name, '.txt'), stemmer=self.stemmer)
+        ci_obj.index_summaries(summaries)
+        ci_obj._write_to_file()
+        with open(self._segment_file(name, '.json'), 'w') as fh:
+            json.dump({'summaries': summaries, 'authors': authors}, fh)
+        return {'name': name, 'num_summaries': len(summaries), 'deleted': []}
+
+    def _tombstone(self, summary_ids):
+        segments = {segment['name']: segment for segment in self.manifest['segments']}
+        deleted = 0
+        for summary_id in summary_ids:
+            name = self._locations.pop(summary_id, None)
+            if name is not None:
+                segments[name]['deleted'].append(summary_id)
+                deleted += 1
+        return deleted
+
+    def add(self, summaries, authors=None):
+        '''
+        Adds {summary_id: summary} in a new delta segment. Summaries that already exist are replaced,
+        their old version gets a tombstone.
+        '''
+        summaries = {int(key): value for key, value in summaries.items()}
+        if not summaries:
+            return
+        segment = self._write_segment(summaries, {int(key): value for key, value in (authors or {}).items()})
+        with self._lock:
+            self._tombstone(summaries)
+            self.manifest['segments'].append(segment)
+            for summary_id in summaries:
+                self._locations[summary_id] = segment['name']
+            self._commit()
+
+    update = add
+
+    def delete(self, summary_ids):
+        '''
+        Deletes summaries by id, returns how many existed
+        '''
+        with self._lock:
+            deleted = self._tombstone(summary_ids)
+            if deleted:
+                self._commit()
+        return deleted
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, summary_id):
+        return summary_id in self._locations
+
+    def merge(self, max_segments=None):
+        '''
+        Merges the smallest segments into one, so at most max_segments are left, and drops their
+        deleted summaries. Adds and deletes can go on while the merged segment is written.
+        Returns the name of the merged segment, None if there was nothing to merge.
+        '''
+        max_segments = self.max_segments if max_segments is None else max_segments
+        with self._merge_lock:
+            with self._lock:
+                segments = sorted(self.manifest['segments'], key=lambda s: s['num_summaries'] - len(s['deleted']))
+                count = len(segments) - max(max_segments, 1) + 1
+                if count < 2:
+                    return None
+                merged = [dict(segment, deleted=list(segment['deleted'])) for segment in segments[:count]]
+
+            summaries, authors = {}, {}
+            for segment in merged:
+                segment_summaries, segment_authors = self._read_summaries(segment['name'])
+                deleted = set(segment['deleted'])
+                summaries.update((k, v) for k, v in segment_summaries.items() if k not in deleted)
+                authors.update(segment_authors)
+            new_segment = self._write_segment(summaries, authors)
+
+            with self._lock:
+                names = {segment['name'] for segment in merged}
+                current = {segment['name']: segment for segment in self.manifest['segments']}
+                for segment in merged:
+                    #deleted or replaced while the merged segment was being written
+                    already_deleted = set(segment['deleted'])
+                    new_segment['deleted'].extend(x for x in current[segment['name']]['deleted']
+                                                  if x not in already_deleted)
+                for summary_id, name in self._locations.items():
+                    if name in names:
+                        self._locations[summary_id] = new_segment['name']
+                obsolete = self.manifest['obsolete']
+                self.manifest['segments'] = [s for s in self.manifest['segments'] if s['name'] not in names]
+                self.manifest['segments'].append(new_segment)
+                #files of the segments merged the previous time can go, readers have moved on since
+                self.manifest['obsolete'] = sorted(names)
+                self._commit()
+            for name in obsolete:
+                for extension in ('.txt', '.txt.meta.json', '.json'):
+                    try:
+                        os.remove(self._segment_file(name, extension))
+                    except FileNotFoundError:
+                        pass
+            return new_segment['name']
+
+    def maybe_merge(self):
+        if len(self.manifest['segments']) > self.max_segments:
+            return self.merge()
+        return None
+
+    def merge_in_background(self, interval=MERGE_INTERVAL):
+        '''
+        Starts a daemon thread merging the segments every interval seconds when there are too many
+        '''
+        def run():
+            while not self._stop_merging.wait(interval):
+                self.maybe_merge()
+        self._stop_merging.clear()
+        self._merger = threading.Thread(target=run, name='segment-merge', daemon=True)
+        self._merger.start()
+        return self._merger
+
+    def stop_background_merge(self):
+        self._stop_merging.set()
+        if self._merger is not None:
+            self._merger.join()
+            self._merger = None
+
+    def stats(self):
+        segments = self.manifest['segments']
+        return {'generation': self.manifest['generation'],
+                'segments': len(segments),
+                'num_summaries': len(self),
+                'deleted': sum(len(segment['deleted']) for segment in segments)}
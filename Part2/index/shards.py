@@ -0,0 +1,227 @@
+'''
+Document partitioned index searched by scatter-gather across processes.
+
+CreateIndex(..., shards=N) writes N text indexes, shard-000.txt ... in the directory of the
+shard manifest (shards.json), summary_id % N picking the shard of a summary. Every shard is
+a complete text index of its summaries, except that its idf is the idf of the whole corpus,
+so a summary gets the same score in its shard as in the unsharded index.
+
+ShardedQueryIndex is the coordinator. It keeps one single-worker process pool per shard,
+every worker process holding one shard in memory. A query is analyzed once by the
+coordinator, sent to all the shards at once, and the top k of every shard are merged into
+the top k of the corpus with the same tie breaking as ranking.top_k.
+
+The shard workers reload their shard when its file changes, like QueryIndex does. A rebuild
+writes the shards before the manifest, queries running while the shards are replaced may
+see some shards of the old index and some of the new one.
+'''
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics
+from .index_meta import write_text_meta
+from .query_index import QueryIndex
+from .scoring import doc_length_meta
+from .snapshot import file_signature
+
+SHARDS_FILE = 'shards.json'
+SHARDS_VERSION = 1
+
+
+def is_shard_manifest(path):
+    return os.path.basename(path) == SHARDS_FILE
+
+
+def shard_of(summary_id, num_shards):
+    return int(summary_id) % num_shards
+
+
+def shard_file(manifest_file, name):
+    return os.path.join(os.path.dirname(manifest_file), name + '.txt')
+
+
+def read_shard_manifest(manifest_file):
+    with open(manifest_file) as fh:
+        return json.load(fh)
+
+
+def write_shards(manifest_file, index, tf, df, num_summaries, num_shards, analyzer_meta, doc_lengths=None):
+    '''
+    Splits an index built by CreateIndex into num_shards text indexes and writes their manifest.
+    idf, the score bounds and the collection statistics of BM25 are those of the whole corpus.
+    '''
+    names = ['shard-{:03d}'.format(i) for i in range(num_shards)]
+    #summaries of every shard, those without any term aren't in the index and don't count
+    shard_summaries = [set() for _ in range(num_shards)]
+    for postings in index.values():
+        for posting in postings:
+            shard_summaries[shard_of(posting[0], num_shards)].add(posting[0])
+    #written next to the shards and renamed over them, like the manifest
+    files = [open(shard_file(manifest_file, name) + '.tmp', 'w') for name in names]
+    max_scores = [{} for _ in range(num_shards)]
+    try:
+        for fh, summaries in zip(files, shard_summaries):
+            fh.write(str(len(summaries)))
+            fh.write('\n')
+        for term, postings in index.items():
+            idfData = '%.4f' % (float(num_summaries)/df[term])
+            split = [([], []) for _ in range(num_shards)]
+            for posting, posting_tf in zip(postings, tf[term]):
+                shard_postings, shard_tf = split[shard_of(posting[0], num_shards)]
+                shard_postings.append(':'.join([str(posting[0]), ','.join(map(str, posting[1]))]))
+                shard_tf.append(str(posting_tf))
+            for i, (shard_postings, shard_tf) in enumerate(split):
+                if shard_postings:
+                    files[i].write('|'.join((term, ';'.join(shard_postings), ','.join(shard_tf), idfData)))
+                    files[i].write('\n')
+                    max_scores[i][term] = max(map(float, shard_tf))*float(idfData)
+    finally:
+        for fh in files:
+            fh.close()
+    doc_lengths = doc_lengths or {}
+    avg_doc_length = doc_length_meta(doc_lengths)['avg_doc_length']
+    for name, bounds, summaries in zip(names, max_scores, shard_summaries):
+        #the stems are only needed to analyze the queries, which the coordinator does
+        write_text_meta(shard_file(manifest_file, name), {
+            'analyzer': analyzer_meta['analyzer'], 'max_scores': bounds,
+            'doc_lengths': {x: doc_lengths[x] for x in summaries if x in doc_lengths},
+            'avg_doc_length': avg_doc_length, 'num_summaries': num_summaries,
+            'df': {term: df[term] for term in bounds}}, shard_file(manifest_file, name) + '.tmp')
+        os.replace(shard_file(manifest_file, name) + '.tmp', shard_file(manifest_file, name))
+
+    manifest = {'version': SHARDS_VERSION, 'num_summaries': num_summaries,
+                'analyzer': analyzer_meta['analyzer'], 'stems': analyzer_meta['stems'],
+                'shards': [{'name': name, 'num_summaries': len(summaries)}
+                           for name, summaries in zip(names, shard_summaries)]}
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w') as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_file, manifest_file)
+
+
+_shard = None   #QueryIndex of the shard of the worker process
+
+
+def _init_shard_worker(stopword_file, index_file, options):
+    global _shard
+    _shard = QueryIndex(stopword_file, index_file, None, result_cache=None, **options)
+    _shard.load()
+
+
+def _search_shard(query_type, terms, k, scorer=None):
+    '''
+    [(score, summary_id)] of the shard of this worker, None if there was nothing to search for
+    '''
+    _shard._pin()
+    try:
+        return _shard._search(query_type, terms, k, scorer)
+    finally:
+        _shard._local.snapshot = None
+
+
+def _stats_shard():
+    return _shard.stats()
+
+
+class ShardSet:
+    '''
+    Stands in for the snapshot of the coordinator: what it knows of the index is the manifest
+    '''
+    def __init__(self, manifest_file, generation):
+        start = time.perf_counter()
+        self.signature = file_signature(manifest_file)
+        manifest = read_shard_manifest(manifest_file)
+        self.source = manifest_file
+        self.generation = generation
+        self.num_summaries = manifest['num_summaries']
+        self.analyzer = manifest['analyzer']
+        self.stems = manifest['stems']
+        self.shards = manifest['shards']
+        self.loaded_at = time.time()
+        self.load_time = time.perf_counter() - start
+
+    def stats(self):
+        return {'source': self.source,
+                'format': 'shards',
+                'generation': self.generation,
+                'num_summaries': self.num_summaries,
+                'num_shards': len(self.shards),
+                'analyzer': self.analyzer,
+                'load_time_ms': round(self.load_time * 1000, 3),
+                'loaded_at': self.loaded_at,
+                'age_seconds': round(time.time() - self.loaded_at, 3)}
+
+
+class ShardedQueryIndex(QueryIndex):
+    '''
+    QueryIndex over the shards of a shard manifest, same results as QueryIndex over the unsharded index.
+    Call close() to stop the shard workers.
+    '''
+    def __init__(self, stopword_file, index_file, transformed_data_file, **kwargs):
+        super().__init__(stopword_file, index_file, transformed_data_file, **kwargs)
+        self.stopword_file = stopword_file
+        #what the shard workers need to evaluate queries like this QueryIndex
+        self._shard_options = {key: kwargs[key] for key in ('reload_check_interval', 'ranking_backend', 'pruning',
+                                                            'stemmer', 'postings_layout') if key in kwargs}
+        self._pools = {}    #shard name -> its single worker process pool
+        self._pid = os.getpid() #process the pools were started by
+
+    def _load_snapshot(self, generation):
+        shard_set = ShardSet(self.index_file, generation)
+        self.analyzer.check(shard_set.analyzer)
+        self.analyzer.load_stems(shard_set.stems)
+        self._start_workers(shard_set)
+        return shard_set
+
+    def _start_workers(self, shard_set):
+        names = [shard['name'] for shard in shard_set.shards]
+        for name in set(self._pools) - set(names):
+            self._pools.pop(name).shutdown(wait=False)
+        for name in names:
+            if name not in self._pools:
+                self._pools[name] = ProcessPoolExecutor(
+                    max_workers=1, initializer=_init_shard_worker,
+                    initargs=(self.stopword_file, shard_file(self.index_file, name), self._shard_options))
+
+    def _search(self, query_type, terms, k, scorer=None):
+        '''
+        Scatters the query to every shard and merges their top k
+        '''
+        scorer = scorer or self.scorer
+        start = time.perf_counter()
+        self._check_fork()
+        pools = [self._pools[shard['name']] for shard in self.snapshot.shards]
+        futures = [pool.submit(_search_shard, query_type, terms, k, scorer) for pool in pools]
+        results = [future.result() for future in futures]
+        #the candidates and postings of the query are only known to the shard workers
+        metrics.query_seconds.observe(time.perf_counter() - start, query_type=query_type, scorer=scorer)
+        if all(result is None for result in results):
+            return None
+        return heapq.nlargest(k, (x for result in results if result for x in result))
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            #forked after the pools were started (gunicorn --preload), they belong to the parent
+            self._pools, self._pid = {}, os.getpid()
+            self._start_workers(self.load())
+
+    def stats(self):
+        stats = super().stats()
+        self._check_fork()
+        shard_stats = [pool.submit(_stats_shard) for pool in self._pools.values()]
+        stats['shards'] = [future.result() for future in shard_stats]
+        return stats
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.shutdown()
+        self._pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+from types import MappingProxyType
+
+from .binary_index import BinaryIndex, is_binary_index
+from .cache import LRUCache
+from .index_meta import file_signature, read_text_meta
+from .postings import POSTINGS_LAYOUT, POSTINGS_LAYOUTS, CompactPostings, CompactTfs, PostingsStore
+from .scoring import collection_stats
+
+SORTED_POSTINGS_CACHE_SIZE = 1024   # Terms whose sorted postings are kept, like the decoded postings of BinaryIndex
+
+
+class IndexSnapshot:
+    '''
+    Immutable, fully loaded view of one index file.
+    A snapshot is never modified once built. Reloading the index builds a new
+    snapshot and swaps the reference, so a query always sees one consistent index.
+    '''
+    __slots__ = ('index', 'tf', 'idf', 'num_summaries', 'generation', 'signature',
+                 'source', 'backing', 'max_scores', 'analyzer', 'stems', 'collection_stats', 'loaded_at',
+                 'load_time', '_derived', '_memory_footprint', '__weakref__')
+
+    def __init__(self, index, tf, idf, num_summaries, generation=0, signature=None,
+                 source=None, backing=None, max_scores=None, analyzer=None, stems=None, collection_stats=None,
+                 load_time=0.0):
+        self.index = _read_only(index)          #term -> [[summary_id, [positions]], ...] or CompactPostings
+        self.tf = _read_only(tf)                #term -> [tf, ...] parallel to the postings, or CompactTfs
+        self.idf = _read_only(idf)              #term -> idf
+        self.num_summaries = num_summaries
+        self.generation = generation            #incremented every time a new snapshot is swapped in
+        self.signature = signature              #(mtime_ns, size) of the file the snapshot was built from
+        self.source = source
+        self.backing = backing                  #BinaryIndex when the snapshot is memory-mapped
+        self.max_scores = max_scores or {}      #term -> highest tf * idf, precomputed by CreateIndex
+        self.analyzer = analyzer                #version of the analyzer that built the index, None if not recorded
+        self.stems = _read_only(stems or {})    #word -> stem for the vocabulary of the corpus
+        self.collection_stats = collection_stats #document lengths for the scorers, see scoring.py
+        self.loaded_at = time.time()
+        self.load_time = load_time
+        self._derived = {}                      #structures derived from the postings on first use
+        self._memory_footprint = None
+
+    def __setattr__(self, name, value):
+        if hasattr(self, '_memory_footprint') and name != '_memory_footprint':
+            raise AttributeError('IndexSnapshot is immutable')
+        object.__setattr__(self, name, value)
+
+    def max_score(self, term):
+        '''
+        Upper bound of the score a summary can get from the term
+        '''
+        max_score = self.max_scores.get(term)
+        if max_score is None and self.backing is not None:
+            max_score = self.backing.max_score(term)
+        if max_score is None:
+            #index built before the bounds were stored
+            max_score = max(self.tf[term]) * self.idf[term]
+        return max_score
+
+    def postings_arrays(self, term):
+        '''
+        (summary_ids, tfs) of the term sorted by summary_id, for document at a time evaluation
+        '''
+        postings = self.index[term]
+        if isinstance(postings, CompactPostings):
+            #already sorted, views of the store
+            tfs = self.tf[term]
+            return postings.summary_ids, postings.tfs if isinstance(tfs, CompactTfs) else tfs
+        if self.backing is not None:
+            #decoded sorted by summary_id, cached by the binary index
+            return self.backing.summary_ids(term), self.tf[term]
+        key = ('postings', term)
+        cache = self._sorted_postings()
+        arrays = cache.get(key)
+        if arrays is None:
+            pairs = sorted(zip((x[0] for x in postings), self.tf[term]))
+            arrays = ([x[0] for x in pairs], [x[1] for x in pairs])
+            cache.set(key, arrays)
+        return arrays
+
+    def phrase_postings(self, term):
+        '''
+        (summary_ids, positions) of the term sorted by summary_id, for phrase matching
+        '''
+        compact = self.index[term]
+        if isinstance(compact, CompactPostings):
+            return compact.summary_ids, compact.position_lists()
+        if self.backing is not None:
+            return self.backing.summary_ids(term), self.backing.positions(term)
+        key = ('phrase', term)
+        cache = self._sorted_postings()
+        postings = cache.get(key)
+        if postings is None:
+            pairs = sorted(compact, key=lambda x: x[0])
+            postings = ([x[0] for x in pairs], [x[1] for x in pairs])
+            cache.set(key, postings)
+        return postings
+
+    def _sorted_postings(self):
+        #sorted copies of the 'lists' layout postings, only the recently used terms are kept
+        cache = self._derived.get('sorted_postings')
+        if cache is None:
+            cache = self._derived.setdefault('sorted_postings', LRUCache(SORTED_POSTINGS_CACHE_SIZE))
+        return cache
+
+    def summary_tfs(self, term):
+        '''
+        (summary_id, tf) of every posting of the term, in index order
+        '''
+        postings = self.index[term]
+        if isinstance(postings, CompactPostings):
+            tfs = self.tf[term]
+            return zip(postings.summary_ids, postings.tfs if isinstance(tfs, CompactTfs) else tfs)
+        return zip([x[0] for x in postings], self.tf[term])
+
+    def postings_nbytes(self, term, positions=False):
+        '''
+        Bytes of the postings of the term as laid out in the compact store: its summary ids and tfs,
+        and the positions when they are read too
+        '''
+        postings = self.index.get(term)
+        if postings is None:
+            return 0
+        nbytes = 8 * len(postings)
+        if positions and isinstance(postings, CompactPostings):
+            offsets = postings.store.offsets
+            nbytes += 4 * (offsets[postings.stop] - offsets[postings.start])
+        elif positions:
+            nbytes += 4 * sum(len(x[1]) for x in postings)
+        return nbytes
+
+    def layout(self):
+        if self.backing is not None:
+            return 'binary'
+        for postings in self.index.values():
+            return 'compact' if isinstance(postings, CompactPostings) else 'lists'
+        return 'lists'
+
+    def memory_footprint(self):
+        '''
+        Approximate number of bytes held by the snapshot.
+        Walking the postings is as expensive as a load, so it is computed once and cached.
+        '''
+        if self._memory_footprint is None and self.backing is not None:
+            self._memory_footprint = self.backing.memory_footprint()
+        elif self._memory_footprint is None:
+            self._memory_footprint = (_deep_sizeof(self.index) + _deep_sizeof(self.tf)
+                                      + _deep_sizeof(self.idf))
+        return self._memory_footprint
+
+    def stats(self):
+        return {'source': self.source,
+                'format': 'binary' if self.backing is not None else 'text',
+                'postings_layout': self.layout(),
+                'generation': self.generation,
+                'num_summaries': self.num_summaries,
+                'num_terms': len(self.index),
+                'analyzer': self.analyzer,
+                'load_time_ms': round(self.load_time * 1000, 3),
+                'loaded_at': self.loaded_at,
+                'age_seconds': round(time.time() - self.loaded_at, 3),
+                'memory_bytes': self.memory_footprint()}
+
+
+def read_text_index(index_file, layout='lists'):
+    '''
+    Parses the pipe delimited index written by CreateIndex._write_to_file
+    Format: keyword|summary_id:position|tf|idf
+    layout 'compact' moves the postings of every term into a PostingsStore as soon as it is read
+    '''
+    if layout not in POSTINGS_LAYOUTS:
+        raise ValueError('Unknown postings layout {}'.format(layout))
+    store = PostingsStore() if layout == 'compact' else None
+    index, tf, idf = {}, {}, {}
+    with open(index_file, 'r') as fh:
+        # first read the number of documents
+        num_summaries = int(fh.readline().rstrip())
+        for line in fh:
+            line = line.rstrip()
+            term, position, term_tf, term_idf = line.split('|')
+            position = position.split(';')
+            position = [x.split(':') for x in position]
+            index[term] = [[int(x[0]), list(map(int, x[1].split(',')))] for x in position]
+            #read term frequencies
+            tf[term] = list(map(float, term_tf.split(',')))
+            if store is not None:
+                index[term], tf[term] = store.add(index[term], tf[term])
+            #read inverse document frequency
+            idf[term] = float(term_idf)
+    return index, tf, idf, num_summaries
+
+
+def load_snapshot(index_file, generation=0, layout=POSTINGS_LAYOUT):
+    '''
+    Loads any index format: text, binary (recognised by its magic bytes) or the manifest of a segmented index.
+    layout is the in-memory layout of the postings of the text and segmented indexes,
+    the binary index decodes its postings from the mapped file.
+    '''
+    if layout not in POSTINGS_LAYOUTS:
+        raise ValueError('Unknown postings layout {}'.format(layout))
+    if os.path.basename(index_file) == 'shards.json':
+        raise ValueError('{} is the manifest of a sharded index, search it with shards.ShardedQueryIndex'.format(
+            index_file))
+    signature = file_signature(index_file)
+    start = time.perf_counter()
+    backing = None
+    meta = {}
+    if is_binary_index(index_file):
+        backing = BinaryIndex(index_file)
+        index, tf, idf, num_summaries = backing.index, backing.tf, backing.idf, backing.num_summaries
+        meta = backing.meta
+    elif _is_segment_manifest(index_file):
+        from .segments import load_segments
+        index, tf, idf, num_summaries, meta = load_segments(index_file)
+        if layout == 'lists':
+            index = {term: [[summary_id, list(positions)] for summary_id, positions in index[term]] for term in index}
+            tf = {term: list(tf[term]) for term in index}
+    else:
+        index, tf, idf, num_summaries = read_text_index(index_file, layout)
+        meta = read_text_meta(index_file)
+    return IndexSnapshot(index, tf, idf, num_summaries,
+                         generation=generation,
+                         signature=signature,
+                         source=index_file,
+                         backing=backing,
+                         max_scores=meta.get('max_scores'),
+                         analyzer=meta.get('analyzer'),
+                         stems=meta.get('stems'),
+                         collection_stats=collection_stats(meta),
+                         load_time=time.perf_counter() - start)
+
+
+def _is_segment_manifest(index_file):
+    from .segments import is_manifest
+    return is_manifest(index_file)
+
+
+def _read_only(mapping):
+    return MappingProxyType(mapping) if isinstance(mapping, dict) else mapping
+
+
+def _deep_sizeof(obj):
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, (dict, MappingProxyType)):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif isinstance(o, PostingsStore):
+            stack.extend(o.buffers())
+        elif isinstance(o, (CompactPostings, CompactTfs)):
+            stack.append(o.store)
+        elif hasattr(o, 'segment_postings'):
+            #the live postings of a segmented index, merged on first use
+            stack.extend(o.segment_postings())
+    return size
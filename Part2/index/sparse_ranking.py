@@ -0,0 +1,82 @@
+import threading
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:     # optional dependencies, only needed for RANKING_BACKEND = 'sparse'
+    np = None
+    sparse = None
+
+
+class SparseRanker:
+    '''
+    Vectorized tf-idf ranking over a sparse CSR term x summary tf matrix.
+    A query is scored with one sparse mat-vec and the best k are picked with a partition
+    instead of a sort.
+
+    The matrix is built from the snapshot the first time it is queried and kept with it,
+    a new snapshot swapped in gets its own.
+    '''
+    def __init__(self):
+        if np is None:
+            raise ImportError("The sparse ranking backend needs numpy and scipy: pip install numpy scipy")
+        self._lock = threading.Lock()
+
+    def _build(self, snapshot):
+        rows, indptr, indices, data = {}, [0], [], []
+        num_columns = 0
+        for row, term in enumerate(snapshot.index):
+            rows[term] = row
+            for summary_id, tf in snapshot.summary_tfs(term):
+                indices.append(summary_id)
+                data.append(tf)
+                num_columns = max(num_columns, summary_id + 1)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix((np.array(data, dtype=np.float64),
+                                    np.array(indices, dtype=np.int64),
+                                    np.array(indptr, dtype=np.int64)),
+                                   shape=(len(rows), num_columns))
+        return matrix, rows
+
+    def matrix(self, snapshot):
+        #kept with the snapshot, the scorers each rank with a snapshot of their own
+        matrix = snapshot._derived.get('sparse_matrix')
+        if matrix is None:
+            with self._lock:
+                matrix = snapshot._derived.get('sparse_matrix')
+                if matrix is None:
+                    matrix = snapshot._derived['sparse_matrix'] = self._build(snapshot)
+        return matrix
+
+    def __call__(self, snapshot, terms, candidates, k):
+        '''
+        Same contract and results as ranking.top_k: [(score, summary_id)], best first
+        '''
+        if not candidates or k <= 0:
+            return []
+        matrix, rows = self.matrix(snapshot)
+        query_rows = [rows[term] for term in terms if term in rows]
+        if not query_rows:
+            return []
+        query = np.array([snapshot.idf[term] for term in terms if term in rows], dtype=np.float64)
+
+        #The transpose is a CSC matrix whose mat-vec adds the contributions column (= query term)
+        #after column, the same summation order as the term at a time python ranking
+        sub_matrix = matrix[query_rows]
+        scores = sub_matrix.T @ query
+
+        #only the candidates that contain at least one of the query terms get a score
+        touched = np.bincount(sub_matrix.indices, minlength=matrix.shape[1]) > 0
+        mask = np.zeros(matrix.shape[1], dtype=bool)
+        candidate_ids = np.fromiter((x for x in candidates if x < matrix.shape[1]), dtype=np.int64)
+        mask[candidate_ids] = True
+        summary_ids = np.flatnonzero(mask & touched)
+        candidate_scores = scores[summary_ids]
+
+        if len(summary_ids) > k:
+            #keep everything tied with the k-th score so ties are broken like the python ranking
+            kth = np.partition(candidate_scores, len(candidate_scores) - k)[len(candidate_scores) - k]
+            keep = candidate_scores >= kth
+            summary_ids, candidate_scores = summary_ids[keep], candidate_scores[keep]
+        order = np.lexsort((-summary_ids, -candidate_scores))[:k]
+        return [(float(candidate_scores[i]), int(summary_ids[i])) for i in order]
@@ -0,0 +1,140 @@
+'''
+Pure python Porter stemmer, the original algorithm of M.F. Porter, "An algorithm for
+suffix stripping", Program 14(3), 1980.
+
+A word is [C](VC)^m[V] where C and V are runs of consonants and vowels, m is its measure.
+Each step strips at most one suffix, the longest one that matches, if the rest of the word
+satisfies the condition of the rule.
+'''
+
+_VOWELS = frozenset('aeiou')
+
+
+def _is_consonant(word, i):
+    ch = word[i]
+    if ch in _VOWELS:
+        return False
+    if ch == 'y':
+        #y is a vowel after a consonant
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem):
+    m = 0
+    previous_vowel = False
+    for i in range(len(stem)):
+        consonant = _is_consonant(stem, i)
+        if consonant and previous_vowel:
+            m += 1
+        previous_vowel = not consonant
+    return m
+
+
+def _has_vowel(stem):
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _ends_double_consonant(word):
+    return len(word) >= 2 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1)
+
+
+def _ends_cvc(word):
+    #consonant-vowel-consonant where the last consonant isn't w, x or y, e.g. hop but not snow
+    n = len(word)
+    return (n >= 3 and _is_consonant(word, n - 1) and not _is_consonant(word, n - 2)
+            and _is_consonant(word, n - 3) and word[-1] not in 'wxy')
+
+
+def _longest_suffix(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix):
+            return suffix
+    return None
+
+
+def _by_length(rules):
+    return sorted(rules, key=len, reverse=True)
+
+
+_STEP2 = {'ational': 'ate', 'tional': 'tion', 'enci': 'ence', 'anci': 'ance', 'izer': 'ize',
+          'abli': 'able', 'alli': 'al', 'entli': 'ent', 'eli': 'e', 'ousli': 'ous',
+          'ization': 'ize', 'ation': 'ate', 'ator': 'ate', 'alism': 'al', 'iveness': 'ive',
+          'fulness': 'ful', 'ousness': 'ous', 'aliti': 'al', 'iviti': 'ive', 'biliti': 'ble'}
+_STEP3 = {'icate': 'ic', 'ative': '', 'alize': 'al', 'iciti': 'ic', 'ical': 'ic', 'ful': '', 'ness': ''}
+_STEP4 = ('al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement', 'ment', 'ent', 'ion',
+          'ou', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize')
+_STEP2_SUFFIXES = _by_length(_STEP2)
+_STEP3_SUFFIXES = _by_length(_STEP3)
+_STEP4_SUFFIXES = _by_length(_STEP4)
+
+
+def _replace(word, suffixes, rules, min_measure):
+    suffix = _longest_suffix(word, suffixes)
+    if suffix is not None:
+        stem = word[:-len(suffix)]
+        if _measure(stem) > min_measure:
+            return stem + rules[suffix]
+    return word
+
+
+def _step1(word):
+    #plurals
+    if word.endswith('sses') or word.endswith('ies'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+
+    #past participles
+    if word.endswith('eed'):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                elif _ends_double_consonant(word) and word[-1] not in 'lsz':
+                    word = word[:-1]
+                elif _measure(word) == 1 and _ends_cvc(word):
+                    word += 'e'
+                break
+
+    if word.endswith('y') and _has_vowel(word[:-1]):
+        word = word[:-1] + 'i'
+    return word
+
+
+def _step4(word):
+    suffix = _longest_suffix(word, _STEP4_SUFFIXES)
+    if suffix is None:
+        return word
+    stem = word[:-len(suffix)]
+    if suffix == 'ion' and not stem.endswith(('s', 't')):
+        return word
+    return stem if _measure(stem) > 1 else word
+
+
+def _step5(word):
+    if word.endswith('e'):
+        stem = word[:-1]
+        m = _measure(stem)
+        if m > 1 or (m == 1 and not _ends_cvc(stem)):
+            word = stem
+    if word.endswith('ll') and _measure(word) > 1:
+        word = word[:-1]
+    return word
+
+
+def porter_stem(word):
+    '''
+    Stem of a lowercase word, words of one or two letters are left alone
+    '''
+    if len(word) <= 2:
+        return word
+    word = _step1(word)
+    word = _replace(word, _STEP2_SUFFIXES, _STEP2, 0)
+    word = _replace(word, _STEP3_SUFFIXES, _STEP3, 0)
+    word = _step4(word)
+    return _step5(word)
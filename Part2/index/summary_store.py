@@ -0,0 +1,275 @@
+import json
+import mmap
+import re
+from array import array
+from bisect import bisect_left
+import threading
+import time
+
+from .cache import LRUCache
+from .snapshot import file_signature
+from .tranform_data import _JSONStream
+from .segments import is_manifest, read_manifest, segment_file
+
+
+class SummaryStore:
+    '''
+    Resident summary store keyed by the integer summary id.
+    Loads the transformed data file once and reloads it when the file changes.
+    The authors table of the file is kept as well, keyed by the integer book id.
+    '''
+    mode = 'resident'
+
+    def __init__(self, transformed_data_file, reload_check_interval=1.0):
+        self.transformed_data_file = transformed_data_file
+        self.reload_check_interval = reload_check_interval
+        self.signature = None
+        self.authors = {}
+        self.generation = 0
+        self.load_time = 0.0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with open(self.transformed_data_file, 'r') as tdf:
+            json_file = json.load(tdf)
+        self._summaries = {int(key): value for key, value in json_file['summaries'].items()}
+        self.authors = {int(key): value for key, value in json_file.get('authors', {}).items()}
+
+    def load(self):
+        '''
+        Loads the store if it isn't loaded yet
+        '''
+        if self.signature is None:
+            self.reload()
+        return self
+
+    def reload(self):
+        with self._lock:
+            signature = file_signature(self.transformed_data_file)
+            start = time.perf_counter()
+            self._load()
+            self.load_time = time.perf_counter() - start
+            self.signature = signature
+            self.generation += 1
+            self._last_check = time.monotonic()
+        return self
+
+    def refresh(self):
+        '''
+        Reloads the store if the file changed, checked at most every reload_check_interval seconds
+        '''
+        if self.signature is None:
+            return self.reload()
+        now = time.monotonic()
+        if now - self._last_check < self.reload_check_interval:
+            return self
+        self._last_check = now
+        try:
+            signature = file_signature(self.transformed_data_file)
+        except OSError:
+            return self
+        if signature != self.signature:
+            self.reload()
+        return self
+
+    def get(self, summary_id):
+        return self._summaries[summary_id]
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def stats(self):
+        return {'mode': self.mode,
+                'source': self.transformed_data_file,
+                'generation': self.generation,
+                'num_summaries': len(self),
+                'load_time_ms': round(self.load_time * 1000, 3)}
+
+
+class LazySummaryStore(SummaryStore):
+    '''
+    Keeps only an offsets table into the transformed data file and decodes summaries on demand.
+    Decoded summaries are kept in an LRU cache, so memory stays bounded for large corpora.
+    '''
+    mode = 'lazy'
+
+    def __init__(self, transformed_data_file, reload_check_interval=1.0, cache_size=4096):
+        super().__init__(transformed_data_file, reload_check_interval)
+        self.cache = LRUCache(cache_size)
+        self._state = ((array('Q'), array('Q'), array('Q')), None)   #(offsets, mapped file), swapped together on reload
+
+    def _load(self):
+        with open(self.transformed_data_file, 'rb') as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets, authors = _summary_offsets(buf)
+        previous = self._state[1]
+        self._state = (offsets, buf)
+        self.authors = {int(key): value for key, value in authors.items()}
+        self.cache.clear()
+        if previous is not None:
+            #a reader still holding the old mapping reads again from the new one, see _read
+            previous.close()
+
+    def get(self, summary_id):
+        summary = self.cache.get(summary_id)
+        if summary is None:
+            summary = json.loads(self._read(summary_id))
+            self.cache.set(summary_id, summary)
+        return summary
+
+    def _read(self, summary_id):
+        while True:
+            (ids, starts, ends), buf = self._state
+            i = bisect_left(ids, summary_id)
+            if i == len(ids) or ids[i] != summary_id:
+                raise KeyError(summary_id)
+            try:
+                return buf[starts[i]:ends[i]]
+            except ValueError:
+                if not buf.closed:
+                    raise
+                #closed by a reload since the state was read, the new one is in place
+
+    def __len__(self):
+        return len(self._state[0][0])
+
+    def stats(self):
+        stats = super().stats()
+        stats['cache'] = self.cache.stats()
+        return stats
+
+
+class SegmentSummaryStore(SummaryStore):
+    '''
+    Resident store of the live summaries of a segmented index, see segments.py.
+    Reloaded whenever the manifest changes, like the index: only the segments that are new
+    since the last load are read, the tombstones are applied to the summaries already loaded.
+    '''
+    mode = 'segments'
+
+    def __init__(self, transformed_data_file, reload_check_interval=1.0):
+        super().__init__(transformed_data_file, reload_check_interval)
+        self._summaries = {}
+        self._segments = {}     #name -> deleted summary ids of every segment loaded
+        self._locations = {}    #summary_id -> name of the segment its summary was loaded from
+
+    def _load(self):
+        manifest = read_manifest(self.transformed_data_file)
+        summaries, authors, locations = dict(self._summaries), dict(self.authors), dict(self._locations)
+        segments = {segment['name']: frozenset(segment['deleted']) for segment in manifest['segments']}
+        #tombstones and merged away segments first, a merged segment brings its live summaries back
+        for name, loaded_deleted in self._segments.items():
+            deleted = segments.get(name)
+            if deleted is None:
+                removed = [x for x, location in locations.items() if location == name]
+            else:
+                removed = [x for x in deleted - loaded_deleted if locations.get(x) == name]
+            for summary_id in removed:
+                del summaries[summary_id], locations[summary_id]
+        for name, deleted in segments.items():
+            if name in self._segments:
+                continue
+            with open(segment_file(self.transformed_data_file, name, '.json')) as fh:
+                json_file = json.load(fh)
+            for key, value in json_file['summaries'].items():
+                if int(key) not in deleted:
+                    summaries[int(key)] = value
+                    locations[int(key)] = name
+            authors.update((int(key), value) for key, value in json_file['authors'].items())
+        self._summaries, self.authors, self._locations, self._segments = summaries, authors, locations, segments
+
+
+def _summary_offsets(buf, chunk_size=None):
+    '''
+    Byte offsets of every value of the top level 'summaries' object, as (ids, starts, ends)
+    arrays sorted by summary id, about 24 bytes per summary.
+    The (small) 'authors' object is decoded on the way and returned as well.
+    The mmapped file is scanned through a window of a few chunks, so building the offsets
+    doesn't need a copy of the file. It is decoded as latin-1 so character offsets are byte
+    offsets; the structural characters of JSON are ASCII, so multi-byte utf-8 sequences
+    can't be mistaken for them.
+    '''
+    buf.seek(0)
+    stream = _OffsetStream(_Latin1Reader(buf), chunk_size)
+    ids, starts, ends = array('Q'), array('Q'), array('Q')
+    authors = {}
+    stream.take('{')
+    while stream.peek() != '}':
+        key = stream.value()
+        stream.take(':')
+        if key == 'summaries':
+            stream.take('{')
+            decoder = stream.decoder
+            while True:
+                #fast path straight on the buffer, the stream only reads the next chunk
+                text, pos = stream.buf, stream.pos
+                entry = _SUMMARY_ENTRY.match(text, pos)
+                if entry is not None:
+                    try:
+                        _, end = decoder.raw_decode(text, entry.end())
+                    except json.JSONDecodeError:
+                        end = len(text)
+                    if end < len(text):
+                        ids.append(int(entry.group(1)))
+                        starts.append(stream.base + entry.end())
+                        ends.append(stream.base + end)
+                        stream.pos = _SEPARATOR.match(text, end).end()
+                        continue
+                if stream.peek() == '}':
+                    break
+                if stream.eof:
+                    raise ValueError('Expected a summary at {!r}'.format(text[pos:pos + 20]))
+                stream._fill()
+            stream.take('}')
+        elif key == 'authors':
+            stream.peek()
+            start = stream.offset()
+            stream.value()
+            authors = json.loads(buf[start:stream.offset()])
+        else:
+            stream.value()
+        if stream.peek() == ',':
+            stream.take(',')
+    if any(ids[i] > ids[i + 1] for i in range(len(ids) - 1)):
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        ids, starts, ends = (array('Q', (x[i] for i in order)) for x in (ids, starts, ends))
+    return (ids, starts, ends), authors
+
+
+_SUMMARY_ENTRY = re.compile(r'\s*"(\d+)"\s*:\s*')   #the key of a summary, up to its value
+_SEPARATOR = re.compile(r'\s*,?')
+
+
+class _Latin1Reader:
+    def __init__(self, buf):
+        self.buf = buf
+
+    def read(self, size):
+        return self.buf.read(size).decode('latin-1')
+
+
+class _OffsetStream(_JSONStream):
+    '''
+    _JSONStream that knows the offset in the file of its position
+    '''
+    base = 0    #offset of the start of the buffered chunk
+
+    def _fill(self):
+        self.base += self.pos
+        super()._fill()
+
+    def offset(self):
+        return self.base + self.pos
+
+
+def create_summary_store(transformed_data_file, mode='resident', **kwargs):
+    if is_manifest(transformed_data_file):
+        #the summaries of a segmented index live in its segments
+        kwargs.pop('cache_size', None)
+        return SegmentSummaryStore(transformed_data_file, **kwargs)
+    if mode == 'resident':
+        return SummaryStore(transformed_data_file, **kwargs)
+    if mode == 'lazy':
+        return LazySummaryStore(transformed_data_file, **kwargs)
+    raise ValueError('Unknown summary store mode {}'.format(mode))
@@ -0,0 +1,112 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from Part2.index.analyzer import Analyzer, AnalyzerMismatchError
+from Part2.index.binary_index import convert_text_index
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import QueryIndex
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+class AnalyzerTest(TestCase):
+    """ Test module for the analyzer shared by CreateIndex and QueryIndex """
+
+    def setUp(self):
+        self.analyzer = Analyzer(STOPWORD_FILE)
+
+    def test_terms(self):
+        self.assertIsInstance(self.analyzer.stopwords, frozenset)
+        self.assertEqual(['book', 'three', 'sentences', 'mail', '2020'],
+                         self.analyzer.terms('The Book in three-sentences: E-mail\t2020!'))
+        #non ascii characters are separators, uppercase ones are lowered first
+        self.assertEqual(['caf', 'na', 've'], self.analyzer.terms('CAFÉ naïve'))
+        self.assertEqual([], self.analyzer.terms('the of and'))
+
+    def test_positions_skip_stopwords(self):
+        text = 'The art of the book, and the book of art'
+        positions = self.analyzer.positions(text)
+        self.assertEqual(iter(positions), positions)
+        self.assertEqual([('art', 0), ('book', 1), ('book', 2), ('art', 3)], list(positions))
+        with open('index/data.json') as json_file:
+            summaries = [x['summary'] for x in json.load(json_file)['summaries']]
+        for summary in summaries:
+            self.assertEqual(list(enumerate(self.analyzer.terms(summary))),
+                             [(p, t) for t, p in self.analyzer.positions(summary)])
+
+    def test_query_memo(self):
+        terms = self.analyzer.query_terms('Life  Lessons')
+        self.assertEqual(('life', 'lessons'), terms)
+        self.assertIs(terms, self.analyzer.query_terms('Life  Lessons'))
+        self.assertEqual((), self.analyzer.query_terms('the'))
+        self.assertEqual((), self.analyzer.query_terms('the'))
+        memo = self.analyzer.stats()['query_memo']
+        self.assertEqual((2, 2), (memo['hits'], memo['misses']))
+
+    def test_shared_by_index_and_queries(self):
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, None)
+        qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE)
+        query = 'Mindfulness: the "Art" of living'
+        self.assertEqual(tuple(ci_obj._get_terms(query)), qi_obj._get_terms(query))
+        self.assertEqual(ci_obj.stopwords, qi_obj.stopwords)
+
+
+class StemmingTest(TestCase):
+    """ Test module for the stemming analyzer and the analyzer version stored in the index """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def create_index(self, index_file, stemmer):
+        ci_obj = CreateIndex(STOPWORD_FILE, 'index/data.json', os.path.join(self.tmp_dir, 'transformed.json'),
+                             os.path.join(self.tmp_dir, index_file), stemmer=stemmer)
+        ci_obj.create_index()
+        return ci_obj
+
+    def test_stems_stored_at_build_time(self):
+        ci_obj = self.create_index('index.txt', 'porter')
+        self.assertEqual('mind', ci_obj.analyzer.stems['mindfulness'])
+        self.assertIn('mind', ci_obj.index)
+        self.assertNotIn('mindfulness', ci_obj.index)
+
+        qi = QueryIndex(STOPWORD_FILE, os.path.join(self.tmp_dir, 'index.txt'), TRANSFORMED_DATA_FILE,
+                        stemmer='porter')
+        snapshot = qi.load()
+        self.assertEqual('porter-1', snapshot.analyzer)
+        self.assertEqual(dict(ci_obj.analyzer.stems), dict(snapshot.stems))
+        with mock.patch.object(qi.analyzer, '_stem_word') as stem_word:
+            self.assertEqual(('mind', 'live'), qi._get_terms('Mindfulness lives'))
+        stem_word.assert_not_called()
+        self.assertEqual(qi.query_index('mindfulness', 5), qi.query_index('minds', 5))
+
+        binary_file = os.path.join(self.tmp_dir, 'index.bin')
+        convert_text_index(os.path.join(self.tmp_dir, 'index.txt'), binary_file)
+        binary_qi = QueryIndex(STOPWORD_FILE, binary_file, TRANSFORMED_DATA_FILE, stemmer='porter')
+        self.assertEqual(dict(snapshot.stems), dict(binary_qi.load().stems))
+        self.assertEqual(qi.query_index('mindful living', 5), binary_qi.query_index('mindful living', 5))
+
+    def test_mismatched_analyzer_is_refused(self):
+        self.create_index('porter.txt', 'porter')
+        with self.assertRaises(AnalyzerMismatchError):
+            QueryIndex(STOPWORD_FILE, os.path.join(self.tmp_dir, 'porter.txt'), TRANSFORMED_DATA_FILE).load()
+        #the committed index was built without stemming
+        with self.assertRaises(AnalyzerMismatchError):
+            QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, stemmer='porter').load()
+        with self.assertRaises(ValueError):
+            Analyzer(STOPWORD_FILE, stemmer='snowball')
+
+    def test_mismatched_reload_keeps_current_index(self):
+        index_file = os.path.join(self.tmp_dir, 'index.txt')
+        self.create_index('index.txt', None)
+        qi = QueryIndex(STOPWORD_FILE, index_file, TRANSFORMED_DATA_FILE, reload_check_interval=0)
+        expected = qi.query_index('mindfulness', 5)
+        self.create_index('index.txt', 'porter')
+        with self.assertLogs('Part2.index.query_index', 'ERROR'):
+            self.assertEqual(expected, qi.query_index('mindfulness', 5))
+        self.assertEqual('plain-1', qi.snapshot.analyzer)
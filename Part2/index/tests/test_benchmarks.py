@@ -0,0 +1,62 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from Part2.benchmarks.corpus import write_corpus
+from Part2.benchmarks.suite import QUERY_STAGES, compare, run_suite
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import QueryIndex
+
+STOPWORD_FILE = 'index/stopwords.dat'
+
+
+class BenchmarkSuiteTest(TestCase):
+    """ Test module for the synthetic corpus generator and the benchmark suite """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_corpus_has_the_data_json_schema(self):
+        data_file = os.path.join(self.tmp_dir, 'data.json')
+        queries = write_corpus(data_file, 300, vocabulary_size=500, summary_length=20, num_queries=30)
+        with open(data_file) as fh:
+            data = json.load(fh)
+        self.assertEqual({'titles', 'queries', 'summaries', 'authors'}, set(data))
+        self.assertEqual(queries, data['queries'])
+        self.assertEqual(list(range(300)), [x['id'] for x in data['summaries']])
+        self.assertEqual(list(range(300)), [x['book_id'] for x in data['authors']])
+        self.assertEqual(300, len(data['titles']))
+        self.assertEqual(30, len(queries))
+        self.assertEqual(write_corpus(os.path.join(self.tmp_dir, 'again.json'), 300, vocabulary_size=500,
+                                      summary_length=20, num_queries=30), queries)
+
+        transformed_data_file = os.path.join(self.tmp_dir, 'transformed_data.json')
+        index_file = os.path.join(self.tmp_dir, 'index.txt')
+        CreateIndex(STOPWORD_FILE, data_file, transformed_data_file, index_file).create_index()
+        qi = QueryIndex(STOPWORD_FILE, index_file, transformed_data_file, result_cache=None)
+        types = [qi._parse_query(query)[0] for query in queries]
+        self.assertEqual([10, 10, 10], [types.count(query_type) for query_type in QUERY_STAGES])
+        for query in queries:
+            if query.startswith('"'):
+                #the phrases come from the summaries
+                self.assertTrue(qi.query_index(query, 1))
+
+    def test_suite_and_compare(self):
+        results = run_suite(200, vocabulary_size=500, summary_length=20, num_queries=30, repeat=1,
+                            work_dir=self.tmp_dir)
+        self.assertEqual(['transform', 'create_index', 'read_index'] + list(QUERY_STAGES), list(results['stages']))
+        for stage in results['stages'].values():
+            self.assertGreater(stage['throughput'], 0)
+        self.assertEqual([], os.listdir(self.tmp_dir))
+        json.dumps(results)
+
+        slower = json.loads(json.dumps(results))
+        slower['stages']['phrase']['throughput'] *= 0.7
+        slower['stages']['transform']['throughput'] *= 0.9
+        rows = {row[0]: row for row in compare(results, slower, threshold=0.2)}
+        self.assertTrue(rows['phrase'][4])
+        self.assertFalse(rows['transform'][4])
+        self.assertAlmostEqual(-0.3, rows['phrase'][3])
+        self.assertFalse(any(row[4] for row in compare(slower, results)))
@@ -0,0 +1,91 @@
+from django.test import TestCase
+import os
+import shutil
+import struct
+import tempfile
+from Part2.index.binary_index import BinaryIndex, BinaryIndexError, convert_text_index, is_binary_index
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import QueryIndex
+from Part2.index.scoring import get_scorer
+from Part2.index.snapshot import load_snapshot, read_text_index
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+TEST_RAW_DATA_FILE = 'index/tests/test_data.json'
+TEST_INDEX_FILE = 'index/tests/test_index.txt'
+TEST_TRANSFORMED_DATA = 'index/tests/test_transformed_data.json'
+
+
+class BinaryIndexTest(TestCase):
+    """ Test module for the memory-mapped binary index format """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.binary_file = os.path.join(self.tmp_dir, 'index.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_convert_text_index(self):
+        convert_text_index(INDEX_FILE, self.binary_file)
+        self.assertTrue(is_binary_index(self.binary_file))
+        self.assertFalse(is_binary_index(INDEX_FILE))
+
+        index, tf, idf, num_summaries = read_text_index(INDEX_FILE)
+        binary_index = BinaryIndex(self.binary_file)
+        self.assertEqual(num_summaries, binary_index.num_summaries)
+        self.assertEqual(sorted(index), list(binary_index.index))
+        self.assertNotIn('missing', binary_index.index)
+        for term in index:
+            self.assertEqual(sorted(index[term]), binary_index.index[term])
+            self.assertEqual(idf[term], binary_index.idf[term])
+            tfs = dict(zip([x[0] for x in index[term]], tf[term]))
+            for (summary_id, _), value in zip(binary_index.index[term], binary_index.tf[term]):
+                self.assertAlmostEqual(tfs[summary_id], value, places=6)
+
+    def test_unknown_version(self):
+        convert_text_index(INDEX_FILE, self.binary_file)
+        with open(self.binary_file, 'r+b') as fh:
+            fh.seek(4)
+            fh.write(struct.pack('<H', 7))
+        with self.assertRaisesRegex(BinaryIndexError, 'version 7'):
+            BinaryIndex(self.binary_file)
+
+    def test_create_binary_index(self):
+        ci_obj = CreateIndex(STOPWORD_FILE, TEST_RAW_DATA_FILE, os.path.join(self.tmp_dir, 'transformed.json'),
+                             self.binary_file, index_format='binary')
+        ci_obj.create_index()
+        binary_index = BinaryIndex(self.binary_file)
+        self.assertEqual([[0, [0]], [1, [0]]], binary_index.index['book'])
+        self.assertEqual([[1, [2]]], binary_index.index['science'])
+        self.assertEqual(2.0, binary_index.idf['literature'])
+
+    def test_query_binary_index(self):
+        convert_text_index(TEST_INDEX_FILE, self.binary_file)
+        text_qi = QueryIndex(STOPWORD_FILE, TEST_INDEX_FILE, TEST_TRANSFORMED_DATA)
+        binary_qi = QueryIndex(STOPWORD_FILE, self.binary_file, TEST_TRANSFORMED_DATA)
+        for query in ('science', 'nawaz', 'book on science', '"nawaz on science"', '"book on science"', 'by'):
+            self.assertEqual(text_qi.query_index(query, 2), binary_qi.query_index(query, 2))
+        self.assertEqual('binary', binary_qi.stats()['format'])
+
+    def test_query_binary_index_on_corpus(self):
+        convert_text_index(INDEX_FILE, self.binary_file)
+        text_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE)
+        binary_qi = QueryIndex(STOPWORD_FILE, self.binary_file, TRANSFORMED_DATA_FILE)
+        for query in ('life', 'achieve take book', '"three sentences"'):
+            self.assertEqual([x['id'] for x in text_qi.query_index(query, 10)],
+                             [x['id'] for x in binary_qi.query_index(query, 10)])
+
+    def test_snapshot_postings(self):
+        convert_text_index(INDEX_FILE, self.binary_file)
+        snapshot = load_snapshot(self.binary_file)
+        lists = load_snapshot(INDEX_FILE, layout='lists')
+        for scored in (snapshot, get_scorer('bm25').prepare(snapshot)):
+            summary_ids, tfs = scored.postings_arrays('book')
+            #the decoded lists of the binary index, no sorted copy kept with the snapshot
+            self.assertIs(summary_ids, snapshot.backing.summary_ids('book'))
+            self.assertEqual(lists.postings_arrays('book')[0], summary_ids)
+            summary_ids, positions = scored.phrase_postings('book')
+            self.assertEqual(lists.phrase_postings('book'), (summary_ids, positions))
+            self.assertNotIn('sorted_postings', scored._derived)
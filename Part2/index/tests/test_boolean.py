@@ -0,0 +1,136 @@
+from django.test import TestCase
+import os
+import random
+import shutil
+import tempfile
+from unittest import mock
+from Part2.benchmarks.corpus import build_snapshot, synthetic_summaries
+from Part2.index import boolean, profiling
+from Part2.index.boolean import QuerySyntaxError, analyze, matches, parse, to_string
+from Part2.index.phrase import phrase_matches
+from Part2.index.profiling import SlowQueryLog, read_log
+from Part2.index.query_index import QueryIndex
+from Part2.index.ranking import top_k
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+def reference_matches(snapshot, tree):
+    #set algebra over whole posting lists
+    op = tree[0]
+    if op == 'term':
+        return {x[0] for x in snapshot.index.get(tree[1], [])}
+    if op == 'phrase':
+        return set(phrase_matches(snapshot, tree[1]))
+    if op == 'not':
+        return set()
+    included = [reference_matches(snapshot, x) for x in tree[1:] if x[0] != 'not']
+    if op == 'or':
+        return set().union(*included)
+    excluded = [reference_matches(snapshot, x[1]) for x in tree[1:] if x[0] == 'not']
+    return set.intersection(*included).difference(*excluded) if included else set()
+
+
+class BooleanQueryTest(TestCase):
+    """ Test module for the boolean query parser and its evaluation """
+
+    def setUp(self):
+        self.qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None)
+
+    def test_parse(self):
+        book, life, three = ('term', 'book'), ('term', 'life'), ('term', 'three')
+        self.assertEqual(('and', book, life), parse('book AND life'))
+        self.assertEqual(('or', book, life), parse('book OR life'))
+        #no operator is OR, AND binds tighter than OR
+        self.assertEqual(('or', book, ('and', life, three)), parse('book life AND three'))
+        self.assertEqual(('and', ('or', book, life), three), parse('(book OR life) AND three'))
+        #a NOT excludes from all the operands around it
+        self.assertEqual(('and', ('or', book, life), ('not', three)), parse('book life NOT three'))
+        self.assertEqual(('and', book, ('not', three)), parse('NOT three book'))
+        self.assertEqual(('and', book, ('not', three)), parse('book AND NOT three'))
+        self.assertEqual(('and', ('phrase', 'take the book'), ('term', 'Life')), parse('"take the book" AND Life'))
+        #lower case operators are words
+        self.assertFalse(boolean.is_boolean('book and life'))
+        self.assertFalse(boolean.is_boolean('"book AND life"'))
+        self.assertTrue(boolean.is_boolean('(book)NOT life'))
+        for query in ('book AND', 'AND book', '(book OR life', 'book) OR life', 'book AND ()', 'NOT', 'book OR OR life'):
+            with self.assertRaises(QuerySyntaxError):
+                parse(query)
+        self.assertTrue(issubclass(QuerySyntaxError, ValueError))
+
+    def test_analyze(self):
+        analyzed = analyze(parse('The Book AND (the OR "take the book") AND (life AND NOT NOT self-help)'),
+                           self.qi._get_terms)
+        self.assertEqual(('and', ('term', 'book'), ('phrase', ('take', 'book')), ('term', 'life'),
+                          ('phrase', ('self', 'help'))), analyzed)
+        self.assertEqual(analyzed, analyze(parse(to_string(analyzed)), self.qi._get_terms))
+        self.assertEqual('book AND "take book" AND life AND "self help"', to_string(analyzed))
+        self.assertIsNone(analyze(parse('the AND (a OR NOT an)'), self.qi._get_terms))
+        #what is left may be a query of another type
+        self.assertEqual(self.qi._parse_query('book life'), self.qi._parse_query('book OR life'))
+        self.assertEqual(self.qi._parse_query('book'), self.qi._parse_query('the AND book'))
+        self.assertEqual(self.qi._parse_query('"take book"'), self.qi._parse_query('"take book" OR the'))
+        self.assertEqual('boolean', self.qi._parse_query('book AND life')[0])
+
+    def test_matches(self):
+        queries = ['book AND life', 'book AND three AND sentences', 'book NOT life', 'book life NOT three',
+                   '(book OR mindfulness) AND NOT (life OR three)', 'book AND "three sentences"',
+                   'xyzzy AND book', 'book NOT xyzzy', 'NOT book', 'life AND (book OR "take book") NOT xyzzy',
+                   'book AND book']
+        for layout in ('compact', 'lists'):
+            qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, postings_layout=layout)
+            snapshot = qi.load()
+            for query in queries:
+                query_type, tree = qi._parse_query(query)
+                self.assertEqual('boolean', query_type)
+                expected = sorted(reference_matches(snapshot, tree))
+                self.assertEqual(expected, list(matches(snapshot, tree)))
+                #ranked like a free text query of the terms it doesn't exclude
+                positive = boolean.positive_terms(tree)
+                ranked = top_k(snapshot, positive, expected, 10)
+                self.assertEqual([{'id': x, 'summary': qi.summary_store.get(x)} for score, x in ranked] if positive else
+                                 [], qi.query_index(query, 10))
+            self.assertTrue(matches(snapshot, qi._parse_query('book AND life')[1]))
+            self.assertEqual(qi.query_index('book AND life', 5), qi.boolean_query('book AND life', 5))
+
+    def test_stopwords_only(self):
+        #nothing left to search for, and nothing printed to the server log
+        with mock.patch('builtins.print') as printed:
+            self.assertIsNone(self.qi.query_index('the AND of', 5))
+            self.assertIsNone(self.qi.query_index('"the of"', 5))
+            self.assertIsNone(self.qi.query_index('the of', 5))
+        printed.assert_not_called()
+
+    def test_synthetic_matches(self):
+        summaries = synthetic_summaries(2000, vocabulary_size=300, summary_length=30)
+        snapshot = build_snapshot(summaries)
+        rng = random.Random(2)
+        words = ['w{}'.format(i) for i in range(300)]
+
+        def random_tree(depth):
+            if depth == 0 or rng.random() < 0.3:
+                return ('term', rng.choice(words))
+            if rng.random() < 0.2:
+                return ('not', random_tree(depth - 1))
+            return (rng.choice(('and', 'or')),) + tuple(random_tree(depth - 1) for _ in range(rng.randint(2, 4)))
+
+        for _ in range(300):
+            tree = random_tree(3)
+            self.assertEqual(sorted(reference_matches(snapshot, tree)), list(matches(snapshot, tree)))
+
+    def test_trace(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        log_file = os.path.join(tmp_dir, 'slow_queries.jsonl')
+        with mock.patch.object(profiling, 'slow_query_log', SlowQueryLog(log_file, threshold=0)):
+            self.qi.query_index('book AND (life OR "take book")', 5)
+        entry, = read_log(log_file)
+        query, = entry['queries']
+        self.assertEqual('boolean', query['query_type'])
+        self.assertEqual(['book AND (life OR "take book")'], query['terms'])
+        snapshot = self.qi.load()
+        self.assertEqual(snapshot.postings_nbytes('book', True) + snapshot.postings_nbytes('book') +
+                         snapshot.postings_nbytes('life') + snapshot.postings_nbytes('take', True),
+                         query['postings_bytes'])
@@ -0,0 +1,85 @@
+from django.test import TestCase
+from Part2.index import metrics
+from Part2.index.metrics import Registry
+from Part2.index.query_index import QueryIndex
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+class MetricsTest(TestCase):
+    """ Test module for the search metrics """
+
+    def test_prometheus_format(self):
+        registry = Registry()
+        requests = registry.counter('requests_total', 'Requests', ('status',))
+        latency = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+        self.assertIs(requests, registry.counter('requests_total', 'Requests', ('status',)))
+        with self.assertRaises(ValueError):
+            registry.histogram('requests_total', 'Requests')
+        requests.inc(status='ok')
+        requests.inc(2, status='ok')
+        requests.inc(status='bad "one"')
+        for value in (0.05, 0.5, 0.5, 3):
+            latency.observe(value, stage='parse')
+        with self.assertRaises(ValueError):
+            latency.observe(1)
+        self.assertEqual(3, requests.value(status='ok'))
+        self.assertEqual(4, latency.count(stage='parse'))
+        self.assertEqual('\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{status="bad \\"one\\""} 1',
+            'requests_total{status="ok"} 3',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{stage="parse",le="0.1"} 1',
+            'latency_seconds_bucket{stage="parse",le="1.0"} 3',
+            'latency_seconds_bucket{stage="parse",le="+Inf"} 4',
+            'latency_seconds_sum{stage="parse"} 4.05',
+            'latency_seconds_count{stage="parse"} 4',
+        ]) + '\n', registry.render())
+
+    def test_disabled(self):
+        registry = Registry(enabled=False)
+        latency = registry.histogram('latency_seconds', 'Latency')
+        with latency.time():
+            pass
+        self.assertEqual(0, latency.count())
+
+    def test_query_metrics(self):
+        qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, pruning='exhaustive')
+        qi.load()
+        before = {query_type: metrics.query_seconds.count(query_type=query_type, scorer='tfidf')
+                  for query_type in ('one_word', 'free_text', 'phrase')}
+        candidates = metrics.query_candidates.sum(query_type='free_text')
+        postings_bytes = metrics.query_postings_bytes.sum(query_type='phrase')
+        misses = metrics.result_cache_lookups.value(result='miss')
+        hits = metrics.result_cache_lookups.value(result='hit')
+        qi.query_batch(['book', 'achieve take book', '"take book"', 'book'], 5)
+        qi.query_index('book', 5)
+        for query_type in before:
+            self.assertEqual(before[query_type] + 1, metrics.query_seconds.count(query_type=query_type, scorer='tfidf'))
+        #the summaries with any of the terms are scored
+        snapshot = qi.load()
+        union = {x[0] for term in ('achieve', 'take', 'book') for x in snapshot.index.get(term, [])}
+        self.assertEqual(candidates + len(union), metrics.query_candidates.sum(query_type='free_text'))
+        self.assertEqual(postings_bytes + snapshot.postings_nbytes('take', positions=True)
+                         + snapshot.postings_nbytes('book', positions=True),
+                         metrics.query_postings_bytes.sum(query_type='phrase'))
+        self.assertEqual(misses + 3, metrics.result_cache_lookups.value(result='miss'))
+        self.assertEqual(hits + 1, metrics.result_cache_lookups.value(result='hit'))
+        rendered = metrics.REGISTRY.render()
+        for name in ('search_stage_seconds_bucket{stage="parse"', 'search_stage_seconds_count{stage="evaluate"}',
+                     'search_query_seconds_sum{query_type="phrase",scorer="tfidf"}'):
+            self.assertIn(name, rendered)
+
+    def test_postings_nbytes(self):
+        for layout in ('lists', 'compact'):
+            snapshot = QueryIndex(STOPWORD_FILE, INDEX_FILE, None, postings_layout=layout).load()
+            postings = snapshot.index['book']
+            self.assertEqual(8 * len(postings), snapshot.postings_nbytes('book'))
+            self.assertEqual(8 * len(postings) + 4 * sum(len(x[1]) for x in postings),
+                             snapshot.postings_nbytes('book', positions=True))
+            self.assertEqual(0, snapshot.postings_nbytes('xyzzy'))
@@ -0,0 +1,72 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from Part2.benchmarks.corpus import iter_synthetic_summaries
+from Part2.index.create_index import CreateIndex
+from Part2.index.index_meta import read_text_meta
+from Part2.index.parallel_build import ParallelIndexBuilder
+from Part2.index.query_index import QueryIndex
+from Part2.index.snapshot import read_text_index
+
+STOPWORD_FILE = 'index/stopwords.dat'
+RAW_DATA_FILE = 'index/data.json'
+
+
+class ParallelBuildTest(TestCase):
+    """ Test module for the streaming, parallel index builder """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def assertSameIndex(self, expected_file, index_file):
+        self.assertEqual(read_text_index(expected_file), read_text_index(index_file))
+        self.assertEqual(read_text_meta(expected_file).keys(), read_text_meta(index_file).keys())
+        expected_meta, meta = read_text_meta(expected_file), read_text_meta(index_file)
+        #the files hold the same index, not necessarily in the same term order
+        for key in ('index_signature', 'index_hash'):
+            del expected_meta[key], meta[key]
+        self.assertEqual(expected_meta, meta)
+
+    def test_same_index_as_serial_build(self):
+        for stemmer in (None, 'porter'):
+            serial = CreateIndex(STOPWORD_FILE, RAW_DATA_FILE, self.path('transformed.json'), self.path('serial.txt'),
+                                 stemmer=stemmer)
+            serial.create_index()
+            parallel = CreateIndex(STOPWORD_FILE, RAW_DATA_FILE, self.path('transformed.json'),
+                                   self.path('parallel.txt'), stemmer=stemmer, workers=2, memory_budget=2**16)
+            parallel.create_index()
+            self.assertEqual(serial.num_summaries, parallel.num_summaries)
+            self.assertSameIndex(self.path('serial.txt'), self.path('parallel.txt'))
+
+        with open(RAW_DATA_FILE) as json_file:
+            queries = json.load(json_file)['queries']
+        serial_qi = QueryIndex(STOPWORD_FILE, self.path('serial.txt'), self.path('transformed.json'), stemmer='porter')
+        parallel_qi = QueryIndex(STOPWORD_FILE, self.path('parallel.txt'), self.path('transformed.json'),
+                                 stemmer='porter')
+        for query in queries:
+            self.assertEqual(serial_qi.query_index(query, 5), parallel_qi.query_index(query, 5))
+
+    def test_multi_pass_merge(self):
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, self.path('serial.txt'))
+        ci_obj.index_summaries(dict(iter_synthetic_summaries(3000, vocabulary_size=2000, summary_length=20)))
+        ci_obj._write_to_file()
+
+        builder = ParallelIndexBuilder(STOPWORD_FILE, self.path('parallel.txt'), workers=3, memory_budget=50000,
+                                       merge_fan_in=4)
+        builder.build(iter_synthetic_summaries(3000, vocabulary_size=2000, summary_length=20))
+        self.assertGreater(builder.num_runs, 16)
+        self.assertEqual(3000, builder.num_summaries)
+        self.assertSameIndex(self.path('serial.txt'), self.path('parallel.txt'))
+        #only the index and its metadata are left, the runs are removed
+        self.assertEqual(['parallel.txt', 'parallel.txt.meta.json', 'serial.txt', 'serial.txt.meta.json'],
+                         sorted(os.listdir(self.tmp_dir)))
+
+    def test_parallel_build_writes_text(self):
+        with self.assertRaises(ValueError):
+            CreateIndex(STOPWORD_FILE, RAW_DATA_FILE, None, None, index_format='binary', workers=2)
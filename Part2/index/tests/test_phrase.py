@@ -0,0 +1,61 @@
+from django.test import TestCase
+import random
+from Part2.benchmarks.corpus import build_snapshot, synthetic_summaries
+from Part2.index.phrase import _gallop, phrase_matches
+from Part2.index.query_index import QueryIndex
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+def reference_matches(snapshot, terms):
+    #summaries where some start position has every term at its offset
+    if any(term not in snapshot.index for term in terms):
+        return []
+    positions = [{summary_id: set(p) for summary_id, p in snapshot.index[term]} for term in terms]
+    result = []
+    for summary_id, starts in positions[0].items():
+        if any(all(start + offset in positions[offset].get(summary_id, ())
+                   for offset in range(1, len(terms))) for start in starts):
+            result.append(summary_id)
+    return sorted(result)
+
+
+class PhraseTest(TestCase):
+    """ Test module for the positional phrase matcher """
+
+    def setUp(self):
+        self.qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE)
+
+    def test_gallop(self):
+        values = [1, 3, 5, 7, 9, 11, 13, 15, 17]
+        for target in range(20):
+            for lo in range(len(values)):
+                expected = next((i for i in range(lo, len(values)) if values[i] >= target), len(values))
+                self.assertEqual(expected, _gallop(values, target, lo))
+
+    def test_corpus_phrases(self):
+        snapshot = self.qi_obj.load()
+        phrases = ['three sentences', 'book three sentences', 'problems life', 'mindfulness',
+                   'life mindfulness', 'xyzzy sentences', 'sentences three']
+        for phrase in phrases:
+            terms = self.qi_obj._get_terms(phrase)
+            self.assertEqual(reference_matches(snapshot, terms), phrase_matches(snapshot, terms))
+
+    def test_synthetic_phrases(self):
+        summaries = synthetic_summaries(500, vocabulary_size=50, summary_length=40)
+        snapshot = build_snapshot(summaries)
+        rng = random.Random(1)
+        for length in range(2, 7):
+            for _ in range(20):
+                words = summaries[rng.randrange(500)].split()
+                start = rng.randrange(len(words) - length)
+                terms = words[start:start + length]
+                self.assertEqual(reference_matches(snapshot, terms), phrase_matches(snapshot, terms))
+        #repeated terms
+        self.assertEqual(reference_matches(snapshot, ['w0', 'w0']), phrase_matches(snapshot, ['w0', 'w0']))
+        self.assertEqual(reference_matches(snapshot, ['w0', 'w1', 'w0']), phrase_matches(snapshot, ['w0', 'w1', 'w0']))
+
+    def test_single_word_phrase(self):
+        self.assertEqual(self.qi_obj.query_index('mindfulness', 3), self.qi_obj.query_index('"mindfulness"', 3))
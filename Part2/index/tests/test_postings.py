@@ -0,0 +1,106 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from unittest import mock
+from Part2.index.postings import CompactPostings, PostingsStore, compact_index
+from Part2.index.query_index import QueryIndex
+from Part2.index.segments import SegmentedIndex
+from Part2.index import snapshot as snapshot_module
+from Part2.index.snapshot import load_snapshot, read_text_index
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+RAW_DATA_FILE = 'index/data.json'
+
+
+class CompactPostingsTest(TestCase):
+    """ Test module for the compact array layout of the postings """
+
+    def test_store(self):
+        store = PostingsStore()
+        postings, tfs = store.add([[3, [4, 9]], [1, [0]], [2, [5, 6, 7]]], [0.5, 0.25, 0.75])
+        self.assertEqual(3, len(postings))
+        #sorted by summary_id, the tf follow their posting
+        self.assertEqual([1, 2, 3], list(postings.summary_ids))
+        self.assertEqual([0.25, 0.75, 0.5], list(tfs))
+        self.assertEqual((3, [4, 9]), (postings[-1][0], list(postings[-1][1])))
+        self.assertEqual([[1, [0]], [2, [5, 6, 7]], [3, [4, 9]]], postings)
+        self.assertEqual([5, 6, 7], list(postings.position_lists()[1]))
+        with self.assertRaises(IndexError):
+            postings[3]
+
+        other, _ = store.add([[7, [1]]], [1.0])
+        self.assertEqual([[7, [1]]], other)
+        self.assertEqual(array('I', [0, 1, 4, 6, 7]), store.offsets)
+        self.assertEqual(4 * (4 + 4 + 5 + 7), store.nbytes())
+
+    def test_same_postings_as_lists(self):
+        index, tf, idf, num_summaries = read_text_index(INDEX_FILE)
+        compact, compact_tf, compact_idf, compact_num_summaries = read_text_index(INDEX_FILE, 'compact')
+        self.assertEqual((idf, num_summaries), (compact_idf, compact_num_summaries))
+        self.assertEqual(sorted(index), sorted(compact))
+        for term in index:
+            self.assertIsInstance(compact[term], CompactPostings)
+            pairs = sorted(zip(index[term], tf[term]), key=lambda x: x[0][0])
+            self.assertEqual([x[0] for x in pairs], compact[term])
+            for (_, value), compact_value in zip(pairs, compact_tf[term]):
+                self.assertAlmostEqual(value, compact_value, places=6)
+
+        converted, converted_tf = compact_index(index, tf)
+        self.assertEqual(list(compact['book']), list(converted['book']))
+        self.assertEqual(list(compact_tf['book']), list(converted_tf['book']))
+
+    def test_snapshot(self):
+        lists = load_snapshot(INDEX_FILE, layout='lists')
+        compact = load_snapshot(INDEX_FILE)
+        self.assertEqual('lists', lists.stats()['postings_layout'])
+        self.assertEqual('compact', compact.stats()['postings_layout'])
+        self.assertLess(compact.memory_footprint(), lists.memory_footprint() * 0.6)
+
+        summary_ids, tfs = compact.postings_arrays('book')
+        self.assertEqual(lists.postings_arrays('book')[0], list(summary_ids))
+        self.assertIsInstance(summary_ids, memoryview)
+        summary_ids, positions = compact.phrase_postings('book')
+        expected_ids, expected_positions = lists.phrase_postings('book')
+        self.assertEqual(expected_ids, list(summary_ids))
+        self.assertEqual(expected_positions, [list(x) for x in positions])
+        with self.assertRaises(ValueError):
+            load_snapshot(INDEX_FILE, layout='columns')
+
+    def test_sorted_postings_bounded(self):
+        lists = load_snapshot(INDEX_FILE, layout='lists')
+        with mock.patch.object(snapshot_module, 'SORTED_POSTINGS_CACHE_SIZE', 4):
+            terms = sorted(lists.index)[:10]
+            for term in terms:
+                self.assertEqual(sorted(x[0] for x in lists.index[term]), lists.postings_arrays(term)[0])
+                lists.phrase_postings(term)
+        #only the recently used terms keep their sorted copy
+        self.assertEqual(4, lists._derived['sorted_postings'].stats()['size'])
+
+    def test_same_results(self):
+        with open(RAW_DATA_FILE) as json_file:
+            queries = json.load(json_file)['queries']
+        queries += ['book', '"the book"', '"life lessons"', 'book three life', 'zzyzx']
+        for options in ({}, {'pruning': 'exhaustive'}):
+            lists_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None,
+                                  postings_layout='lists', **options)
+            compact_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, **options)
+            for query in queries:
+                self.assertEqual(lists_qi.query_index(query, 5), compact_qi.query_index(query, 5))
+        with self.assertRaises(ValueError):
+            QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, postings_layout='columns')
+
+    def test_segments(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        segments = SegmentedIndex(os.path.join(tmp_dir, 'segments'), STOPWORD_FILE)
+        segments.add({1: 'the book of life', 2: 'a book'})
+        segments.add({3: 'life and books', 2: 'another life'})
+        snapshot = load_snapshot(segments.manifest_file)
+        self.assertEqual('compact', snapshot.layout())
+        self.assertEqual([1, 2, 3], sorted(snapshot.postings_arrays('life')[0]))
+        self.assertEqual([1], list(snapshot.postings_arrays('book')[0]))
@@ -0,0 +1,95 @@
+from django.test import TestCase, override_settings
+import gc
+import os
+import shutil
+import tempfile
+import weakref
+from unittest import mock
+from Part2.index import preload as preload_module, query_index
+from Part2.index.binary_index import convert_text_index
+from Part2.index.preload import preload, preload_server
+from Part2.index.query_index import QueryIndex
+from Part2.index.scoring import get_scorer
+from Part2.index.segments import SegmentedIndex
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+class PreloadTest(TestCase):
+    """ Test module for loading the index before the server forks its workers """
+
+    def tearDown(self):
+        #the rest of the test run collects as usual
+        gc.unfreeze()
+
+    def test_preload(self):
+        qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, scorer='bm25')
+        frozen = gc.get_freeze_count()
+        self.assertGreaterEqual(preload(qi), 0)
+        self.assertTrue(gc.isenabled())
+        self.assertGreater(gc.get_freeze_count(), frozen)
+        snapshot = qi.load()
+        #the weights of the default scorer are computed before the fork too
+        scored = get_scorer('bm25').prepare(snapshot)
+        self.assertEqual(len(snapshot.index), len(scored.tf._values))
+        self.assertEqual(len(snapshot.index), len(scored.max_scores._values))
+        self.assertEqual(qi.query_index('book', 5), QueryIndex(
+            STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, scorer='bm25').query_index('book', 5))
+
+    def test_no_freeze(self):
+        qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None)
+        frozen = gc.get_freeze_count()
+        preload(qi, freeze=False)
+        self.assertEqual(frozen, gc.get_freeze_count())
+        self.assertIsNotNone(qi.snapshot)
+
+    def test_preload_binary_index(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        binary_file = os.path.join(tmp_dir, 'index.bin')
+        convert_text_index(INDEX_FILE, binary_file)
+        qi = QueryIndex(STOPWORD_FILE, binary_file, TRANSFORMED_DATA_FILE, result_cache=None, scorer='bm25')
+        preload(qi, freeze=False)
+        #the pages of a memory-mapped index are shared as they are, nothing is decoded up front
+        self.assertEqual({}, get_scorer('bm25').prepare(qi.load()).tf._values)
+
+    @override_settings(SEARCH_PRELOAD_INDEX=True, SEARCH_GC_FREEZE=False)
+    def test_preload_server(self):
+        with mock.patch.object(preload_module, 'preload', return_value=0.5) as preload_mock:
+            self.assertEqual(0.5, preload_server())
+        preload_mock.assert_called_once_with(query_index._query_service, freeze=False)
+        with self.settings(SEARCH_PRELOAD_INDEX=False), mock.patch.object(preload_module, 'preload') as preload_mock:
+            self.assertIsNone(preload_server())
+        preload_mock.assert_not_called()
+
+    def test_reload_frees_frozen_snapshot(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        binary_file = os.path.join(tmp_dir, 'index.bin')
+        convert_text_index(INDEX_FILE, binary_file)
+        segments = SegmentedIndex(os.path.join(tmp_dir, 'segments'), STOPWORD_FILE)
+        segments.add({1: 'the book of life', 2: 'a book'})
+        segments.add({3: 'life and books'})
+        for index_file, data_file in ((INDEX_FILE, TRANSFORMED_DATA_FILE), (binary_file, TRANSFORMED_DATA_FILE),
+                                      (segments.manifest_file, segments.manifest_file)):
+            for scorer in ('tfidf', 'bm25'):
+                qi = QueryIndex(STOPWORD_FILE, index_file, data_file, result_cache=None, scorer=scorer,
+                                reload_check_interval=0)
+                preload(qi)
+                qi.query_index('"book life" OR book', 5)
+                old = weakref.ref(qi.snapshot)
+                #a new snapshot of the same file is swapped in
+                with mock.patch.object(query_index, 'file_signature', return_value=(0, 0)):
+                    qi.query_index('book', 5)
+                self.assertIsNot(old(), qi.snapshot)
+                #freed by reference counting, the collector never sees frozen objects
+                self.assertIsNone(old(), (index_file, scorer))
+                gc.unfreeze()
+
+    def test_data_files(self):
+        #the server finds the index wherever it is started from
+        for path in (query_index.STOPWORD_FILE, query_index.INDEX_FILE, query_index.TRANSFORMED_DATA_FILE):
+            self.assertTrue(os.path.isabs(path))
+            self.assertTrue(os.path.exists(path))
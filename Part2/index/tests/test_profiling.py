@@ -0,0 +1,122 @@
+from django.test import TestCase
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from Part2.index import profiling
+from Part2.index.profiling import SlowQueryLog, main, read_log, report
+from Part2.index.query_index import QueryIndex
+from search.async_views import AsyncSearchApp
+from search.author_resolver import AuthorResolver, LOCAL_ONLY
+from search.tests.test_async_views import call
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+class ProfilingTest(TestCase):
+    """ Test module for the slow query log and the request profiling """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.log_file = os.path.join(self.tmp_dir, 'slow_queries.jsonl')
+        self.qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, pruning='exhaustive')
+        self.qi.load()
+
+    def use_log(self, **kwargs):
+        log = SlowQueryLog(self.log_file, **kwargs)
+        patcher = mock.patch.object(profiling, 'slow_query_log', log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return log
+
+    def entries(self):
+        return list(read_log(self.log_file)) if os.path.exists(self.log_file) else []
+
+    def test_slow_queries_logged(self):
+        self.use_log(threshold=0)
+        self.qi.query_index('achieve take book', 5)
+        self.qi.query_batch(['"take book"', 'book'], 5)
+        first, second = self.entries()
+        self.assertEqual('query', first['kind'])
+        self.assertEqual('achieve take book', first['query'])
+        self.assertEqual({'parse', 'evaluate', 'serialize'}, set(first['stages']))
+        query = first['queries'][0]
+        self.assertEqual('free_text', query['query_type'])
+        self.assertEqual(list(self.qi._get_terms('achieve take book')), query['terms'])
+        snapshot = self.qi.load()
+        union = {x[0] for term in query['terms'] for x in snapshot.index.get(term, [])}
+        self.assertEqual(len(union), query['candidates'])
+        self.assertEqual(sum(snapshot.postings_nbytes(term) for term in query['terms']), query['postings_bytes'])
+        self.assertNotIn('profile', first)
+        #a batch is one request
+        self.assertEqual('batch', second['kind'])
+        self.assertEqual(['phrase', 'one_word'], [x['query_type'] for x in second['queries']])
+
+    def test_threshold(self):
+        self.use_log(threshold=60)
+        self.qi.query_index('book', 5)
+        self.assertEqual([], self.entries())
+        with mock.patch.object(profiling, 'slow_query_log', SlowQueryLog(None, threshold=0)):
+            self.qi.query_index('book', 5)
+        self.assertEqual([], self.entries())
+        with self.assertRaises(ValueError):
+            SlowQueryLog(self.log_file, profile='sometimes')
+
+    def test_profile_on_request(self):
+        self.use_log(threshold=0, profile='request')
+        self.qi.query_index('book', 5)
+        self.qi.query_index('book', 5, profile=True)
+        plain, profiled = self.entries()
+        self.assertNotIn('profile', plain)
+        functions = [row['function'] for row in profiled['profile']]
+        self.assertTrue(functions)
+        self.assertTrue(all(row['calls'] > 0 for row in profiled['profile']))
+
+    def test_search_view(self):
+        self.use_log(threshold=0, profile='request')
+        response = self.client.post('/search/get-summary', {'queries': ['book', 'book life'], 'K': 2, 'profile': True},
+                                    content_type='application/json')
+        self.assertEqual(200, response.status_code)
+        entry, = self.entries()
+        self.assertEqual('request', entry['kind'])
+        self.assertEqual(['one_word', 'free_text'], [x['query_type'] for x in entry['queries']])
+        self.assertIn('authors', entry['stages'])
+        self.assertIn('profile', entry)
+
+    def test_async_search_traces_every_query(self):
+        self.use_log(threshold=0)
+        resolver = AuthorResolver(LOCAL_ONLY, lambda: self.qi.authors, None)
+        app = AsyncSearchApp(None, query_service=self.qi, author_resolver=resolver)
+        self.addCleanup(app._executor.shutdown)
+        status, _, _ = call(app, json.dumps({'queries': ['book', 'book life'], 'K': 2}).encode())
+        self.assertEqual(200, status)
+        entries = sorted(self.entries(), key=lambda x: x['query'])
+        self.assertEqual(['query', 'query'], [x['kind'] for x in entries])
+        self.assertEqual([['one_word'], ['free_text']], [[y['query_type'] for y in x['queries']] for x in entries])
+
+    def test_report(self):
+        self.use_log(threshold=0, profile='all')
+        for query in ('book', 'book', 'achieve take book', '"take book"'):
+            self.qi.query_index(query, 5)
+        result = report(self.entries(), top=5)
+        self.assertEqual(4, result['requests'])
+        self.assertEqual(4, result['profiled'])
+        patterns = dict(result['queries'])
+        self.assertEqual(2, patterns['one_word book']['count'])
+        self.assertIn('phrase take book', patterns)
+        self.assertEqual(5, len(result['hotspots']))
+        self.assertGreaterEqual(result['hotspots'][0][1]['tottime'], result['hotspots'][-1][1]['tottime'])
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(0, main([self.log_file, '--top', '3']))
+        self.assertIn('4 slow requests, 4 profiled', out.getvalue())
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main([self.log_file, '--json'])
+        self.assertEqual(4, json.loads(out.getvalue())['requests'])
@@ -0,0 +1,93 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from Part2.benchmarks.corpus import build_snapshot, synthetic_summaries
+from Part2.index.binary_index import convert_text_index
+from Part2.index.create_index import CreateIndex
+from Part2.index.index_meta import read_text_meta
+from Part2.index.pruning import PruningStats, wand_top_k
+from Part2.index.query_index import QueryIndex
+from Part2.index.ranking import top_k
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+def union(snapshot, terms):
+    return {x[0] for term in terms for x in snapshot.index.get(term, [])}
+
+
+class PruningTest(TestCase):
+    """ Test module for the WAND free text evaluator """
+
+    def test_same_results_as_exhaustive(self):
+        wand_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, pruning='wand')
+        exhaustive_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, pruning='exhaustive')
+        with open('index/data.json') as json_file:
+            queries = json.load(json_file)['queries']
+        for query in queries + ['book three life', 'book book life']:
+            for k in (1, 5, 10):
+                self.assertEqual(exhaustive_qi.query_index(query, k), wand_qi.query_index(query, k))
+        self.assertGreater(wand_qi.pruning_stats.postings_skipped, 0)
+        self.assertLess(wand_qi.pruning_stats.docs_scored, exhaustive_qi.pruning_stats.docs_scored)
+
+    def test_synthetic_corpus(self):
+        snapshot = build_snapshot(synthetic_summaries(2000, vocabulary_size=500, summary_length=30))
+        stats = PruningStats()
+        for terms in (['w0', 'w1'], ['w0', 'w1', 'w2', 'w300'], ['w5', 'w5', 'w40'], ['w499', 'missing']):
+            for k in (1, 10):
+                self.assertEqual(top_k(snapshot, terms, union(snapshot, terms), k),
+                                 wand_top_k(snapshot, terms, k, stats))
+        self.assertGreater(stats.postings_skipped, stats.docs_scored)
+
+    def test_bounds_stored_at_build_time(self):
+        #the float64 tf of the index file, the compact layout rounds them to float32
+        snapshot = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, postings_layout='lists').load()
+        self.assertEqual(len(snapshot.index), len(snapshot.max_scores))
+        for term in ('book', 'mindfulness'):
+            self.assertAlmostEqual(max(snapshot.tf[term]) * snapshot.idf[term], snapshot.max_score(term))
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        binary_file = os.path.join(tmp_dir, 'index.bin')
+        convert_text_index(INDEX_FILE, binary_file)
+        binary_snapshot = QueryIndex(STOPWORD_FILE, binary_file, TRANSFORMED_DATA_FILE).load()
+        self.assertAlmostEqual(snapshot.max_score('book'), binary_snapshot.max_score('book'))
+        terms = ['book', 'life', 'mindfulness']
+        self.assertEqual([x[1] for x in top_k(binary_snapshot, terms, union(binary_snapshot, terms), 5)],
+                         [x[1] for x in wand_top_k(binary_snapshot, terms, 5)])
+
+    def test_stale_meta_is_ignored(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        index_file = os.path.join(tmp_dir, 'index.txt')
+        shutil.copy(INDEX_FILE, index_file)
+        shutil.copy(INDEX_FILE + '.meta.json', index_file + '.meta.json')
+        self.assertIn('max_scores', read_text_meta(index_file))
+        with open(index_file, 'a') as fh:
+            fh.write('zzz|0:1|1.0|55.0\n')
+        self.assertEqual({}, read_text_meta(index_file))
+
+    def test_meta_of_a_same_size_index_is_ignored(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        index_file = os.path.join(tmp_dir, 'index.txt')
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, index_file)
+        ci_obj.index_summaries({1: 'book on science', 2: 'science of books'})
+        ci_obj._write_to_file()
+        self.assertIn('max_scores', read_text_meta(index_file))
+        size = os.path.getsize(index_file)
+        meta_file = index_file + '.meta.json'
+        with open(meta_file) as fh:
+            meta = fh.read()
+        #a rebuild of the same size, with the metadata of the first build left next to it
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, index_file)
+        ci_obj.index_summaries({1: 'book on sciency', 2: 'sciency of books'})
+        ci_obj._write_to_file()
+        self.assertEqual(size, os.path.getsize(index_file))
+        with open(meta_file, 'w') as fh:
+            fh.write(meta)
+        self.assertEqual({}, read_text_meta(index_file))
@@ -0,0 +1,89 @@
+from django.test import TestCase
+import json
+from unittest import skipUnless
+from Part2.index import sparse_ranking
+from Part2.index.query_index import QueryIndex
+from Part2.index.ranking import get_ranker, top_k
+from Part2.index.snapshot import IndexSnapshot
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+def reference_rank(snapshot, terms, candidates, k):
+    #dot product of the summary and query vectors, fully sorted
+    scores = {}
+    for term in terms:
+        if term not in snapshot.index:
+            continue
+        for (summary_id, _), tf in zip(snapshot.index[term], snapshot.tf[term]):
+            if summary_id in candidates:
+                scores.setdefault(summary_id, []).append(tf * snapshot.idf[term])
+    ranked = sorted([[sum(x), summary_id] for summary_id, x in scores.items()], reverse=True)
+    return [(score, summary_id) for score, summary_id in ranked[:k]]
+
+
+class RankingTest(TestCase):
+    """ Test module for the top-k ranking engine """
+
+    def setUp(self):
+        self.qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE)
+        self.snapshot = self.qi_obj.load()
+        with open('index/data.json') as json_file:
+            self.queries = json.load(json_file)['queries']
+
+    def test_matches_full_sort(self):
+        for query in self.queries:
+            terms = self.qi_obj._get_terms(query)
+            candidates = {x[0] for term in terms for x in self.snapshot.index.get(term, [])}
+            for k in (1, 5, 100):
+                self.assertEqual(reference_rank(self.snapshot, terms, candidates, k),
+                                 top_k(self.snapshot, terms, candidates, k))
+
+    def test_sparse_candidates(self):
+        terms = ['book', 'life']
+        candidates = {3, 54}
+        self.assertEqual(reference_rank(self.snapshot, terms, candidates, 10),
+                         top_k(self.snapshot, terms, candidates, 10))
+        self.assertEqual([], top_k(self.snapshot, terms, set(), 10))
+        self.assertEqual([], top_k(self.snapshot, terms, candidates, 0))
+
+    def test_ties_broken_by_higher_id(self):
+        snapshot = IndexSnapshot({'a': [[0, [0]], [1, [0]], [2, [1]]], 'b': [[1, [1]]]},
+                                 {'a': [0.5, 0.5, 0.5], 'b': [0.5]},
+                                 {'a': 1.0, 'b': 3.0}, 3)
+        scores = top_k(snapshot, ['a', 'b'], {0, 1, 2}, 3)
+        self.assertEqual([(2.0, 1), (0.5, 2), (0.5, 0)], scores)
+
+
+@skipUnless(sparse_ranking.np is not None, 'numpy and scipy are not installed')
+class SparseRankingTest(TestCase):
+    """ Test module for the NumPy/SciPy ranking backend """
+
+    def setUp(self):
+        self.qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE)
+        self.sparse_qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, ranking_backend='sparse')
+        with open('index/data.json') as json_file:
+            self.queries = json.load(json_file)['queries']
+
+    def test_same_results_as_python_backend(self):
+        phrases = ['"three sentences"', '"book in three sentences"', '"the problems in your life"']
+        words = ['book', 'life', 'mindfulness', 'xyzzy']
+        for query in self.queries + phrases + words:
+            for k in (1, 3, 10, 100):
+                self.assertEqual(self.qi_obj.query_index(query, k), self.sparse_qi_obj.query_index(query, k))
+
+    def test_scores_identical(self):
+        snapshot = self.qi_obj.load()
+        ranker = get_ranker('sparse')
+        for query in self.queries:
+            terms = self.qi_obj._get_terms(query)
+            candidates = {x[0] for term in terms for x in snapshot.index.get(term, [])}
+            self.assertEqual(top_k(snapshot, terms, candidates, 20), ranker(snapshot, terms, candidates, 20))
+
+    def test_ties(self):
+        snapshot = IndexSnapshot({'a': [[0, [0]], [1, [0]], [2, [1]], [3, [0]]]},
+                                 {'a': [0.5, 0.5, 0.5, 0.25]}, {'a': 1.0}, 4)
+        self.assertEqual([(0.5, 2), (0.5, 1)], get_ranker('sparse')(snapshot, ['a'], {0, 1, 2, 3}, 2))
+        self.assertEqual(top_k(snapshot, ['a'], {0, 1, 3}, 2), get_ranker('sparse')(snapshot, ['a'], {0, 1, 3}, 2))
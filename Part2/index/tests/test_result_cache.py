@@ -0,0 +1,107 @@
+from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from Part2.index.query_index import QueryIndex
+from Part2.index.result_cache import MISS, MemoryResultCache, SQLiteResultCache, create_result_cache
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+class ResultCacheTest(TestCase):
+    """ Test module for the query result cache """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_hits_and_misses(self):
+        qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache='memory')
+        uncached = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None)
+        for query in ('life lessons', 'Life  Lessons', '"the book"', 'mindfulness'):
+            self.assertEqual(uncached.query_index(query, 3), qi.query_index(query, 3))
+        #'Life  Lessons' normalizes to the same key as 'life lessons'
+        stats = qi.stats()['result_cache']
+        self.assertEqual(('memory', 1, 3, 3), (stats['backend'], stats['hits'], stats['misses'], stats['size']))
+        self.assertEqual(0.25, stats['hit_ratio'])
+        self.assertEqual(0.75, stats['miss_ratio'])
+        self.assertNotIn('result_cache', uncached.stats())
+
+        with mock.patch.object(qi, '_evaluate', wraps=qi._evaluate) as evaluate:
+            qi.query_index('life lessons', 3)
+            qi.query_index('life lessons', 5)
+            qi.query_batch(['mindfulness', 'life lessons'], 3)
+        self.assertEqual(1, evaluate.call_count)
+
+    def test_new_index_generation_misses(self):
+        index_file = os.path.join(self.tmp_dir, 'index.txt')
+        shutil.copy(INDEX_FILE, index_file)
+        qi = QueryIndex(STOPWORD_FILE, index_file, TRANSFORMED_DATA_FILE, reload_check_interval=0)
+        before = qi.query_index('zzz', 3)
+        self.assertIsNone(before)
+        self.assertEqual(1, len(qi.result_cache.backend))
+
+        with open(index_file, 'a') as fh:
+            fh.write('zzz|0:1|1.0|55.0\n')
+        after = qi.query_index('zzz', 3)
+        self.assertEqual(1, len(after))
+        self.assertEqual(2, qi.stats()['result_cache']['misses'])
+
+    def test_shared_cache_keeps_other_generations(self):
+        index_file = os.path.join(self.tmp_dir, 'index.txt')
+        shutil.copy(INDEX_FILE, index_file)
+        cache = create_result_cache('memory')
+        stale = QueryIndex(STOPWORD_FILE, index_file, TRANSFORMED_DATA_FILE, reload_check_interval=3600)
+        fresh = QueryIndex(STOPWORD_FILE, index_file, TRANSFORMED_DATA_FILE, reload_check_interval=0)
+        stale.result_cache = fresh.result_cache = cache
+        stale.query_index('life', 3)
+        with open(index_file, 'a') as fh:
+            fh.write('zzz|0:1|1.0|55.0\n')
+        #a reload by one QueryIndex doesn't drop what the other one still uses
+        fresh.query_index('zzz', 3)
+        self.assertEqual(2, len(cache.backend))
+        with mock.patch.object(stale, '_evaluate') as evaluate:
+            stale.query_index('life', 3)
+        evaluate.assert_not_called()
+
+    def test_ttl_and_lru(self):
+        cache = MemoryResultCache(maxsize=2, ttl=0.05)
+        cache.set('g', 'a', [1])
+        cache.set('g', 'b', None)
+        self.assertIsNone(cache.get('g', 'b'))
+        self.assertEqual([1], cache.get('g', 'a'))
+        cache.set('g', 'c', [3])
+        self.assertIs(MISS, cache.get('g', 'b'))
+        time.sleep(0.06)
+        self.assertIs(MISS, cache.get('g', 'a'))
+
+        cache = SQLiteResultCache(os.path.join(self.tmp_dir, 'lru.sqlite3'), maxsize=2, ttl=0.05)
+        cache.set('g', ['one_word', ['a'], 3], [1])
+        time.sleep(0.01)
+        cache.set('g', ['one_word', ['b'], 3], None)
+        self.assertEqual([1], cache.get('g', ['one_word', ['a'], 3]))
+        cache.set('g', ['one_word', ['c'], 3], [3])
+        self.assertIs(MISS, cache.get('g', ['one_word', ['b'], 3]))
+        self.assertEqual(2, len(cache))
+        time.sleep(0.06)
+        self.assertIs(MISS, cache.get('g', ['one_word', ['a'], 3]))
+
+    def test_sqlite_shared_between_workers(self):
+        path = os.path.join(self.tmp_dir, 'results.sqlite3')
+        first = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache='sqlite',
+                           result_cache_file=path)
+        second = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache='sqlite',
+                            result_cache_file=path)
+        expected = first.query_index('life lessons', 3)
+        with mock.patch.object(second, '_evaluate') as evaluate:
+            self.assertEqual(expected, second.query_index('life lessons', 3))
+        evaluate.assert_not_called()
+        self.assertEqual(1, second.stats()['result_cache']['hits'])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_result_cache('redis')
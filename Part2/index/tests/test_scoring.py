@@ -0,0 +1,130 @@
+from django.test import TestCase
+import json
+import math
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+from Part2.index import sparse_ranking
+from Part2.index.create_index import CreateIndex
+from Part2.index.pruning import wand_top_k
+from Part2.index.query_index import QueryIndex
+from Part2.index.ranking import top_k
+from Part2.index.scoring import BM25_B, BM25_K1, get_scorer
+from Part2.index.shards import SHARDS_FILE, ShardedQueryIndex
+from Part2.index.snapshot import IndexSnapshot, load_snapshot
+
+STOPWORD_FILE = 'index/stopwords.dat'
+RAW_DATA_FILE = 'index/data.json'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+def reference_bm25(snapshot, terms, k):
+    #BM25 straight from its definition, fully sorted
+    lengths = {}
+    for postings in snapshot.index.values():
+        for summary_id, positions in postings:
+            lengths[summary_id] = lengths.get(summary_id, 0) + len(positions)
+    avg_length = sum(lengths.values()) / len(lengths)
+    scores = {}
+    for term in terms:
+        if term not in snapshot.index:
+            continue
+        df = len(snapshot.index[term])
+        idf = math.log(1 + (snapshot.num_summaries - df + 0.5) / (df + 0.5))
+        for summary_id, positions in snapshot.index[term]:
+            count = len(positions)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[summary_id] / avg_length)
+            scores[summary_id] = scores.get(summary_id, 0) + idf * count * (BM25_K1 + 1) / (count + norm)
+    return sorted(((score, summary_id) for summary_id, score in scores.items()), reverse=True)[:k]
+
+
+class ScoringTest(TestCase):
+    """ Test module for the selectable scorers """
+
+    def setUp(self):
+        with open(RAW_DATA_FILE) as json_file:
+            self.queries = json.load(json_file)['queries']
+        self.qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None)
+
+    def test_bm25_scores(self):
+        snapshot = self.qi.load()
+        scored = get_scorer('bm25').prepare(snapshot)
+        self.assertIs(scored, get_scorer('bm25').prepare(snapshot))
+        self.assertIs(snapshot, get_scorer('tfidf').prepare(snapshot))
+        for query in self.queries + ['book three life']:
+            terms = self.qi._get_terms(query)
+            candidates = {x[0] for term in terms for x in snapshot.index.get(term, [])}
+            expected = reference_bm25(snapshot, terms, 10)
+            for actual in (top_k(scored, terms, candidates, 10), wand_top_k(scored, terms, 10)):
+                self.assertEqual([x[1] for x in expected], [x[1] for x in actual])
+                for (expected_score, _), (score, _) in zip(expected, actual):
+                    self.assertAlmostEqual(expected_score, score, places=9)
+
+    def test_document_lengths_stored(self):
+        snapshot = load_snapshot(INDEX_FILE, layout='lists')
+        stats = snapshot.collection_stats
+        self.assertEqual(snapshot.num_summaries, len(stats['doc_lengths']))
+        for layout in ('lists', 'compact'):
+            #an index without the lengths in its metadata gets them counted from the postings
+            loaded = load_snapshot(INDEX_FILE, layout=layout)
+            counted = IndexSnapshot(loaded.index, loaded.tf, loaded.idf, loaded.num_summaries)
+            for query in self.queries:
+                terms = self.qi._get_terms(query)
+                self.assertEqual(wand_top_k(get_scorer('bm25').prepare(snapshot), terms, 10),
+                                 wand_top_k(get_scorer('bm25').prepare(counted), terms, 10))
+
+    def test_scorer_per_query(self):
+        qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE)
+        bm25_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, scorer='bm25')
+        for query in self.queries:
+            self.assertEqual(bm25_qi.query_index(query, 10), qi.query_index(query, 10, scorer='bm25'))
+            self.assertEqual(self.qi.query_index(query, 10), qi.query_index(query, 10))
+        self.assertEqual(bm25_qi.query_batch(self.queries, 5), qi.query_batch(self.queries, 5, 'bm25'))
+        #the scorer is part of the result cache key
+        query = 'achieve take book'
+        self.assertNotEqual(qi.query_index(query, 10, 'tfidf'), qi.query_index(query, 10, 'bm25'))
+        with self.assertRaises(ValueError):
+            qi.query_index(query, 10, 'cosine')
+        with self.assertRaises(ValueError):
+            QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, scorer='cosine')
+
+    def test_compact_and_list_layouts(self):
+        lists_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None,
+                              postings_layout='lists', scorer='bm25')
+        for query in self.queries + ['"the book"']:
+            for k in (1, 10):
+                self.assertEqual(lists_qi._search(*lists_qi._parse_query(query), k),
+                                 self.qi._search(*self.qi._parse_query(query), k, 'bm25'))
+
+    def test_sharded_bm25(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        with open(RAW_DATA_FILE) as json_file:
+            summaries = {x['id']: x['summary'] for x in json.load(json_file)['summaries']}
+        manifest_file = os.path.join(tmp_dir, SHARDS_FILE)
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, manifest_file, shards=3)
+        ci_obj.index_summaries(summaries)
+        ci_obj._write_to_file()
+        with ShardedQueryIndex(STOPWORD_FILE, manifest_file, TRANSFORMED_DATA_FILE, result_cache=None) as sharded_qi:
+            for query in self.queries:
+                #collection statistics of the whole corpus, same scores bit for bit
+                self.assertEqual(self.qi._search(*self.qi._parse_query(query), 10, 'bm25'),
+                                 sharded_qi._search(*sharded_qi._parse_query(query), 10, 'bm25'))
+
+    @skipUnless(sparse_ranking.np is not None, 'numpy and scipy are not installed')
+    def test_sparse_backend(self):
+        sparse_qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None,
+                               ranking_backend='sparse', pruning='exhaustive')
+        for query in self.queries:
+            for scorer in ('bm25', 'tfidf'):
+                self.assertEqual(self.qi.query_index(query, 10, scorer), sparse_qi.query_index(query, 10, scorer))
+
+    def test_saturation_and_length_normalization(self):
+        #'a' twice in a short summary beats it three times in a long one
+        snapshot = IndexSnapshot({'a': [[0, [0, 1]], [1, [0, 1, 2]]], 'b': [[1, list(range(3, 30))], [2, [0]]]},
+                                 {'a': [0.1, 0.1], 'b': [0.1, 0.1]}, {'a': 1.0, 'b': 1.0}, 3)
+        scored = get_scorer('bm25').prepare(snapshot)
+        self.assertEqual([0, 1], [x[1] for x in top_k(scored, ['a'], {0, 1}, 2)])
+        self.assertGreater(scored.max_score('a'), 0)
@@ -0,0 +1,169 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from Part2.index import segments as segments_module
+from Part2.index.create_index import CreateIndex
+from Part2.index.postings import CompactPostings
+from Part2.index.query_index import QueryIndex
+from Part2.index.segments import SegmentedIndex, _segment_cache, segment_file
+from Part2.index.snapshot import load_snapshot
+from Part2.index.summary_store import SegmentSummaryStore
+
+STOPWORD_FILE = 'index/stopwords.dat'
+RAW_DATA_FILE = 'index/data.json'
+
+
+class SegmentsTest(TestCase):
+    """ Test module for the incremental, segment based index """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        with open(RAW_DATA_FILE) as json_file:
+            data = json.load(json_file)
+        self.summaries = {x['id']: x['summary'] for x in data['summaries']}
+        self.authors = {x['book_id']: x['author'] for x in data['authors']}
+        self.queries = data['queries'] + ['"the book"', 'zzyzx']
+        self.segments = SegmentedIndex(os.path.join(self.tmp_dir, 'segments'), STOPWORD_FILE)
+
+    def add_in_batches(self, summaries, batch_size):
+        ids = sorted(summaries)
+        for start in range(0, len(ids), batch_size):
+            self.segments.add({x: summaries[x] for x in ids[start:start + batch_size]},
+                              {x: self.authors[x] for x in ids[start:start + batch_size] if x in self.authors})
+
+    def rebuilt(self, summaries):
+        '''
+        QueryIndex over an index rebuilt from scratch with the given summaries
+        '''
+        index_file = os.path.join(self.tmp_dir, 'rebuilt.txt')
+        transformed_data_file = os.path.join(self.tmp_dir, 'rebuilt.json')
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, index_file)
+        ci_obj.index_summaries(summaries)
+        ci_obj._write_to_file()
+        with open(transformed_data_file, 'w') as fh:
+            json.dump({'summaries': summaries, 'authors': self.authors}, fh)
+        return QueryIndex(STOPWORD_FILE, index_file, transformed_data_file, result_cache=None)
+
+    def segmented(self, **kwargs):
+        manifest_file = self.segments.manifest_file
+        return QueryIndex(STOPWORD_FILE, manifest_file, manifest_file, result_cache=None, **kwargs)
+
+    def assertSameResults(self, expected_qi, qi):
+        for query in self.queries:
+            for k in (3, 10):
+                self.assertEqual(expected_qi.query_index(query, k), qi.query_index(query, k), query)
+
+    def test_segments_rank_like_a_rebuilt_index(self):
+        self.add_in_batches(self.summaries, 20)
+        self.assertEqual(3, self.segments.stats()['segments'])
+        qi = self.segmented()
+        rebuilt = self.rebuilt(self.summaries)
+        self.assertEqual(dict(rebuilt.idf), dict(qi.idf))
+        self.assertSameResults(rebuilt, qi)
+        self.assertEqual(rebuilt.authors, qi.authors)
+
+    def test_deletes_and_updates(self):
+        self.add_in_batches(self.summaries, 10)
+        deleted = sorted(self.summaries)[5:15]
+        self.assertEqual(len(deleted), self.segments.delete(deleted + [10**6]))
+        updated = sorted(self.summaries)[20]
+        self.segments.update({updated: 'zzyzx the new summary'})
+
+        summaries = {x: y for x, y in self.summaries.items() if x not in deleted}
+        summaries[updated] = 'zzyzx the new summary'
+        qi = self.segmented()
+        self.assertEqual(len(summaries), qi.num_summaries)
+        self.assertEqual(len(summaries), len(self.segments))
+        self.assertSameResults(self.rebuilt(summaries), qi)
+        self.assertEqual([{'id': updated, 'summary': 'zzyzx the new summary'}], qi.query_index('zzyzx', 3))
+
+        #the merge drops the deleted summaries and keeps the results
+        self.assertIsNotNone(self.segments.merge(max_segments=2))
+        self.assertEqual(2, self.segments.stats()['segments'])
+        self.assertSameResults(self.rebuilt(summaries), self.segmented())
+        self.segments.merge(max_segments=1)
+        stats = self.segments.stats()
+        self.assertEqual((1, 0, len(summaries)), (stats['segments'], stats['deleted'], stats['num_summaries']))
+        self.assertSameResults(self.rebuilt(summaries), self.segmented())
+        #the segments of the first merge are removed by the second one
+        files = os.listdir(self.segments.directory)
+        self.assertEqual(3 * 3 + 1, len(files))
+        #and no parsed copy of them is kept
+        self.assertEqual([segment_file(self.segments.manifest_file, x['name'], '.txt')
+                          for x in self.segments.manifest['segments']],
+                         [index_file for index_file, signature in _segment_cache[self.segments.manifest_file]])
+
+        #the writer can be reopened
+        reopened = SegmentedIndex(self.segments.directory, STOPWORD_FILE)
+        self.assertEqual(len(summaries), len(reopened))
+
+    def test_query_index_follows_the_manifest(self):
+        self.add_in_batches(self.summaries, 60)
+        qi = self.segmented(reload_check_interval=0)
+        self.assertIsNone(qi.query_index('zzyzx', 3))
+        generation = qi.snapshot.generation
+        self.segments.add({1000: 'zzyzx'})
+        self.assertEqual([{'id': 1000, 'summary': 'zzyzx'}], qi.query_index('zzyzx', 3))
+        self.assertGreater(qi.snapshot.generation, generation)
+        self.segments.delete([1000])
+        self.assertIsNone(qi.query_index('zzyzx', 3))
+
+    def test_reload_reads_only_what_changed(self):
+        self.add_in_batches(self.summaries, 20)
+        snapshot = load_snapshot(self.segments.manifest_file)
+        #only the compact postings of the segments are kept, no list layout copy
+        for segment in _segment_cache[self.segments.manifest_file].values():
+            self.assertTrue(all(isinstance(x, CompactPostings) for x in segment.index.values()))
+        with mock.patch.object(segments_module, '_Segment', wraps=segments_module._Segment) as read:
+            self.segments.add({1000: 'zzyzx'})
+            added = load_snapshot(self.segments.manifest_file)
+            self.assertEqual(1, read.call_count)
+            self.segments.delete([1000])
+            deleted = load_snapshot(self.segments.manifest_file)
+            self.assertEqual(1, read.call_count)
+        self.assertEqual([1000], list(added.postings_arrays('zzyzx')[0]))
+        self.assertNotIn('zzyzx', deleted.index)
+        self.assertEqual(snapshot.idf, deleted.idf)
+        #a term all in one segment is served from it, without a merged copy
+        segment = list(_segment_cache[self.segments.manifest_file].values())[-1]
+        self.assertIs(segment.index['zzyzx'], added.index['zzyzx'])
+
+    def test_summaries_follow_the_manifest(self):
+        self.add_in_batches(self.summaries, 20)
+        store = SegmentSummaryStore(self.segments.manifest_file).load()
+        updated = sorted(self.summaries)[3]
+        with mock.patch.object(json, 'load', wraps=json.load) as read:
+            self.segments.add({1000: 'zzyzx', updated: 'the new summary'})
+            store.reload()
+            self.segments.delete([1000, sorted(self.summaries)[30]])
+            store.reload()
+        #the manifests and the new segment, the other segments aren't read again
+        self.assertEqual(3, read.call_count)
+        summaries = dict(self.summaries)
+        summaries[updated] = 'the new summary'
+        del summaries[sorted(self.summaries)[30]]
+        self.assertEqual(summaries, {x: store.get(x) for x in store._summaries})
+        self.segments.merge(max_segments=1)
+        self.assertEqual(summaries, {x: store.reload().get(x) for x in store._summaries})
+        self.assertEqual(self.authors, store.authors)
+
+    def test_background_merge(self):
+        self.segments.max_segments = 2
+        self.add_in_batches(self.summaries, 10)
+        self.segments.merge_in_background(interval=0.01)
+        self.addCleanup(self.segments.stop_background_merge)
+        deadline = time.monotonic() + 10
+        while self.segments.stats()['segments'] > 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        #adds go on while merging
+        self.segments.add({1000: 'zzyzx'})
+        self.segments.stop_background_merge()
+        self.assertLessEqual(self.segments.stats()['segments'], 3)
+        summaries = dict(self.summaries)
+        summaries[1000] = 'zzyzx'
+        self.assertSameResults(self.rebuilt(summaries), self.segmented())
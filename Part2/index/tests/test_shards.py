@@ -0,0 +1,105 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from Part2.index.create_index import CreateIndex
+from Part2.index.query_index import QueryIndex
+from Part2.index.shards import SHARDS_FILE, ShardedQueryIndex, read_shard_manifest, shard_file
+from Part2.index.snapshot import load_snapshot, read_text_index
+
+STOPWORD_FILE = 'index/stopwords.dat'
+RAW_DATA_FILE = 'index/data.json'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+INDEX_FILE = 'index/index.txt'
+NUM_SHARDS = 3
+
+
+class ShardsTest(TestCase):
+    """ Test module for the sharded index and its scatter-gather coordinator """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        with open(RAW_DATA_FILE) as json_file:
+            data = json.load(json_file)
+        cls.summaries = {x['id']: x['summary'] for x in data['summaries']}
+        cls.queries = data['queries'] + ['book', '"the book"', '"life lessons"', 'book three life',
+                                         'book book life', 'zzyzx', 'the', 'book AND life NOT mindfulness',
+                                         '(book OR "life lessons") AND NOT zzyzx']
+        cls.manifest_file = os.path.join(cls.tmp_dir, SHARDS_FILE)
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, cls.manifest_file, shards=NUM_SHARDS)
+        ci_obj.index_summaries(cls.summaries)
+        ci_obj._write_to_file()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+        super().tearDownClass()
+
+    def sharded(self, **kwargs):
+        qi = ShardedQueryIndex(STOPWORD_FILE, self.manifest_file, TRANSFORMED_DATA_FILE, result_cache=None, **kwargs)
+        self.addCleanup(qi.close)
+        return qi
+
+    def test_shards_written(self):
+        manifest = read_shard_manifest(self.manifest_file)
+        self.assertEqual(len(self.summaries), manifest['num_summaries'])
+        self.assertEqual(NUM_SHARDS, len(manifest['shards']))
+        index, tf, idf, num_summaries = read_text_index(INDEX_FILE)
+        terms = set()
+        for i, shard in enumerate(manifest['shards']):
+            shard_index, shard_tf, shard_idf, shard_num_summaries = read_text_index(
+                shard_file(self.manifest_file, shard['name']))
+            self.assertEqual(shard['num_summaries'], shard_num_summaries)
+            terms.update(shard_index)
+            for term, postings in shard_index.items():
+                #document partitioned, with the idf of the whole corpus
+                self.assertTrue(all(x[0] % NUM_SHARDS == i for x in postings))
+                self.assertEqual(idf[term], shard_idf[term])
+                self.assertEqual([x for x in index[term] if x[0] % NUM_SHARDS == i], postings)
+        self.assertEqual(set(index), terms)
+        with self.assertRaises(ValueError):
+            load_snapshot(self.manifest_file)
+
+    def test_same_results_as_unsharded(self):
+        for pruning in ('wand', 'exhaustive'):
+            qi = QueryIndex(STOPWORD_FILE, INDEX_FILE, TRANSFORMED_DATA_FILE, result_cache=None, pruning=pruning)
+            sharded_qi = self.sharded(pruning=pruning)
+            for query in self.queries:
+                for k in (1, 5, 20):
+                    #same scores, bit for bit
+                    self.assertEqual(qi._search(*qi._parse_query(query), k),
+                                     sharded_qi._search(*sharded_qi._parse_query(query), k))
+                    self.assertEqual(qi.query_index(query, k), sharded_qi.query_index(query, k))
+            self.assertEqual(qi.query_batch(self.queries, 10), sharded_qi.query_batch(self.queries, 10))
+
+    def test_shard_workers(self):
+        sharded_qi = self.sharded()
+        sharded_qi.query_index('book', 5)
+        pids = {pool.submit(os.getpid).result() for pool in sharded_qi._pools.values()}
+        self.assertEqual(NUM_SHARDS, len(pids))
+        self.assertNotIn(os.getpid(), pids)
+        stats = sharded_qi.stats()
+        self.assertEqual('shards', stats['format'])
+        self.assertEqual(len(self.summaries), stats['num_summaries'])
+        self.assertEqual(NUM_SHARDS, len(stats['shards']))
+
+    def test_forked(self):
+        sharded_qi = self.sharded()
+        sharded_qi.query_index('book', 5)
+        pools = dict(sharded_qi._pools)
+        for pool in pools.values():
+            self.addCleanup(pool.shutdown)
+        #as if this process had been forked by the one that started the shard workers
+        sharded_qi._pid = -1
+        self.assertEqual(self.sharded().query_index('book', 5), sharded_qi.query_index('book', 5))
+        self.assertEqual(os.getpid(), sharded_qi._pid)
+        self.assertFalse(set(map(id, pools.values())) & set(map(id, sharded_qi._pools.values())))
+
+    def test_build_options(self):
+        with self.assertRaises(ValueError):
+            CreateIndex(STOPWORD_FILE, None, None, self.manifest_file, index_format='binary', shards=2)
+        with self.assertRaises(ValueError):
+            CreateIndex(STOPWORD_FILE, None, None, self.manifest_file, workers=2, shards=2)
@@ -0,0 +1,99 @@
+from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+from Part2.index import query_index
+from Part2.index.create_index import CreateIndex
+from Part2.index.index_meta import read_text_meta
+from Part2.index.query_index import QueryIndex
+
+STOPWORD_FILE = 'index/stopwords.dat'
+TEST_INDEX_FILE = 'index/tests/test_index.txt'
+TEST_TRANSFORMED_DATA = 'index/tests/test_transformed_data.json'
+
+
+class IndexSnapshotTest(TestCase):
+    """ Test module for the resident index snapshot """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.tmp_dir, 'index.txt')
+        shutil.copy(TEST_INDEX_FILE, self.index_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_index_loaded_once(self):
+        qi_obj = QueryIndex(STOPWORD_FILE, self.index_file, TEST_TRANSFORMED_DATA)
+        with mock.patch.object(query_index, 'load_snapshot', wraps=query_index.load_snapshot) as loader:
+            qi_obj.query_index('science', 1)
+            qi_obj.query_index('nawaz', 2)
+            qi_obj.query_index('"nawaz on science"', 2)
+        self.assertEqual(1, loader.call_count)
+        self.assertEqual(1, qi_obj.snapshot.generation)
+
+    def test_snapshot_swapped_when_index_changes(self):
+        qi_obj = QueryIndex(STOPWORD_FILE, self.index_file, TEST_TRANSFORMED_DATA, reload_check_interval=0)
+        first = qi_obj.load()
+        self.assertEqual([{'id': 1, 'summary': 'Book by nawaz on science'}], qi_obj.query_index('science', 2))
+
+        #drop 'science' from the index
+        with open(self.index_file) as fh:
+            lines = [line for line in fh if not line.startswith('science|')]
+        with open(self.index_file, 'w') as fh:
+            fh.writelines(lines)
+        os.utime(self.index_file, ns=(first.signature[0] + 10**9, first.signature[0] + 10**9))
+
+        self.assertEqual(None, qi_obj.query_index('science', 2))
+        self.assertEqual(2, qi_obj.snapshot.generation)
+        #the old snapshot is untouched
+        self.assertIn('science', first.index)
+
+    def test_unreadable_index_keeps_current_snapshot(self):
+        qi_obj = QueryIndex(STOPWORD_FILE, self.index_file, TEST_TRANSFORMED_DATA, reload_check_interval=0)
+        first = qi_obj.load()
+        with open(self.index_file) as fh:
+            content = fh.read()
+        #cut in the middle of a line, like a build caught half way
+        with open(self.index_file, 'w') as fh:
+            fh.write(content[:content.index('science|') + 10])
+        os.utime(self.index_file, ns=(first.signature[0] + 10**9, first.signature[0] + 10**9))
+        with mock.patch.object(query_index, 'load_snapshot', wraps=query_index.load_snapshot) as loader:
+            self.assertEqual([{'id': 1, 'summary': 'Book by nawaz on science'}], qi_obj.query_index('science', 2))
+            qi_obj.query_index('science', 2)
+        #tried once, not again until the file changes
+        self.assertEqual(1, loader.call_count)
+        self.assertIs(first, qi_obj.snapshot)
+
+        with open(self.index_file, 'w') as fh:
+            fh.write(content)
+        os.utime(self.index_file, ns=(first.signature[0] + 2 * 10**9, first.signature[0] + 2 * 10**9))
+        qi_obj.query_index('science', 2)
+        self.assertEqual(2, qi_obj.snapshot.generation)
+
+    def test_index_replaced_atomically(self):
+        ci_obj = CreateIndex(STOPWORD_FILE, None, None, self.index_file)
+        ci_obj.index_summaries({1: 'Book by nawaz on science', 2: 'science of books'})
+        with mock.patch('os.replace', wraps=os.replace) as replace:
+            ci_obj._write_to_file()
+        self.assertEqual([self.index_file + '.meta.json', self.index_file],
+                         [call.args[1] for call in replace.call_args_list])
+        self.assertEqual(['index.txt', 'index.txt.meta.json'], sorted(os.listdir(self.tmp_dir)))
+        self.assertEqual(2, QueryIndex(STOPWORD_FILE, self.index_file, None).load().num_summaries)
+        self.assertEqual('plain-1', read_text_meta(self.index_file)['analyzer'])
+
+    def test_snapshot_is_immutable(self):
+        snapshot = QueryIndex(STOPWORD_FILE, self.index_file, TEST_TRANSFORMED_DATA).load()
+        with self.assertRaises(TypeError):
+            snapshot.index['book'] = []
+        with self.assertRaises(AttributeError):
+            snapshot.num_summaries = 10
+
+    def test_stats(self):
+        stats = QueryIndex(STOPWORD_FILE, self.index_file, TEST_TRANSFORMED_DATA).stats()
+        self.assertEqual(2, stats['num_summaries'])
+        self.assertEqual(1, stats['generation'])
+        self.assertGreater(stats['memory_bytes'], 0)
+        for key in ('load_time_ms', 'age_seconds', 'loaded_at', 'num_terms'):
+            self.assertIn(key, stats)
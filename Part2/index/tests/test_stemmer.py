@@ -0,0 +1,32 @@
+from django.test import TestCase
+from Part2.index.stemmer import porter_stem
+
+
+class StemmerTest(TestCase):
+    """ Test module for the Porter stemmer, examples from the paper """
+
+    def assertStems(self, cases):
+        for word, stem in cases.items():
+            self.assertEqual(stem, porter_stem(word), word)
+
+    def test_step1(self):
+        self.assertStems({'caresses': 'caress', 'ponies': 'poni', 'ties': 'ti', 'caress': 'caress', 'cats': 'cat',
+                          'feed': 'feed', 'agreed': 'agre', 'plastered': 'plaster', 'bled': 'bled',
+                          'motoring': 'motor', 'sing': 'sing', 'conflated': 'conflat', 'troubled': 'troubl',
+                          'sized': 'size', 'hopping': 'hop', 'tanned': 'tan', 'falling': 'fall',
+                          'hissing': 'hiss', 'fizzed': 'fizz', 'failing': 'fail', 'filing': 'file',
+                          'happy': 'happi', 'sky': 'sky'})
+
+    def test_steps_2_to_5(self):
+        self.assertStems({'relational': 'relat', 'conditional': 'condit', 'rational': 'ration',
+                          'vietnamization': 'vietnam', 'operator': 'oper', 'decisiveness': 'decis',
+                          'hopefulness': 'hope', 'sensibiliti': 'sensibl', 'triplicate': 'triplic',
+                          'electrical': 'electr', 'goodness': 'good', 'allowance': 'allow',
+                          'gyroscopic': 'gyroscop', 'defensible': 'defens', 'replacement': 'replac',
+                          'adjustment': 'adjust', 'adoption': 'adopt', 'communism': 'commun',
+                          'homologous': 'homolog', 'bowdlerize': 'bowdler', 'probate': 'probat',
+                          'rate': 'rate', 'cease': 'ceas', 'controll': 'control', 'roll': 'roll',
+                          'generalizations': 'gener', 'oscillators': 'oscil'})
+
+    def test_short_words(self):
+        self.assertStems({'is': 'is', 'as': 'as', 'a': 'a', '42': '42'})
@@ -0,0 +1,116 @@
+from django.test import TestCase
+import json
+from bisect import bisect_left
+import mmap
+import os
+import shutil
+import tempfile
+import tracemalloc
+from unittest import mock
+from Part2.index.query_index import QueryIndex
+from Part2.index.summary_store import LazySummaryStore, SummaryStore, _summary_offsets
+
+STOPWORD_FILE = 'index/stopwords.dat'
+INDEX_FILE = 'index/index.txt'
+TRANSFORMED_DATA_FILE = 'index/transformed_data.json'
+
+
+class SummaryStoreTest(TestCase):
+    """ Test module for the resident and lazy summary stores """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.tmp_dir, 'transformed_data.json')
+        shutil.copy(TRANSFORMED_DATA_FILE, self.data_file)
+        with open(TRANSFORMED_DATA_FILE) as tdf:
+            self.summaries = {int(k): v for k, v in json.load(tdf)['summaries'].items()}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stores_return_every_summary(self):
+        for store in (SummaryStore(self.data_file).load(), LazySummaryStore(self.data_file).load()):
+            self.assertEqual(len(self.summaries), len(store))
+            for summary_id, summary in self.summaries.items():
+                self.assertEqual(summary, store.get(summary_id))
+            with self.assertRaises(KeyError):
+                store.get(len(self.summaries) + 1)
+            self.assertEqual('Dan Harris', store.authors[0])
+
+    def test_lazy_store_non_ascii_and_whitespace(self):
+        data = {'titles': ['a'], 'summaries': {'3': 'Café “quoted”', '7': 'plain, with "json" chars {}'},
+                'authors': {'3': 'Zürich'}}
+        with open(self.data_file, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, ensure_ascii=False, indent=2)
+        store = LazySummaryStore(self.data_file).load()
+        self.assertEqual('Café “quoted”', store.get(3))
+        self.assertEqual('plain, with "json" chars {}', store.get(7))
+        self.assertEqual({3: 'Zürich'}, store.authors)
+
+    def test_lazy_store_offsets(self):
+        summaries = {summary_id: 'summary {} é '.format(summary_id) * (summary_id % 15) for summary_id in range(20000)}
+        data = {'titles': [], 'summaries': {str(x): summaries[x] for x in sorted(summaries, key=str)},
+                'authors': {'5': 'Zürich'}}
+        with open(self.data_file, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        store = LazySummaryStore(self.data_file).load()
+        ids, starts, ends = store._state[0]
+        self.assertEqual(sorted(summaries), list(ids))
+        self.assertEqual(summaries, {x: store.get(x) for x in summaries})
+        #values spanning the chunks of the scan
+        with open(self.data_file, 'rb') as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.addCleanup(buf.close)
+        self.assertEqual(((ids, starts, ends), {'5': 'Zürich'}), _summary_offsets(buf, chunk_size=7))
+        #the file isn't copied to scan it
+        data['summaries'] = {str(x): summaries[x] for x in sorted(summaries)}
+        with open(self.data_file, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        LazySummaryStore(self.data_file).load()
+        self.assertLess(tracemalloc.get_traced_memory()[1], os.path.getsize(self.data_file) / 2)
+
+    def test_lazy_store_cache_is_bounded(self):
+        store = LazySummaryStore(self.data_file, cache_size=5).load()
+        for summary_id in self.summaries:
+            store.get(summary_id)
+        last_id = max(self.summaries)
+        store.get(last_id)
+        self.assertEqual(5, len(store.cache))
+        self.assertEqual(len(self.summaries), store.cache.stats()['misses'])
+        self.assertEqual(1, store.cache.stats()['hits'])
+        #evicted summaries are read from the file again
+        store.get(0)
+        self.assertEqual(len(self.summaries) + 1, store.cache.stats()['misses'])
+
+    def test_store_reloaded_when_file_changes(self):
+        qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, self.data_file, reload_check_interval=0,
+                            summary_store_mode='lazy')
+        resp = qi_obj.query_index('mindfulness', 1)
+        self.assertEqual(self.summaries[resp[0]['id']], resp[0]['summary'])
+
+        with open(self.data_file) as tdf:
+            data = json.load(tdf)
+        data['summaries'][str(resp[0]['id'])] = 'Updated summary'
+        with open(self.data_file, 'w') as tdf:
+            json.dump(data, tdf)
+
+        self.assertEqual('Updated summary', qi_obj.query_index('mindfulness', 1)[0]['summary'])
+        self.assertEqual(2, qi_obj.summary_store.generation)
+
+    def test_lazy_store_closes_old_mapping(self):
+        store = LazySummaryStore(self.data_file).load()
+        old = store._state[1]
+        store.reload()
+        self.assertTrue(old.closed)
+        #a reload between reading the state and slicing the mapping, the reader retries on the new one
+        old = store._state[1]
+        reloads = []
+        def bisect_and_reload(*args):
+            if not reloads:
+                reloads.append(store.reload())
+            return bisect_left(*args)
+        with mock.patch('Part2.index.summary_store.bisect_left', side_effect=bisect_and_reload):
+            self.assertEqual(self.summaries[0], store.get(0))
+        self.assertTrue(old.closed)
@@ -0,0 +1,94 @@
+from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+from unittest import mock
+from Part2.index import tranform_data
+from Part2.index.tranform_data import DataTransformation
+
+RAW_DATA_FILE = 'index/data.json'
+
+
+class TransformDataTest(TestCase):
+    """ Test module for the streaming ingestion of the raw data """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.target = os.path.join(self.tmp_dir, 'transformed.json')
+        with open(RAW_DATA_FILE) as json_file:
+            self.data = json.load(json_file)
+        #what the transformed data file has always been
+        self.expected = json.dumps({'summaries': {x['id']: x['summary'] for x in self.data['summaries']},
+                                    'authors': {x['book_id']: x['author'] for x in self.data['authors']},
+                                    'titles': self.data['titles'],
+                                    'queries': self.data['queries']})
+
+    def read_target(self):
+        with open(self.target) as fh:
+            return fh.read()
+
+    def test_same_output_as_before(self):
+        transformation = DataTransformation(RAW_DATA_FILE, self.target)
+        transformation.transform_data()
+        self.assertEqual(self.expected, self.read_target())
+        self.assertEqual(json.loads(self.expected)['titles'], transformation.summary_dict['titles'])
+
+        summaries = list(DataTransformation(RAW_DATA_FILE, self.target).stream_summaries())
+        self.assertEqual([(x['id'], x['summary']) for x in self.data['summaries']], summaries)
+        self.assertEqual(self.expected, self.read_target())
+
+    def test_small_chunks(self):
+        raw_file = os.path.join(self.tmp_dir, 'data.json')
+        with open(raw_file, 'w') as fh:
+            json.dump(dict(self.data, empty=[], count=12345, nested={'a': [1, 2]}), fh, indent=1)
+        with mock.patch.object(tranform_data, 'CHUNK_SIZE', 7):
+            transformation = DataTransformation(raw_file, self.target)
+            transformation.transform_data()
+        transformed = json.loads(self.read_target())
+        self.assertEqual(json.loads(self.expected)['summaries'], transformed['summaries'])
+        self.assertEqual(([], 12345, {'a': [1, 2]}), (transformed['empty'], transformed['count'], transformed['nested']))
+
+    def test_json_lines(self):
+        raw_file = os.path.join(self.tmp_dir, 'data.jsonl')
+        with open(raw_file, 'w') as fh:
+            for title in self.data['titles']:
+                fh.write(json.dumps({'titles': title}) + '\n')
+            for query in self.data['queries']:
+                fh.write(json.dumps({'queries': query}) + '\n')
+            #summaries and authors interleaved
+            for summary, author in zip(self.data['summaries'], self.data['authors'] + [None] * 100):
+                fh.write(json.dumps(summary) + '\n\n')
+                if author is not None:
+                    fh.write(json.dumps(author) + '\n')
+        DataTransformation(raw_file, self.target).transform_data()
+        self.assertEqual(json.loads(self.expected), json.loads(self.read_target()))
+
+    def test_abandoned_stream_keeps_the_old_file(self):
+        with open(self.target, 'w') as fh:
+            fh.write('old')
+        stream = DataTransformation(RAW_DATA_FILE, self.target).stream_summaries()
+        next(stream)
+        stream.close()
+        self.assertEqual('old', self.read_target())
+        self.assertEqual(['transformed.json'], os.listdir(self.tmp_dir))
+
+    def test_memory_stays_flat(self):
+        raw_file = os.path.join(self.tmp_dir, 'large.json')
+        summary = ' '.join(x['summary'] for x in self.data['summaries'][:5])
+        with open(raw_file, 'w') as fh:
+            fh.write('{"titles": [], "queries": [], "summaries": [')
+            fh.write(', '.join(json.dumps({'id': i, 'summary': summary}) for i in range(5000)))
+            fh.write('], "authors": []}')
+        size = os.path.getsize(raw_file)
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in DataTransformation(raw_file, self.target).stream_summaries())
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(5000, count)
+        self.assertGreater(size, 8 * 2**20)
+        self.assertLess(peak, size / 20)
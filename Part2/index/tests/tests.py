@@ -1,6 +1,11 @@
 from django.test import TestCase
 import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 from Part2.index.create_index import CreateIndex
+from Part2.index.tranform_data import DataTransformation
 from Part2.index.query_index import QueryIndex
 
 STOPWORD_FILE = 'index/stopwords.dat'
@@ -126,3 +131,25 @@ class IndexTest(TestCase):
 
         resp = qi_obj.query_index('"book on science"', 2)
         self.assertEqual([], resp)
+
+    def test_query_batch(self):
+        #test_index_creation overwrites TRANSFORMED_DATA_FILE with the test data, use a fresh copy
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        transformed_data_file = os.path.join(tmp_dir, 'transformed_data.json')
+        DataTransformation(RAW_DATA_FILE, transformed_data_file).transform_data()
+        qi_obj = QueryIndex(STOPWORD_FILE, INDEX_FILE, transformed_data_file)
+        with open(RAW_DATA_FILE) as json_file:
+            queries = json.load(json_file)['queries']
+        queries = queries + ['"three sentences"', 'Three  Sentences', 'three sentences', 'xyzzy', '', queries[0]]
+
+        resp = qi_obj.query_batch(queries, 5)
+        self.assertEqual([qi_obj.query_index(query, 5) for query in queries], resp)
+
+        #repeated queries get their own result objects
+        resp[0][0]['author'] = 'Someone'
+        self.assertNotIn('author', resp[-1][0])
+
+        with mock.patch.object(qi_obj, '_evaluate', wraps=qi_obj._evaluate) as evaluate:
+            qi_obj.query_batch(['book', 'Book', 'book!', 'life', '"book"'], 5)
+        self.assertEqual(2, evaluate.call_count)
@@ -1,4 +1,12 @@
 import json
+import os
+import shutil
+import tempfile
+
+CHUNK_SIZE = 1 << 16    # Characters read from the raw data file at a time
+
+#Top level lists of data.json that are turned into {key: value} objects
+_MAPPED = {'summaries': ('id', 'summary'), 'authors': ('book_id', 'author')}
 
 
 class DataTransformation:
@@ -6,6 +14,9 @@ class DataTransformation:
     Accepts an input file and transform summaries to key:value pair.
     Converts list of summaries to summary object with book_id as key and summary as value
     so that the summary can be fetched in O(1) time without parsing the summary list.
+
+    The raw data file is read one record at a time, either data.json or a JSON Lines file
+    (.jsonl) with one record per line, and the transformed data file is written as it is read.
     '''
     def __init__(self,data_file,target_data_file):
         self.summary_dict={}
@@ -13,25 +24,206 @@ class DataTransformation:
         self.target_data_file=target_data_file
 
     def transform_data(self):
-        self._parse_raw_data_file()
-        self._write_to_file()
-
-    def _write_to_file(self):
-        with open(self.target_data_file,'w') as outfile:
-            outfile.write(json.dumps(self.summary_dict))
-
-    def _parse_raw_data_file(self):
-        self.summary_dict['summaries']={}
-        self.summary_dict['authors'] = {}
-
-        with open(self.data_file) as json_file:
-            data = json.load(json_file)
-            self.summary_dict['titles'] = data['titles']
-            self.summary_dict['queries'] = data['queries']
-            for key,value in data.items():
-                if key == 'summaries':
-                    for item in data['summaries']:
-                        self.summary_dict['summaries'][item['id']] = item['summary']
-                elif key == 'authors':
-                    for item in data['authors']:
-                        self.summary_dict['authors'][item['book_id']] = item['author']
\ No newline at end of file
+        '''
+        Writes the transformed data file and keeps a copy of it in summary_dict
+        '''
+        self.summary_dict={'summaries': {}, 'authors': {}}
+        for key, value, in_list in self._transform():
+            if key in _MAPPED:
+                if in_list:
+                    self.summary_dict[key][value[0]] = value[1]
+            elif in_list:
+                self.summary_dict.setdefault(key, []).append(value)
+            else:
+                self.summary_dict[key] = value
+
+    def stream_summaries(self):
+        '''
+        Generator of (summary_id, summary) for the indexer. Nothing is kept in memory, the records
+        are written to the transformed data file on the way, which is complete once the generator is exhausted.
+        '''
+        for key, value, _ in self._transform():
+            if key == 'summaries':
+                yield value
+
+    def _transform(self):
+        writer = _TransformedDataWriter(self.target_data_file)
+        try:
+            for key, value, in_list in self._raw_records():
+                if key in _MAPPED and in_list:
+                    id_field, value_field = _MAPPED[key]
+                    value = (value[id_field], value[value_field])
+                writer.add(key, value, in_list)
+                yield key, value, in_list
+        except BaseException:
+            #failed or abandoned half way, the current transformed data file stays as it is
+            writer.discard()
+            raise
+        writer.close()
+
+    def _raw_records(self):
+        with open(self.data_file) as fh:
+            if self.data_file.endswith('.jsonl'):
+                yield from iter_json_lines(fh)
+            else:
+                yield from iter_json_items(fh)
+
+
+class _JSONStream:
+    '''
+    Reads JSON values one at a time from a file, keeping only the unread part of the current chunk
+    '''
+    def __init__(self, fh, chunk_size=None):
+        self.fh = fh
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        #read at least as much as is buffered, so a value spanning many chunks is decoded a few times only
+        chunk = self.fh.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        '''
+        Next non-whitespace character, '' at the end of the file
+        '''
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def take(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expected one of {!r} at {!r}'.format(chars, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                #a number at the end of the buffer may go on in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_items(fh):
+    '''
+    Iterative parser of a JSON object of lists like data.json.
+    Yields (key, item, True) for every item of a top level list and (key, value, False) for other
+    top level values and empty lists.
+    '''
+    stream = _JSONStream(fh)
+    stream.take('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.take(':')
+        if stream.peek() == '[':
+            stream.take('[')
+            if stream.peek() == ']':
+                stream.take(']')
+                yield key, [], False
+            else:
+                while True:
+                    yield key, stream.value(), True
+                    if stream.take(',]') == ']':
+                        break
+        else:
+            yield key, stream.value(), False
+        if stream.take(',}') == '}':
+            break
+
+
+def iter_json_lines(fh):
+    '''
+    Records of a JSON Lines file: {"id": .., "summary": ..}, {"book_id": .., "author": ..}
+    or {"<list>": item} for the other lists of data.json, e.g. {"queries": "life lessons"}
+    '''
+    for line in fh:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        for key, (_, value_field) in _MAPPED.items():
+            if value_field in record:
+                yield key, record, True
+                break
+        else:
+            (key, value), = record.items()
+            yield key, value, True
+
+
+class _TransformedDataWriter:
+    '''
+    Writes the transformed data file one record at a time, in the format json.dumps gives summary_dict.
+    Every top level key is spooled to its own temporary file and they are joined when the writer
+    is closed, so the records of a key don't have to be contiguous in the input.
+    '''
+    def __init__(self, target_data_file):
+        self.target_data_file = target_data_file
+        self._sections = {}     #key -> [temporary file, number of items]
+        self._values = {}       #top level values that aren't lists
+        for key in _MAPPED:
+            self._section(key)
+
+    def _section(self, key):
+        section = self._sections.get(key)
+        if section is None:
+            section = self._sections[key] = [tempfile.TemporaryFile('w+'), 0]
+        return section
+
+    def add(self, key, value, in_list=True):
+        if not in_list:
+            if value == []:
+                self._section(key)
+            else:
+                self._values[key] = value
+            return
+        section = self._section(key)
+        fh = section[0]
+        if section[1]:
+            fh.write(', ')
+        if key in _MAPPED:
+            fh.write(json.dumps(str(value[0])))
+            fh.write(': ')
+            value = value[1]
+        fh.write(json.dumps(value))
+        section[1] += 1
+
+    def close(self):
+        tmp_file = self.target_data_file + '.tmp'
+        with open(tmp_file, 'w') as outfile:
+            outfile.write('{')
+            for i, (key, (fh, _)) in enumerate(self._sections.items()):
+                opening, closing = '{}' if key in _MAPPED else '[]'
+                if i:
+                    outfile.write(', ')
+                outfile.write('{}: {}'.format(json.dumps(key), opening))
+                fh.seek(0)
+                shutil.copyfileobj(fh, outfile)
+                fh.close()
+                outfile.write(closing)
+            for key, value in self._values.items():
+                outfile.write(', {}: {}'.format(json.dumps(key), json.dumps(value)))
+            outfile.write('}')
+        os.replace(tmp_file, self.target_data_file)
+
+    def discard(self):
+        for fh, _ in self._sections.values():
+            fh.close()
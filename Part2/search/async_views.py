@@ -0,0 +1,140 @@
+'''
+Async search endpoint for the ASGI deployment (app/asgi.py).
+
+Django 3.0 only runs synchronous views, so the endpoint is a small ASGI application in front
+of Django: POST /search/get-summary is answered here, every other request goes on to Django.
+The request and response bodies are the ones of SearchView, including the optional scorer.
+
+Every query is evaluated in a thread pool, the queries of a request concurrently, and the
+authors of the results are fetched concurrently by the AsyncAuthorService. The request has
+an overall deadline: queries not evaluated in time are left out of the response and
+authors not fetched in time are None, and the response carries X-Partial-Results: 1.
+Only queries still queued at the deadline are dropped, a thread can't be interrupted: a query
+being evaluated runs to its end, its result is thrown away.
+'''
+# Standard Library Imports
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Third-party imports
+from django.conf import settings
+
+# Local source tree imports
+from Part2.index import boolean, metrics, profiling
+from Part2.index.scoring import get_scorer
+from .author_service import _async_author
+from .author_resolver import AuthorResolver, LOCAL_FIRST
+
+__all__ = ['AsyncSearchApp', 'SEARCH_PATH']
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PATH = '/search/get-summary'
+DEADLINE = 2.0          # Seconds a search request may take, partial results are returned after that
+QUERY_WORKERS = 4       # Threads evaluating queries
+
+
+class AsyncSearchApp:
+    '''
+    ASGI application serving the search endpoint and handing every other request to app
+    '''
+    def __init__(self, app, query_service=None, author_resolver=None, deadline=None, query_workers=None,
+                 path=SEARCH_PATH):
+        if query_service is None:
+            from Part2.index.query_index import _query_service as query_service
+        self.app = app
+        self.query_service = query_service
+        self.author_resolver = author_resolver or AuthorResolver(
+            getattr(settings, 'SEARCH_AUTHOR_STRATEGY', LOCAL_FIRST), lambda: self.query_service.authors,
+            _async_author)
+        self.deadline = deadline if deadline is not None else getattr(settings, 'SEARCH_DEADLINE', DEADLINE)
+        self.path = path
+        self._executor = ThreadPoolExecutor(
+            max_workers=query_workers or getattr(settings, 'SEARCH_QUERY_WORKERS', QUERY_WORKERS),
+            thread_name_prefix='query')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == self.path and scope['method'] == 'POST':
+            await self.search(receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def search(self, receive, send):
+        try:
+            data = json.loads(await _read_body(receive))
+            queries, num_of_results = list(data['queries']), data['K']
+            #None is the default scorer of the query service
+            scorer = data.get('scorer') and get_scorer(data['scorer']).name
+            #a malformed boolean query is a bad request, not a failed query
+            for query in queries:
+                if boolean.is_boolean(query):
+                    boolean.parse(query)
+        except (ValueError, KeyError, TypeError) as exc:
+            await _respond(send, 400, {'error': 'Invalid search request: {}'.format(exc)})
+            return
+        with metrics.request_seconds.time(endpoint='get-summary'):
+            result, partial = await self.results(queries, num_of_results, scorer)
+        headers = [(b'x-partial-results', b'1')] if partial else []
+        await _respond(send, 200, result, headers)
+
+    async def results(self, queries, num_of_results, scorer=None):
+        '''
+        Response body of a search and whether it is partial
+        '''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        expires = time.monotonic() + self.deadline
+        pending = {query: loop.run_in_executor(self._executor, self._query, expires, query, num_of_results, scorer)
+                   for query in dict.fromkeys(queries)}
+        #asyncio.wait refuses an empty set, a request without queries has nothing to wait for
+        done, not_done = (await asyncio.wait(pending.values(), timeout=self.deadline)) if pending else (set(), set())
+        for future in not_done:
+            #drops the queries still queued, the ones already running finish on their own
+            future.cancel()
+        partial = bool(not_done)
+        if not_done:
+            logger.warning("Search deadline hit, %d of %d queries left out", len(not_done), len(pending))
+
+        result = []
+        for query in queries:
+            future = pending[query]
+            query_obj = future.result() if future in done else None
+            if query_obj:
+                #every query gets its own result objects, like with query_batch
+                result.append([dict(item, query=query) for item in query_obj])
+
+        book_ids = [item['id'] for query_obj in result for item in query_obj]
+        with profiling.stage('authors'):
+            authors = await self.author_resolver.resolve_async(book_ids, timeout=max(deadline - loop.time(), 0))
+        partial = partial or loop.time() >= deadline
+        for query_obj in result:
+            for item in query_obj:
+                item['author'] = authors.get(item['id'])
+        return result, partial
+
+    def _query(self, expires, query, num_of_results, scorer):
+        #a query that only gets a thread after the deadline isn't evaluated for nothing,
+        #whether or not the cancellation reached it first
+        if time.monotonic() >= expires:
+            return None
+        return self.query_service.query_index(query, num_of_results, scorer)
+
+
+async def _read_body(receive):
+    body = []
+    while True:
+        message = await receive()
+        body.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(body)
+
+
+async def _respond(send, status, payload, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode())] + list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
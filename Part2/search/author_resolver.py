@@ -0,0 +1,99 @@
+# Standard Library Imports
+import threading
+
+# Third-party imports
+
+# Local source tree imports
+
+__all__=['AuthorResolver', 'LOCAL_ONLY', 'LOCAL_FIRST', 'REMOTE_FIRST']
+
+LOCAL_ONLY = 'local'                # Only the authors table of the transformed data
+LOCAL_FIRST = 'local_first'         # Authors table, the author API for books missing from it
+REMOTE_FIRST = 'remote_first'       # Author API, the authors table when the API fails
+STRATEGIES = (LOCAL_ONLY, LOCAL_FIRST, REMOTE_FIRST)
+
+
+class AuthorResolver:
+    '''
+    Resolves the authors of a response from the local authors table and/or the remote author API.
+    local_authors is a callable returning the current {book_id: author} table, so the table
+    follows the reloads of the index.
+    '''
+    def __init__(self, strategy, local_authors, remote):
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown author strategy {0}, expected one of {1}".format(strategy, STRATEGIES))
+        self.strategy = strategy
+        self.local_authors = local_authors
+        self.remote = remote
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.remote_calls = 0
+        self.fallbacks = 0
+
+    def _count(self, local_hits=0, remote_calls=0, fallbacks=0):
+        with self._lock:
+            self.local_hits += local_hits
+            self.remote_calls += remote_calls
+            self.fallbacks += fallbacks
+
+    def _remote(self, book_ids):
+        if not book_ids:
+            return {}
+        return self.remote.get_authors(book_ids)
+
+    def _to_fetch(self, book_ids, table):
+        '''
+        Books to look up with the author API
+        '''
+        if self.strategy == REMOTE_FIRST:
+            return book_ids
+        if self.strategy == LOCAL_FIRST:
+            return [book_id for book_id in book_ids if book_id not in table]
+        return []
+
+    def _combine(self, book_ids, table, remote):
+        if self.strategy == REMOTE_FIRST:
+            authors = remote
+            failed = [book_id for book_id in book_ids if authors.get(book_id) is None]
+            found = [book_id for book_id in failed if book_id in table]
+            for book_id in failed:
+                authors[book_id] = table.get(book_id)
+            self._count(local_hits=len(found), remote_calls=len(book_ids), fallbacks=len(failed))
+            return authors
+
+        authors = {book_id: table[book_id] for book_id in book_ids if book_id in table}
+        missing = [book_id for book_id in book_ids if book_id not in authors]
+        local_hits = len(authors)
+        if self.strategy == LOCAL_FIRST:
+            authors.update(remote)
+            self._count(local_hits=local_hits, remote_calls=len(missing), fallbacks=len(missing))
+        else:
+            self._count(local_hits=local_hits)
+        for book_id in missing:
+            authors.setdefault(book_id, None)
+        return authors
+
+    def resolve(self, book_ids):
+        '''
+        Returns {book_id: author} for the given books, None for the ones no source knows
+        '''
+        book_ids = list(dict.fromkeys(book_ids))
+        table = self.local_authors()
+        return self._combine(book_ids, table, self._remote(self._to_fetch(book_ids, table)))
+
+    async def resolve_async(self, book_ids, timeout=None):
+        '''
+        resolve for the async view, remote being an AsyncAuthorService.
+        Remote lookups running after timeout seconds are given up, like failed lookups.
+        '''
+        book_ids = list(dict.fromkeys(book_ids))
+        table = self.local_authors()
+        to_fetch = self._to_fetch(book_ids, table)
+        remote = await self.remote.get_authors(to_fetch, timeout=timeout) if to_fetch else {}
+        return self._combine(book_ids, table, remote)
+
+    def stats(self):
+        return {'strategy': self.strategy,
+                'local_hits': self.local_hits,
+                'remote_calls': self.remote_calls,
+                'fallbacks': self.fallbacks}
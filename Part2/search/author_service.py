@@ -1,38 +1,182 @@
 # Standard Library Imports
 import requests, json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Third-party imports
-
+from requests.adapters import HTTPAdapter
+try:
+    import httpx
+except ImportError:     # optional dependency, without it the async lookups run the requests session in threads
+    httpx = None
 
 # Local source tree imports
+from Part2.index.cache import LRUCache
+
+__all__=['_author', '_async_author']
+
+logger = logging.getLogger(__name__)
 
-__all__=['_author',]
+AUTHOR_API_URL = "http://ie4djxzt8j.execute-api.eu-west-1.amazonaws.com/coding/"
+POOL_SIZE = 16          # Keep-alive connections kept open to the author API
+MAX_WORKERS = 8         # Concurrent author lookups per process
+TIMEOUT = (1.0, 2.0)    # (connect, read) timeout of one author lookup in seconds
+CACHE_SIZE = 10000      # Number of authors kept in the cache
+CACHE_TTL = 600         # Seconds an author stays in the cache
+MAX_CONCURRENT = 32     # Author lookups in flight at once per event loop, for the async lookups
 
 
 class AuthorService:
-    def __init__(self):
-        self.url = "http://ie4djxzt8j.execute-api.eu-west-1.amazonaws.com/coding/"
+    def __init__(self, url=AUTHOR_API_URL, pool_size=POOL_SIZE, max_workers=MAX_WORKERS, timeout=TIMEOUT,
+                 cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL):
+        self.url = url
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache = LRUCache(cache_size, ttl=cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='author-lookup')
 
     def _create_api_headers(self):
         return  {
                 'Content-Type': 'application/json',
                 }
 
-    def api_call(self,method,data, url=None):
+    def api_call(self,method,data, url=None, timeout=None):
         headers=self._create_api_headers()
         if method not in ["GET", "POST", "DELETE", "PUT", "PATCH"]:
             raise Exception("Unable to make a API call for {0} "
                             "method.".format(method))
-        response = requests.request(url=self.url if url is None else url,
-                                    method=method,
-                                    headers=headers,
-                                    data=data
-                                    )
+        response = self.session.request(url=self.url if url is None else url,
+                                        method=method,
+                                        headers=headers,
+                                        data=data,
+                                        timeout=self.timeout if timeout is None else timeout
+                                        )
 
         if isinstance(response, requests.Response):
             response.raise_for_status()
 
         return response
 
+    def get_author(self, book_id):
+        '''
+        Author of one book, served from the cache when possible.
+        Returns None if the author API fails or times out; failures aren't cached.
+        '''
+        author = self.cache.get(book_id)
+        if author is None:
+            author = self._fetch_author(book_id)
+        return author
+
+    def _fetch_author(self, book_id):
+        try:
+            response = self.api_call(method='POST', data=json.dumps({"book_id": book_id}))
+            author = response.json()['author']
+        except (requests.RequestException, ValueError, KeyError) as exc:
+            logger.warning("Author lookup failed for book %s: %s", book_id, exc)
+            return None
+        self.cache.set(book_id, author)
+        return author
+
+    def get_authors(self, book_ids):
+        '''
+        Authors of all the given books as {book_id: author}.
+        Book ids are de-duplicated and the ones missing from the cache are fetched concurrently.
+        '''
+        authors = {}
+        missing = []
+        for book_id in dict.fromkeys(book_ids):
+            author = self.cache.get(book_id)
+            if author is None:
+                missing.append(book_id)
+            else:
+                authors[book_id] = author
+        if len(missing) == 1:
+            authors[missing[0]] = self._fetch_author(missing[0])
+        elif missing:
+            for book_id, author in zip(missing, self._executor.map(self._fetch_author, missing)):
+                authors[book_id] = author
+        return authors
+
+
+class AsyncAuthorService:
+    '''
+    asyncio front of an AuthorService, sharing its url, timeout and cache.
+    Lookups go through an httpx.AsyncClient when httpx is installed, otherwise through the
+    session and thread pool of the AuthorService. At most concurrency lookups are in flight.
+    '''
+    def __init__(self, service, concurrency=MAX_CONCURRENT):
+        self.service = service
+        self.cache = service.cache
+        self.concurrency = concurrency
+        self._loop = None       #event loop the client and the semaphore belong to
+        self._client = None
+        self._semaphore = None
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._client = None
+            if httpx is not None:
+                connect, read = self.service.timeout
+                self._client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(read, connect=connect),
+                    limits=httpx.Limits(max_connections=self.concurrency,
+                                        max_keepalive_connections=self.concurrency))
+        return loop
+
+    async def _fetch_author(self, book_id):
+        loop = self._bind()
+        async with self._semaphore:
+            if self._client is None:
+                return await loop.run_in_executor(self.service._executor, self.service._fetch_author, book_id)
+            try:
+                response = await self._client.post(self.service.url, content=json.dumps({"book_id": book_id}),
+                                                   headers=self.service._create_api_headers())
+                response.raise_for_status()
+                author = response.json()['author']
+            except (httpx.HTTPError, ValueError, KeyError) as exc:
+                logger.warning("Author lookup failed for book %s: %s", book_id, exc)
+                return None
+        self.cache.set(book_id, author)
+        return author
+
+    async def get_authors(self, book_ids, timeout=None):
+        '''
+        Authors of all the given books as {book_id: author}, fetched concurrently.
+        Lookups still running after timeout seconds are cancelled and their author is None.
+        '''
+        authors = {}
+        missing = []
+        for book_id in dict.fromkeys(book_ids):
+            author = self.cache.get(book_id)
+            if author is None:
+                missing.append(book_id)
+            else:
+                authors[book_id] = author
+        if not missing:
+            return authors
+        self._bind()
+        tasks = {book_id: asyncio.ensure_future(self._fetch_author(book_id)) for book_id in missing}
+        done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        for book_id, task in tasks.items():
+            authors[book_id] = task.result() if task in done else None
+        return authors
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._loop = None
+
 
 _author = AuthorService()
+_async_author = AsyncAuthorService(_author)
@@ -0,0 +1,79 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _AuthorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   #keep-alive, like the real API
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        book_id = json.loads(body)['book_id']
+        with server.lock:
+            server.requests.append(book_id)
+            server.connections.add(self.client_address)
+        time.sleep(server.latency)
+        if book_id in server.failing:
+            self.send_response(500)
+            payload = b'{}'
+        else:
+            self.send_response(200)
+            payload = json.dumps({'book_id': book_id, 'author': 'Author {}'.format(book_id)}).encode()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128    #many clients connecting at once, the default backlog of 5 drops connections
+
+    def handle_error(self, request, client_address):
+        #clients giving up on a call (timeouts, deadlines) close the connection under the handler
+        if not isinstance(sys.exc_info()[1], (ConnectionError, ValueError)):
+            super().handle_error(request, client_address)
+
+
+class AuthorStubServer:
+    '''
+    Local stand-in for the author API that injects latency into every call
+    and records the requested book ids and the client connections used.
+    '''
+    def __init__(self, latency=0.0, failing=()):
+        self.httpd = _Server(('127.0.0.1', 0), _AuthorHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.failing = set(failing)
+        self.httpd.requests = []
+        self.httpd.connections = set()
+        self.httpd.lock = threading.Lock()
+        self.url = 'http://127.0.0.1:{}/'.format(self.httpd.server_address[1])
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
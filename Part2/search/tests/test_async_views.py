@@ -0,0 +1,155 @@
+from django.test import TestCase
+import asyncio
+import json
+import time
+from unittest import mock
+from search import author_service, views
+from search.async_views import AsyncSearchApp
+from search.author_resolver import AuthorResolver, LOCAL_ONLY, REMOTE_FIRST
+from search.author_service import AsyncAuthorService, AuthorService
+from search.tests.author_stub import AuthorStubServer
+
+
+def call(app, body, path='/search/get-summary', method='POST'):
+    '''
+    Sends one request to an ASGI app, returns (status, headers, body)
+    '''
+    async def run():
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await app({'type': 'http', 'path': path, 'method': method, 'headers': []}, receive, send)
+        return messages
+    start, body = asyncio.run(run())
+    return start['status'], dict(start['headers']), body['body']
+
+
+class SlowQueries:
+    '''
+    Query service whose queries take the given number of seconds
+    '''
+    def __init__(self, delays):
+        self.delays = delays
+        self.authors = {}
+        self.evaluated = []
+
+    def query_index(self, query, k, scorer=None):
+        self.evaluated.append(query)
+        time.sleep(self.delays.get(query, 0))
+        return [{'id': len(query), 'summary': query}]
+
+
+class AsyncSearchTest(TestCase):
+    """ Test module for the async search endpoint """
+
+    def setUp(self):
+        self.stub = AuthorStubServer(latency=0.01).start()
+        self.addCleanup(self.stub.stop)
+
+    def app(self, strategy=REMOTE_FIRST, stub=None, concurrency=32, query_service=None, **kwargs):
+        remote = AsyncAuthorService(AuthorService(url=(stub or self.stub).url), concurrency=concurrency)
+        query_service = query_service or views._query_service
+        resolver = AuthorResolver(strategy, lambda: query_service.authors, remote)
+        return AsyncSearchApp(None, query_service=query_service, author_resolver=resolver, **kwargs)
+
+    def test_same_response_as_search_view(self):
+        request = {'queries': ['mindfulness', 'achieve take book', 'xyzzy', 'mindfulness'], 'K': 3}
+        status, headers, body = call(self.app(), json.dumps(request).encode())
+        self.assertEqual(200, status)
+        self.assertNotIn(b'x-partial-results', headers)
+        resolver = AuthorResolver(REMOTE_FIRST, lambda: views._query_service.authors, AuthorService(url=self.stub.url))
+        with mock.patch.object(views, '_author_resolver', resolver):
+            response = self.client.post('/search/get-summary', request, content_type='application/json')
+        self.assertEqual(response.json(), json.loads(body))
+        self.assertEqual(3, len(json.loads(body)))
+
+    def test_authors_fetched_concurrently(self):
+        service = SlowQueries({})
+        queries = ['q' * i for i in range(1, 9)]
+        with AuthorStubServer(latency=0.2) as stub:
+            start = time.monotonic()
+            status, _, body = call(self.app(stub=stub, query_service=service),
+                                   json.dumps({'queries': queries, 'K': 1}).encode())
+            elapsed = time.monotonic() - start
+            self.assertEqual(8, len(stub.requests))
+        self.assertEqual(['Author {}'.format(i) for i in range(1, 9)], [x[0]['author'] for x in json.loads(body)])
+        #8 serial calls would take 1.6s
+        self.assertLess(elapsed, 0.8)
+
+    def test_concurrency_limit(self):
+        service = SlowQueries({})
+        queries = ['q' * i for i in range(1, 7)]
+        with AuthorStubServer(latency=0.1) as stub:
+            start = time.monotonic()
+            call(self.app(stub=stub, query_service=service, concurrency=2),
+                 json.dumps({'queries': queries, 'K': 1}).encode())
+            elapsed = time.monotonic() - start
+        #three rounds of two lookups
+        self.assertGreaterEqual(elapsed, 0.3)
+
+    def test_deadline_returns_partial_results(self):
+        service = SlowQueries({'slow': 2.0})
+        with AuthorStubServer(latency=2.0) as stub:
+            start = time.monotonic()
+            status, headers, body = call(self.app(stub=stub, query_service=service, deadline=0.3),
+                                         json.dumps({'queries': ['fast', 'slow'], 'K': 1}).encode())
+            elapsed = time.monotonic() - start
+        self.assertEqual(200, status)
+        self.assertEqual(b'1', headers[b'x-partial-results'])
+        #the slow query is left out, the author of the fast one didn't come back in time
+        self.assertEqual([[{'id': 4, 'summary': 'fast', 'query': 'fast', 'author': None}]], json.loads(body))
+        self.assertLess(elapsed, 1.0)
+
+    def test_deadline_drops_queued_queries(self):
+        service = SlowQueries({'slow': 0.5})
+        app = self.app(LOCAL_ONLY, query_service=service, deadline=0.2, query_workers=1)
+        status, headers, body = call(app, json.dumps({'queries': ['slow', 'a', 'bb', 'ccc'], 'K': 1}).encode())
+        self.assertEqual(b'1', headers[b'x-partial-results'])
+        self.assertEqual([], json.loads(body))
+        #the running query finishes, the ones still queued never get evaluated
+        app._executor.shutdown(wait=True)
+        self.assertEqual(['slow'], service.evaluated)
+
+    def test_local_authors_without_remote_calls(self):
+        status, _, body = call(self.app(LOCAL_ONLY), json.dumps({'queries': ['mindfulness'], 'K': 1}).encode())
+        item = json.loads(body)[0][0]
+        self.assertEqual(views._query_service.authors[item['id']], item['author'])
+        self.assertEqual([], self.stub.requests)
+
+    def test_without_httpx(self):
+        with mock.patch.object(author_service, 'httpx', None):
+            status, _, body = call(self.app(query_service=SlowQueries({})),
+                                   json.dumps({'queries': ['a', 'bb'], 'K': 1}).encode())
+        self.assertEqual(['Author 1', 'Author 2'], [x[0]['author'] for x in json.loads(body)])
+
+    def test_no_queries(self):
+        status, _, body = call(self.app(), json.dumps({'queries': [], 'K': 3}).encode())
+        self.assertEqual(200, status)
+        self.assertEqual([], json.loads(body))
+        response = self.client.post('/search/get-summary', {'queries': [], 'K': 3}, content_type='application/json')
+        self.assertEqual(response.json(), json.loads(body))
+
+    def test_invalid_request(self):
+        status, _, body = call(self.app(), b'{"queries": ["book"]}')
+        self.assertEqual(400, status)
+        self.assertIn('error', json.loads(body))
+        status, _, body = call(self.app(), json.dumps({'queries': ['book', 'book AND'], 'K': 1}).encode())
+        self.assertEqual(400, status)
+
+    def test_other_requests_go_to_django(self):
+        calls = []
+
+        async def django_app(scope, receive, send):
+            calls.append(scope['path'])
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        app = self.app()
+        app.app = django_app
+        self.assertEqual(204, call(app, b'', path='/search/index-stats', method='GET')[0])
+        self.assertEqual(['/search/index-stats'], calls)
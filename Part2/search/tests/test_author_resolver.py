@@ -0,0 +1,40 @@
+from django.test import TestCase
+from search.author_resolver import AuthorResolver, LOCAL_FIRST, LOCAL_ONLY, REMOTE_FIRST
+from search.author_service import AuthorService
+from search.tests.author_stub import AuthorStubServer
+
+LOCAL_AUTHORS = {1: 'Local 1', 2: 'Local 2', 3: 'Local 3'}
+
+
+class AuthorResolverTest(TestCase):
+    """ Test module for the author resolution strategies """
+
+    def setUp(self):
+        self.stub = AuthorStubServer(failing=[3]).start()
+        self.addCleanup(self.stub.stop)
+        self.remote = AuthorService(url=self.stub.url)
+
+    def test_local_only(self):
+        resolver = AuthorResolver(LOCAL_ONLY, lambda: LOCAL_AUTHORS, self.remote)
+        self.assertEqual({1: 'Local 1', 4: None}, resolver.resolve([1, 4, 1]))
+        self.assertEqual([], self.stub.requests)
+        self.assertEqual({'strategy': LOCAL_ONLY, 'local_hits': 1, 'remote_calls': 0, 'fallbacks': 0},
+                         resolver.stats())
+
+    def test_local_first(self):
+        resolver = AuthorResolver(LOCAL_FIRST, lambda: LOCAL_AUTHORS, self.remote)
+        self.assertEqual({1: 'Local 1', 2: 'Local 2', 4: 'Author 4'}, resolver.resolve([1, 2, 4]))
+        self.assertEqual([4], self.stub.requests)
+        self.assertEqual({'strategy': LOCAL_FIRST, 'local_hits': 2, 'remote_calls': 1, 'fallbacks': 1},
+                         resolver.stats())
+
+    def test_remote_first(self):
+        resolver = AuthorResolver(REMOTE_FIRST, lambda: LOCAL_AUTHORS, self.remote)
+        self.assertEqual({1: 'Author 1', 3: 'Local 3', 5: 'Author 5'}, resolver.resolve([1, 3, 5]))
+        self.assertEqual([1, 3, 5], sorted(self.stub.requests))
+        self.assertEqual({'strategy': REMOTE_FIRST, 'local_hits': 1, 'remote_calls': 3, 'fallbacks': 1},
+                         resolver.stats())
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            AuthorResolver('nearest', dict, self.remote)
@@ -0,0 +1,55 @@
+from django.test import TestCase
+import time
+from search.author_service import AuthorService
+from search.tests.author_stub import AuthorStubServer
+
+
+class AuthorServiceTest(TestCase):
+    """ Test module for the pooled, concurrent and cached author lookups """
+
+    def test_lookups_are_concurrent_and_deduplicated(self):
+        with AuthorStubServer(latency=0.2) as stub:
+            service = AuthorService(url=stub.url, max_workers=8)
+            start = time.monotonic()
+            authors = service.get_authors([1, 2, 3, 4, 5, 6, 7, 8, 1, 2, 3])
+            elapsed = time.monotonic() - start
+        self.assertEqual({i: 'Author {}'.format(i) for i in range(1, 9)}, authors)
+        self.assertEqual(8, len(stub.requests))
+        #8 serial calls would take 1.6s
+        self.assertLess(elapsed, 0.8)
+
+    def test_authors_are_cached(self):
+        with AuthorStubServer() as stub:
+            service = AuthorService(url=stub.url)
+            service.get_authors([1, 2])
+            self.assertEqual({1: 'Author 1', 2: 'Author 2', 3: 'Author 3'}, service.get_authors([1, 2, 3]))
+            self.assertEqual('Author 3', service.get_author(3))
+        self.assertEqual([1, 2, 3], sorted(stub.requests))
+
+    def test_cache_ttl(self):
+        with AuthorStubServer() as stub:
+            service = AuthorService(url=stub.url, cache_ttl=0.05)
+            service.get_author(1)
+            time.sleep(0.1)
+            service.get_author(1)
+        self.assertEqual([1, 1], stub.requests)
+
+    def test_connections_are_reused(self):
+        with AuthorStubServer() as stub:
+            service = AuthorService(url=stub.url)
+            for book_id in range(5):
+                service.get_author(book_id)
+        self.assertEqual(1, len(stub.connections))
+
+    def test_failures_and_timeouts_are_not_cached(self):
+        with AuthorStubServer(failing=[2]) as stub:
+            service = AuthorService(url=stub.url)
+            self.assertEqual({1: 'Author 1', 2: None}, service.get_authors([1, 2]))
+            self.assertEqual(None, service.get_author(2))
+        self.assertEqual(2, stub.requests.count(2))
+
+        with AuthorStubServer(latency=0.5) as stub:
+            service = AuthorService(url=stub.url, timeout=0.1)
+            start = time.monotonic()
+            self.assertEqual(None, service.get_author(1))
+            self.assertLess(time.monotonic() - start, 0.4)
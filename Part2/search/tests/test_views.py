@@ -0,0 +1,95 @@
+from django.test import TestCase
+from unittest import mock
+from search import views
+from search.author_resolver import AuthorResolver, LOCAL_ONLY, REMOTE_FIRST
+from search.author_service import AuthorService
+from search.tests.author_stub import AuthorStubServer
+
+
+class SearchViewTest(TestCase):
+    """ Test module for the search endpoints """
+
+    def setUp(self):
+        self.stub = AuthorStubServer(latency=0.01).start()
+        self.addCleanup(self.stub.stop)
+
+    def _use_resolver(self, strategy):
+        resolver = AuthorResolver(strategy, lambda: views._query_service.authors, AuthorService(url=self.stub.url))
+        patcher = mock.patch.object(views, '_author_resolver', resolver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return resolver
+
+    def test_get_summary(self):
+        self._use_resolver(REMOTE_FIRST)
+        response = self.client.post('/search/get-summary',
+                                    {'queries': ['mindfulness', 'achieve take book', 'xyzzy'], 'K': 3},
+                                    content_type='application/json')
+        self.assertEqual(200, response.status_code)
+        result = response.json()
+        self.assertEqual(2, len(result))
+        self.assertEqual(3, len(result[1]))
+        for query_obj, query in zip(result, ['mindfulness', 'achieve take book']):
+            for item in query_obj:
+                self.assertEqual(query, item['query'])
+                self.assertEqual('Author {}'.format(item['id']), item['author'])
+        #every book is looked up once per response
+        book_ids = [item['id'] for query_obj in result for item in query_obj]
+        self.assertEqual(sorted(set(book_ids)), sorted(self.stub.requests))
+
+    def test_get_summary_local_authors(self):
+        resolver = self._use_resolver(LOCAL_ONLY)
+        response = self.client.post('/search/get-summary', {'queries': ['mindfulness'], 'K': 1},
+                                    content_type='application/json')
+        item = response.json()[0][0]
+        self.assertEqual(views._query_service.authors[item['id']], item['author'])
+        self.assertEqual([], self.stub.requests)
+        self.assertEqual(1, resolver.stats()['local_hits'])
+
+    def test_get_summary_scorer(self):
+        self._use_resolver(LOCAL_ONLY)
+        request = {'queries': ['achieve take book'], 'K': 10}
+        tfidf = self.client.post('/search/get-summary', request, content_type='application/json').json()
+        bm25 = self.client.post('/search/get-summary', dict(request, scorer='bm25'),
+                                content_type='application/json').json()
+        self.assertEqual(views._query_service.query_index('achieve take book', 10, 'bm25'),
+                         [{'id': x['id'], 'summary': x['summary']} for x in bm25[0]])
+        self.assertNotEqual([x['id'] for x in tfidf[0]], [x['id'] for x in bm25[0]])
+        response = self.client.post('/search/get-summary', dict(request, scorer='cosine'),
+                                    content_type='application/json')
+        self.assertEqual(400, response.status_code)
+        #a failure while searching isn't the client's fault
+        with mock.patch.object(views._query_service, 'query_batch', side_effect=ValueError('corrupt index')):
+            with self.assertRaises(ValueError):
+                self.client.post('/search/get-summary', request, content_type='application/json')
+
+    def test_get_summary_boolean(self):
+        self._use_resolver(LOCAL_ONLY)
+        result = self.client.post('/search/get-summary', {'queries': ['book AND life NOT mindfulness'], 'K': 5},
+                                  content_type='application/json').json()
+        self.assertEqual(views._query_service.query_index('book AND life NOT mindfulness', 5),
+                         [{'id': x['id'], 'summary': x['summary']} for x in result[0]])
+        response = self.client.post('/search/get-summary', {'queries': ['book', 'book AND (life'], 'K': 5},
+                                    content_type='application/json')
+        self.assertEqual(400, response.status_code)
+        self.assertIn('Missing )', response.json()['error'])
+
+    def test_index_stats(self):
+        response = self.client.get('/search/index-stats')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(55, response.json()['num_summaries'])
+        self.assertIn('local_hits', response.json()['authors'])
+        #the analyzer that built the index served, next to the one analyzing the queries
+        self.assertEqual('plain-1', response.json()['analyzer'])
+        self.assertEqual('plain-1', response.json()['query_analyzer']['version'])
+
+    def test_metrics(self):
+        self._use_resolver(LOCAL_ONLY)
+        self.client.post('/search/get-summary', {'queries': ['mindfulness'], 'K': 1}, content_type='application/json')
+        response = self.client.get('/metrics')
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE search_request_seconds histogram', body)
+        self.assertIn('search_request_seconds_count{endpoint="get-summary"}', body)
+        self.assertIn('search_stage_seconds_count{stage="authors"}', body)
@@ -3,5 +3,6 @@ from .views import *
 
 
 urlpatterns = [
-    path('get-summary', SearchView.as_view(), name='search-view')
+    path('get-summary', SearchView.as_view(), name='search-view'),
+    path('index-stats', IndexStatsView.as_view(), name='index-stats-view')
 ]
\ No newline at end of file
@@ -1,26 +1,66 @@
 from rest_framework.views import APIView
 from rest_framework import status
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 
 
 #Local source tree imports
 from .author_service import _author
+from .author_resolver import AuthorResolver, LOCAL_FIRST
 from Part2.index.query_index import _query_service
+from Part2.index import boolean, metrics, profiling
+from Part2.index.scoring import UnknownScorerError, get_scorer
+
+_author_resolver = AuthorResolver(getattr(settings, 'SEARCH_AUTHOR_STRATEGY', LOCAL_FIRST),
+                                  lambda: _query_service.authors,
+                                  _author)
 
 
 class SearchView(APIView):
     def post(self, request):
         data = request.data
+        #"profile": true runs the request under cProfile, if the slow query log profiles on request
+        with profiling.slow_query_log.trace('request', profile=data.get('profile') is True, endpoint='get-summary',
+                                            queries=data.get('queries'), K=data.get('K')):
+            with metrics.request_seconds.time(endpoint='get-summary'):
+                return self.search(data)
+
+    def search(self, data):
         result=[]
         num_of_results = data['K']
-        for query in data['queries']:
-            query_obj = _query_service.query_index(query,num_of_results) # Get the matching summaries
+        #check what the client sent up front, an error while searching is a server error
+        try:
+            #'tfidf' or 'bm25', the default scorer of the index when not given
+            scorer = data.get('scorer') and get_scorer(data['scorer']).name
+            for query in data['queries']:
+                if boolean.is_boolean(query):
+                    boolean.parse(query)
+        except (UnknownScorerError, boolean.QuerySyntaxError) as exc:
+            return JsonResponse({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        query_objs = _query_service.query_batch(data['queries'], num_of_results, scorer)
+        for query, query_obj in zip(data['queries'], query_objs):
             if query_obj:
                 for item in query_obj:
-                    response = _author.api_call(method='POST',
-                                                data='{"book_id":' + str(item['id']) + '}'
-                                                )
                     item['query']=query
-                    item['author'] = response.json()['author']
                 result.append(query_obj)
-        return JsonResponse(result,status=status.HTTP_200_OK, safe=False)
\ No newline at end of file
+
+        #Look up the authors of the whole response at once, every book only once
+        with profiling.stage('authors'):
+            authors = _author_resolver.resolve(item['id'] for query_obj in result for item in query_obj)
+        for query_obj in result:
+            for item in query_obj:
+                item['author'] = authors[item['id']]
+        return JsonResponse(result,status=status.HTTP_200_OK, safe=False)
+
+
+class IndexStatsView(APIView):
+    def get(self, request):
+        stats = _query_service.stats()
+        stats['authors'] = _author_resolver.stats()
+        return JsonResponse(stats, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    def get(self, request):
+        #Prometheus text format, see Part2/index/metrics.py
+        return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)